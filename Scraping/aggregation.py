@@ -0,0 +1,102 @@
+'''
+This module keeps the counters of Passagens (gols, faltas, amarelos, vermelhos, lesoes)
+with set-based updates, instead of the trigger insert_Lance of DataBase/triggers.sql
+that runs one UPDATE for each inserted lance. The counters of a batch of lances are
+added up in memory and applied with a single UPDATE joined with a temporary table of
+deltas, and the lances of a game loaded again subtract the counters of the old ones.
+The same rule of the trigger can recompute every counter from Lances, to verify them.
+'''
+
+import logging
+
+# Type of the play -> counter of the passagem of jogador_1 (the rule of the trigger insert_Lance)
+COUNTERS = {
+    'GOL': 'gols',
+    'FALTA-FEITA': 'faltas',
+    'CARTAO-AMARELO': 'amarelos',
+    'CARTAO-VERMELHO': 'vermelhos',
+    'LESAO': 'lesoes',
+}
+COLUMNS = list(dict.fromkeys(COUNTERS.values()))
+
+DELTAS = 'deltas_passagens'
+
+def count(plays, sign: int = 1, deltas: dict | None = None) -> dict:
+    '''Add the (passagem, tipo, number of plays) to deltas: {passagem: [one value for each of COLUMNS]}'''
+
+    deltas = {} if deltas is None else deltas
+    for passagem, tipo, number in plays:
+        column = COUNTERS.get(tipo)
+        if passagem is None or column is None:
+            continue
+        values = deltas.setdefault(passagem, [0] * len(COLUMNS))
+        values[COLUMNS.index(column)] += sign * number
+    return deltas
+
+def _group_sql(where: str = '') -> str:
+    tipos = ', '.join(f"'{tipo}'" for tipo in COUNTERS)
+    return (f'SELECT jogador_1, tipo, COUNT(*) FROM Lances '
+            f'WHERE jogador_1 IS NOT NULL AND tipo IN ({tipos}){where} GROUP BY jogador_1, tipo')
+
+def stored_counts(cursor, backend, games: list) -> list:
+    '''(passagem, tipo, number of plays) of the lances already saved for the games'''
+
+    if not games:
+        return []
+    cursor.execute(_group_sql(f' AND id_partida IN ({", ".join(backend.placeholder for _ in games)})'),
+                   tuple(games))
+    return cursor.fetchall()
+
+def apply(cursor, backend, deltas: dict) -> int:
+    '''Add the deltas to the counters with one set-based update, returns the number of passagens changed'''
+
+    rows = [(passagem, *values) for passagem, values in deltas.items() if any(values)]
+    if not rows:
+        return 0
+    table = backend.create_temp(cursor, DELTAS, COLUMNS)
+    backend.executemany(cursor, f'INSERT INTO {table} (id, {", ".join(COLUMNS)}) '
+                                f'VALUES ({", ".join(backend.placeholder for _ in range(len(COLUMNS) + 1))})', rows)
+    cursor.execute(backend.add_join('Passagens', table, COLUMNS))
+    cursor.execute(f'DELETE FROM {table}')
+    return len(rows)
+
+def on_lances(loader, cursor, replaced: list, values: list) -> None:
+    '''
+    Called by loader.Loader in the transaction of each batch of lances:
+    replaced are the games whose old lances are deleted, values the new rows
+    (id_partida, jogador_1, jogador_2, tipo, ...).
+    '''
+    deltas = count(stored_counts(cursor, loader.backend, replaced), sign=-1)
+    count(((value[1], value[3], 1) for value in values), deltas=deltas)
+    changed = apply(cursor, loader.backend, deltas)
+    loader.stats['passagens_updated'] = loader.stats.get('passagens_updated', 0) + changed
+
+def expected(loader) -> dict:
+    '''Counters of every passagem computed from all the lances: {passagem: [values of COLUMNS]}'''
+
+    return count(loader._query(_group_sql()))
+
+def recompute(loader) -> int:
+    '''Set every counter to the value computed from Lances (e.g. after lances were corrected by hand)'''
+
+    deltas = expected(loader)
+    with loader.transaction() as cursor:
+        cursor.execute(f'UPDATE Passagens SET {", ".join(f"{column} = 0" for column in COLUMNS)}')
+        changed = apply(cursor, loader.backend, deltas)
+    logging.info(f'Counters of {changed} passagens recomputed')
+    return changed
+
+def verify(loader) -> list:
+    '''
+    Compare the counters saved in Passagens (by the trigger or by this module) with the ones
+    computed from Lances, returns [(passagem, saved, expected)] of the passagens that differ.
+    '''
+    computed = expected(loader)
+    different = []
+    for row in loader._query(f'SELECT id, {", ".join(COLUMNS)} FROM Passagens'):
+        saved = [value or 0 for value in row[1:]]
+        right = computed.get(row[0], [0] * len(COLUMNS))
+        if saved != right:
+            different.append((row[0], dict(zip(COLUMNS, saved)), dict(zip(COLUMNS, right))))
+    logging.info(f'{len(different)} passagens with counters different from Lances')
+    return different
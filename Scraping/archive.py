@@ -0,0 +1,266 @@
+'''
+This module keeps every page fetched (pages of the site and summaries of the games) in a
+compressed archive, so the tables can be rebuilt from it when a selector or a rule of the comments
+changes, without scraping the site again.
+The pages are appended to segment files, one zstd frame per page, and an SQLite index maps
+(page type, id, fetch time) to (segment, offset, length), so any page is read alone:
+
+    <directory>/index.sqlite
+    <directory>/segment-000001.zst, segment-000002.zst ...
+
+A page equal to the last one saved for its URL is not saved again.
+reparse reads the last version of each page and runs the parsers of scraping and summary
+(the same ones of the get_* functions) on a pool of processes, then rebuilds the csv files.
+Needs the zstandard package.
+
+Usage: python archive.py <archive> [output] [season] [processes]   rebuild the csv files of output (default Datas/reparse)
+'''
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
+import zstandard
+from scraping import ROUTES
+
+# Size of a segment before a new one is started
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Pages of a game (page type of the archive -> page of engine.PAGES)
+GAME_PAGES = {'estatisticas': 'estatisticas', 'comentario': 'lances', 'escalacoes': 'escalacoes'}
+
+def page_key(url: str) -> tuple | None:
+    '''(page type, id) of a url of the site or of the summary API, None for other urls'''
+
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    for pattern, page_type in ROUTES:
+        match = pattern.match(path)
+        if match is not None:
+            return page_type, match.group(1)
+    return None
+
+class Archive:
+    '''
+    Archive of the pages in directory.
+    segment_size: bytes of a segment before a new one is started.
+    level: zstd compression level.
+    '''
+
+    def __init__(self, directory: str = 'Datas/arquivo', segment_size: int = SEGMENT_SIZE, level: int = 6):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.stats = {'saved': 0, 'unchanged': 0, 'bytes': 0, 'compressed': 0}
+        self._compressor = zstandard.ZstdCompressor(level=level, write_content_size=True)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS paginas (
+                url TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                id TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                digest TEXT NOT NULL
+            )''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS paginas_chave ON paginas (tipo, id, fetched_at)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS paginas_url ON paginas (url, fetched_at)')
+        self._db.commit()
+        # Digest of the last page saved of each url
+        self._digests = dict(self._db.execute(
+            'SELECT url, digest FROM paginas p WHERE fetched_at = (SELECT MAX(fetched_at) FROM paginas WHERE url = p.url)'))
+        last = self._db.execute('SELECT MAX(segment) FROM paginas').fetchone()[0]
+        self._segment = last or 1
+        self._writer = None
+
+    def _filename(self, segment: int) -> str:
+        return os.path.join(self.directory, f'segment-{segment:06d}.zst')
+
+    def add(self, url: str, content: bytes, fetched_at: float | None = None) -> bool:
+        '''Save a page, returns False when its url is not of a known page or it did not change'''
+
+        key = page_key(url)
+        if key is None or not content:
+            return False
+        digest = hashlib.sha1(content).hexdigest()
+        with self._lock:
+            if self._digests.get(url) == digest:
+                self.stats['unchanged'] += 1
+                return False
+            frame = self._compressor.compress(content)
+            if self._writer is None:
+                self._writer = open(self._filename(self._segment), 'ab')
+            if self._writer.tell() > 0 and self._writer.tell() + len(frame) > self.segment_size:
+                self._writer.close()
+                self._segment += 1
+                self._writer = open(self._filename(self._segment), 'ab')
+            offset = self._writer.tell()
+            self._writer.write(frame)
+            self._writer.flush()
+            self._db.execute('INSERT INTO paginas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (url, *key, fetched_at or time.time(), self._segment, offset, len(frame), len(content), digest))
+            self._db.commit()
+            self._digests[url] = digest
+            self.stats['saved'] += 1
+            self.stats['bytes'] += len(content)
+            self.stats['compressed'] += len(frame)
+        return True
+
+    def read(self, segment: int, offset: int, length: int) -> bytes:
+        '''Content of a page saved at (segment, offset, length)'''
+        return read_page(self.directory, segment, offset, length)
+
+    def get(self, page_type: str, id: str) -> bytes | None:
+        '''Last version saved of a page'''
+
+        with self._lock:
+            row = self._db.execute('SELECT segment, offset, length FROM paginas WHERE tipo = ? AND id = ? '
+                                   'ORDER BY fetched_at DESC LIMIT 1', (page_type, str(id))).fetchone()
+        return self.read(*row) if row is not None else None
+
+    def latest(self, page_types: tuple | None = None) -> list:
+        '''[(url, page type, id, fetched_at, segment, offset, length)] of the last version of each url'''
+
+        query = ('SELECT url, tipo, id, fetched_at, segment, offset, length FROM paginas p '
+                 'WHERE fetched_at = (SELECT MAX(fetched_at) FROM paginas WHERE url = p.url)')
+        parameters = ()
+        if page_types is not None:
+            query += f" AND tipo IN ({', '.join('?' * len(page_types))})"
+            parameters = tuple(page_types)
+        with self._lock:
+            return self._db.execute(query + ' ORDER BY tipo, id, fetched_at', parameters).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is None:
+                return
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._db.close()
+            self._db = None
+        logging.info(f'Archive {self.directory}: {self.stats}')
+
+_segments = {} # (directory, segment) -> file, opened once in each process
+
+def read_page(directory: str, segment: int, offset: int, length: int) -> bytes:
+    '''Content of a page of an archive (also used by the processes of reparse)'''
+
+    key = (directory, segment)
+    file = _segments.get(key)
+    if file is None:
+        file = _segments[key] = open(os.path.join(directory, f'segment-{segment:06d}.zst'), 'rb')
+    data = os.pread(file.fileno(), length, offset)
+    return zstandard.ZstdDecompressor().decompress(data)
+
+def parse_game(directory: str, id: str, locations: dict) -> tuple:
+    '''
+    (id, {'estatisticas': ..., 'lances': ..., 'escalacoes': ...}) of a game from its archived pages
+    ({page type: (segment, offset, length)}), as the get_* functions read them: the summary first,
+    the page when the summary does not have the data.
+    '''
+    import scraping as sc
+    import summary
+
+    data = None
+    if 'summary' in locations:
+        try:
+            data = json.loads(read_page(directory, *locations['summary']))
+        except ValueError:
+            logging.warning(f'Archived summary of game {id} is not JSON')
+
+    paginas = {}
+    for page_type, page in GAME_PAGES.items():
+        result = summary.parse_page(data, page_type, id) if data is not None else summary.MISSING
+        if result is summary.MISSING:
+            if page_type in locations:
+                result = sc.parse_page(page_type, read_page(directory, *locations[page_type]), id)
+            else:
+                result = None
+        elif page_type == 'comentario' and result is not None:
+            result = sc.classify_comments(result, id)
+        paginas[page] = result
+    return id, paginas
+
+def _parse_game(job: tuple) -> tuple:
+    return parse_game(*job)
+
+def _init_worker(parser: str) -> None:
+    import scraping as sc
+    logging.getLogger().setLevel(logging.ERROR)
+    sc.set_parser(parser)
+
+def _season(url: str) -> int | None:
+    match = re.search(r'/temporada/(\d+)', url)
+    return int(match.group(1)) if match is not None else None
+
+def reparse(directory: str, output: str = 'Datas/reparse', season: int = 2024, processes: int | None = None,
+            chunksize: int = 8) -> int:
+    '''
+    Rebuild the csv files of output from the last version of each page of the archive: the squads
+    from the tables and casts, the games on a pool of processes. Returns the number of games.
+    '''
+    import scraping as sc
+    import pipeline
+    import squads
+
+    sc.set_parser('auto')
+    archive = Archive(directory)
+    try:
+        latest = archive.latest()
+    finally:
+        archive.close()
+    os.makedirs(output, exist_ok=True)
+
+    # Squads: the table of each season and the casts of its teams (parsed here, they are few)
+    index = squads.PlayerIndex()
+    for url, page_type, id, fetched_at, *location in latest:
+        if page_type == 'classificacao':
+            for team in sc.parse_page('classificacao', read_page(directory, *location)) or []:
+                if team is not None:
+                    index.add_team(*next(iter(team.items())))
+    for url, page_type, id, fetched_at, *location in latest:
+        if page_type == 'elenco':
+            page = sc.check_page(sc.make_soup(read_page(directory, *location), sc.STRAINERS['elenco']))
+            if page is not None:
+                index.add_cast(sc.parse_cast(page, id, _season(url) or season))
+    tables = index.save(output)
+    logging.info(f"Reparse: {len(tables['jogadores']['espn_id'])} players and {len(tables['times']['espn_id'])} teams")
+
+    # Games: the pages of each one go together to a process
+    games = {}
+    for url, page_type, id, fetched_at, *location in latest:
+        if page_type in GAME_PAGES or page_type == 'summary':
+            games.setdefault(id, {})[page_type] = tuple(location)
+    jobs = [(directory, id, games[id]) for id in sorted(games, key=int)]
+
+    rosters = index.rosters(season)
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(sc.PARSER,)) as executor:
+        with pipeline.CSVSink(output, buffer_size=1000) as sink:
+            sink.remove_games({id: list(pipeline.PAGE_TABLES) for id in games})
+            count = pipeline.stream_games(executor.map(_parse_game, jobs, chunksize=chunksize), sink, rosters)
+    logging.info(f'Reparse: {count} games from {directory} saved in {output}')
+    return count
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    logging.basicConfig(filename='archive.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    output = sys.argv[2] if len(sys.argv) > 2 else 'Datas/reparse'
+    start = time.time()
+    count = reparse(sys.argv[1], output, int(sys.argv[3]) if len(sys.argv) > 3 else 2024,
+                    int(sys.argv[4]) if len(sys.argv) > 4 else None)
+    print(f'{count} games rebuilt in {output} in {time.time() - start:.1f}s')
@@ -0,0 +1,359 @@
+'''
+This script measures the speed of the scraper on a corpus of recorded pages of ESPN, so the
+timings do not depend on the site and every change can be compared with a baseline:
+  - pages/s of the parser of each page type (the get_* functions without the download),
+  - comments/s of get_data_from_comment,
+  - rows/s of each function of data_format,
+  - games/s and pages/s of the whole pipeline (engine + formatting) against local_server.
+Each run is appended to a history (JSON lines) with the commit, the corpus and the machine,
+and compared with the previous run of the same corpus and machine; the changes are corrected by
+the speed of a fixed work (calibration), but a busy machine still gives changes of some percents,
+so a regression should be confirmed by running again.
+
+Usage:
+  python benchmark.py record <corpus> <season> <league> <date> [date ...]  save the pages of the site
+  python benchmark.py run [corpus] [history]                               measure and compare
+  python benchmark.py compare [history]                                    last run vs the previous one
+The corpus has the pages named as local_server expects: resultados_<date>.html,
+estatisticas_<id>.html, comentario_<id>.html, escalacoes_<id>.html, classificacao_<season>.html,
+elenco_<team>.html (and summary_<id>.json).
+'''
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import platform
+import subprocess
+import scraping as sc
+import data_format as df
+import commentary
+import extract
+import summary
+import transport
+import engine
+import pipeline
+import local_server
+
+CORPUS = 'Datas/paginas'
+HISTORY = 'Datas/benchmark.jsonl'
+
+# Page type -> URL of the site, as built by the scrapers
+URLS = {
+    'resultados': '/futebol/resultados/_/data/{id}/liga/{league}',
+    'estatisticas': '/futebol/partida-estatisticas/_/jogoId/{id}',
+    'comentario': '/futebol/comentario/_/jogoId/{id}',
+    'escalacoes': '/futebol/escalacoes/_/jogoId/{id}',
+    'classificacao': '/futebol/classificacao/_/liga/{LEAGUE}/temporada/{id}',
+    'elenco': '/futebol/time/elenco/_/id/{id}/liga/{LEAGUE}/temporada/{season}',
+}
+
+# A change slower than this fraction of the previous run is reported as a regression
+TOLERANCE = 0.10
+
+# Speed of a fixed work, the changes are corrected by its change (machine busier or faster in a run)
+CALIBRATION = 'calibracao/s'
+
+def _save(directory: str, name: str, url: str) -> bool:
+    response = transport.get_transport().get(url)
+    if response.status_code != 200:
+        logging.warning(f'Error {response.status_code} recording {url}')
+        return False
+    with open(os.path.join(directory, name), 'wb') as file:
+        file.write(response.content)
+    return True
+
+def record(directory: str, season: int, league: str, dates: list) -> None:
+    '''Save the results pages of the dates, the pages of their games, the table and the casts'''
+
+    os.makedirs(directory, exist_ok=True)
+    values = {'league': league, 'LEAGUE': league.upper(), 'season': season}
+    for date in dates:
+        if not _save(directory, f'resultados_{date}.html', sc.BASE_URL + URLS['resultados'].format(id=date, **values)):
+            continue
+        with open(os.path.join(directory, f'resultados_{date}.html'), 'rb') as file:
+            ids = sc.parse_page('resultados', file.read()) or []
+        for id in ids:
+            for page_type in ('estatisticas', 'comentario', 'escalacoes'):
+                _save(directory, f'{page_type}_{id}.html', sc.BASE_URL + URLS[page_type].format(id=id, **values))
+            _save(directory, f'summary_{id}.json', summary.summary_url(id, league))
+
+    if _save(directory, f'classificacao_{season}.html', sc.BASE_URL + URLS['classificacao'].format(id=season, **values)):
+        with open(os.path.join(directory, f'classificacao_{season}.html'), 'rb') as file:
+            teams = sc.parse_page('classificacao', file.read()) or []
+        for team in teams:
+            id = next(iter(team.values())).split('/')[0]
+            _save(directory, f'elenco_{id}.html', sc.BASE_URL + URLS['elenco'].format(id=id, **values))
+
+def load_corpus(directory: str) -> dict:
+    '''{page type: [(id, content)]} of the saved pages'''
+
+    corpus = {}
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension not in ('.html', '.json') or '_' not in name:
+            continue
+        page_type, id = name.split('_', 1)
+        with open(os.path.join(directory, filename), 'rb') as file:
+            corpus.setdefault(page_type, []).append((id, file.read()))
+    return corpus
+
+def corpus_digest(corpus: dict) -> str:
+    digest = hashlib.sha256()
+    for page_type in sorted(corpus):
+        for id, content in corpus[page_type]:
+            digest.update(f'{page_type}_{id}'.encode())
+            digest.update(content)
+    return digest.hexdigest()[:16]
+
+def measure(function, repeat: int = 5, min_time: float = 0.2) -> float:
+    '''Best time of one call of function, repeated until min_time to smooth the noise'''
+
+    function() # warm up (caches, imports)
+    best = float('inf')
+    for _ in range(repeat):
+        calls, started = 0, time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+def _calibration() -> int:
+    # Fixed work of plain Python (dicts, strings), its speed tells how fast the machine was in the run
+    total = 0
+    for i in range(20000):
+        total += len({'id': str(i), 'nome': f'jogador {i}'}['nome'].split())
+    return total
+
+def bench_parsers(corpus: dict, repeat: int) -> dict:
+    '''pages/s of each parser'''
+
+    results = {}
+    for page_type in ('resultados', 'estatisticas', 'comentario', 'escalacoes', 'classificacao', 'elenco'):
+        pages = corpus.get(page_type)
+        if not pages:
+            continue
+        seconds = measure(lambda: [sc.parse_page(page_type, content, id) for id, content in pages], repeat)
+        results[f'paginas/s {page_type}'] = len(pages) / seconds
+    summaries = [(id, json.loads(content)) for id, content in corpus.get('summary', [])]
+    if summaries:
+        for page_type, parse in summary.PARSERS.items():
+            seconds = measure(lambda: [parse(data, id) for id, data in summaries], repeat)
+            results[f'paginas/s summary {page_type}'] = len(summaries) / seconds
+    return results
+
+def comment_texts(corpus: dict) -> list:
+    '''(text, minute) of the comments of the saved pages'''
+
+    texts = []
+    for id, content in corpus.get('comentario', []):
+        record = extract.extract(sc.make_soup(content, sc.STRAINERS['comentario']), 'comentario')
+        texts += [(comment.text, minute.text) for comment, minute in zip(record.comments, record.minutes)]
+    return texts
+
+def bench_comments(corpus: dict, repeat: int) -> dict:
+    '''comments/s of the classification'''
+
+    texts = comment_texts(corpus)
+    if not texts:
+        return {}
+    one = measure(lambda: [sc.get_data_from_comment(i, text, minute) for i, (text, minute) in enumerate(texts)], repeat)
+    batch = measure(lambda: commentary.classify(texts), repeat)
+    return {'comentarios/s get_data_from_comment': len(texts) / one, 'comentarios/s classify': len(texts) / batch}
+
+def parsed_pages(corpus: dict) -> dict:
+    '''{page type: [results of the parser]} without the pages that fail'''
+
+    parsed = {}
+    for page_type, pages in corpus.items():
+        if page_type in sc.STRAINERS:
+            results = [sc.parse_page(page_type, content, id) for id, content in pages]
+            parsed[page_type] = [result for result in results if result]
+    return parsed
+
+def bench_formatting(corpus: dict, repeat: int) -> dict:
+    '''rows/s of each function of data_format'''
+
+    parsed = parsed_pages(corpus)
+    estatisticas = parsed.get('estatisticas', [])
+    lances = parsed.get('comentario', [])
+    escalacoes = parsed.get('escalacoes', [])
+    casts = parsed.get('elenco', [])
+    teams = [team for teams in parsed.get('classificacao', []) for team in teams]
+    players = [player for cast in casts for player in cast['jogadores']]
+
+    functions = {
+        'format_estatisticas_partida': lambda: [row for data in estatisticas for row in df.format_estatisticas_partida(data)],
+        'format_partidas': lambda: [df.format_partidas(data) for data in estatisticas],
+        'format_lances': lambda: [row for data in lances for row in df.format_lances(data)],
+        'format_escalacoes': lambda: [row for data in escalacoes for team in df.format_escalacoes(data) for row in team],
+        'format_jogadores': lambda: [df.format_jogadores(player) for player in players if player['idade'] is not None],
+        'format_passagens': lambda: [row for cast in casts for row in df.format_passagens(cast)],
+        'format_times': lambda: [df.format_times(team) for team in teams],
+        'format_estatisticas_batch': lambda: df.format_estatisticas_batch(estatisticas),
+        'format_partidas_batch': lambda: df.format_partidas_batch(estatisticas),
+        'format_lances_batch': lambda: df.format_lances_batch(lances),
+        'format_escalacoes_batch': lambda: df.format_escalacoes_batch(escalacoes),
+        'format_jogadores_batch': lambda: df.format_jogadores_batch(player for player in players if player['idade'] is not None),
+        'format_passagens_batch': lambda: df.format_passagens_batch(casts),
+        'format_times_batch': lambda: df.format_times_batch(teams),
+    }
+    results = {}
+    for name, function in functions.items():
+        output = function()
+        rows = len(next(iter(output.values()))) if isinstance(output, dict) else len(output)
+        if rows:
+            results[f'linhas/s {name}'] = rows / measure(function, repeat)
+    return results
+
+class _NullSink:
+    '''Sink counting the rows, so the pipeline is measured without the disk'''
+
+    def __init__(self):
+        self.rows = 0
+
+    def write(self, table: str, row: dict) -> None:
+        self.rows += 1
+
+    def end_game(self, id: str) -> None:
+        pass
+
+def bench_pipeline(directory: str, corpus: dict, rounds: int = 5, workers: int = 8, extraction: str = 'dom') -> dict:
+    '''games/s and pages/s of engine + formatting, fetching the corpus from a local replay server'''
+
+    ids = [id for id, content in corpus.get('estatisticas', [])]
+    if not ids:
+        return {}
+    server = local_server.LocalServer(directory).start()
+    base_url, api_url, mode = sc.BASE_URL, summary.API_URL, sc.EXTRACTION
+    sc.BASE_URL = summary.API_URL = server.url
+    sc.set_extraction(extraction)
+    transport.configure(pool_size=workers, timeout=(5, 30))
+    try:
+        sink = _NullSink()
+        elapsed = 0.0
+        for _ in range(rounds):
+            summary._memo.clear() # each round downloads the summaries again
+            started = time.perf_counter()
+            pipeline.stream_games(engine.iter_games(ids, workers=workers, per_host=workers), sink)
+            elapsed += time.perf_counter() - started
+    finally:
+        sc.BASE_URL, summary.API_URL = base_url, api_url
+        sc.set_extraction(mode)
+        server.shutdown()
+        transport.configure()
+    return {f'jogos/s pipeline {extraction}': len(ids) * rounds / elapsed,
+            f'paginas/s pipeline {extraction}': server.stats['requests'] / elapsed,
+            f'linhas/s pipeline {extraction}': sink.rows / elapsed}
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(directory: str = CORPUS, history: str | None = HISTORY, repeat: int = 3, rounds: int = 5) -> dict:
+    '''Measure everything on the corpus, append the run to the history and return it'''
+
+    level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.ERROR) # the warnings of the scrapers would be timed too
+    try:
+        corpus = load_corpus(directory)
+        results = {CALIBRATION: 1 / measure(_calibration, repeat)}
+        results.update(bench_parsers(corpus, repeat))
+        results.update(bench_comments(corpus, repeat))
+        results.update(bench_formatting(corpus, repeat))
+        results.update(bench_pipeline(directory, corpus, rounds, extraction='dom'))
+        if corpus.get('summary'):
+            results.update(bench_pipeline(directory, corpus, rounds, extraction='json'))
+    finally:
+        logging.getLogger().setLevel(level)
+
+    entry = {
+        'data': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _commit(),
+        'corpus': corpus_digest(corpus),
+        'paginas': {page_type: len(pages) for page_type, pages in corpus.items()},
+        'parser': sc.PARSER,
+        'python': platform.python_version(),
+        'maquina': f'{platform.machine()} {os.cpu_count()} cpus',
+        'resultados': {name: round(value, 1) for name, value in results.items()},
+    }
+    if history is not None:
+        os.makedirs(os.path.dirname(history) or '.', exist_ok=True)
+        with open(history, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+def read_history(history: str = HISTORY) -> list:
+    if not os.path.exists(history):
+        return []
+    with open(history, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def compare(entry: dict, baseline: dict | None) -> list:
+    '''
+    [(metric, baseline, value, change)] of the entry, change is the fraction of the baseline (+ is faster),
+    corrected by the change of the calibration
+    '''
+    factor = 1.0
+    if baseline is not None and baseline['resultados'].get(CALIBRATION) and entry['resultados'].get(CALIBRATION):
+        factor = entry['resultados'][CALIBRATION] / baseline['resultados'][CALIBRATION]
+    rows = []
+    for name, value in entry['resultados'].items():
+        before = baseline['resultados'].get(name) if baseline is not None else None
+        change = value / before / (factor if name != CALIBRATION else 1.0) - 1 if before else None
+        rows.append((name, before, value, change))
+    return rows
+
+def baseline_of(entry: dict, entries: list) -> dict | None:
+    '''Previous run of the same corpus and machine'''
+
+    for other in reversed(entries):
+        if other is not entry and other['corpus'] == entry['corpus'] and other['maquina'] == entry['maquina']:
+            return other
+    return None
+
+def print_comparison(entry: dict, baseline: dict | None, tolerance: float = TOLERANCE) -> int:
+    '''Print the table of the run, returns the number of regressions'''
+
+    print(f"Run: {entry['data']} ({entry['commit']}), corpus {entry['corpus']}")
+    if baseline is not None:
+        print(f"Baseline: {baseline['data']} ({baseline['commit']})")
+    print(f"{'':<45} {'value':>14} {'baseline':>14}")
+    regressions = 0
+    for name, before, value, change in compare(entry, baseline):
+        mark = ''
+        if change is not None:
+            mark = f'{change:+.1%}'
+            if change < -tolerance:
+                mark += '  REGRESSION'
+                regressions += 1
+        print(f"{name:<45} {value:>14,.1f} {'' if before is None else f'{before:>14,.1f}':>14} {mark}")
+    return regressions
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'record' and len(sys.argv) > 5:
+        record(sys.argv[2], int(sys.argv[3]), sys.argv[4], sys.argv[5:])
+    elif command == 'run':
+        history = sys.argv[3] if len(sys.argv) > 3 else HISTORY
+        entry = run(sys.argv[2] if len(sys.argv) > 2 else CORPUS, history)
+        entries = read_history(history)
+        sys.exit(1 if print_comparison(entry, baseline_of(entries[-1], entries[:-1])) else 0)
+    elif command == 'compare':
+        entries = read_history(sys.argv[2] if len(sys.argv) > 2 else HISTORY)
+        if not entries:
+            print('No runs in the history')
+            sys.exit(2)
+        print_comparison(entries[-1], baseline_of(entries[-1], entries[:-1]))
+    else:
+        print(__doc__)
+        sys.exit(2)
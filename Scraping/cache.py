@@ -0,0 +1,288 @@
+'''
+This module keeps the downloaded pages on disk, so a new run only pays for the pages that changed.
+The bodies are stored by the hash of their content and an SQLite index maps each URL to its body,
+the validators (ETag/Last-Modified) sent by the server and the time it was fetched and last used.
+The pages of a game are kept for good only after the end of the game, before it they expire soon.
+Error pages (answered with 200) are never stored.
+'''
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+# TTL of the pages of a game: they never expire once the game is over (see game_finished),
+# before that (scheduled, in progress, postponed) they expire after UNFINISHED_TTL seconds
+GAME = 'game'
+UNFINISHED_TTL = 5 * 60
+
+# (URL pattern, time to live in seconds), the first match wins, None never expires.
+# The pages of a game do not change after it ends, results/table/squads pages do.
+DEFAULT_RULES = [
+    (r'/futebol/(partida-estatisticas|comentario|escalacoes)/', GAME),
+    (r'/sports/soccer/[^/]+/summary\?', GAME),
+    (r'/futebol/resultados/', 60 * 60),
+    (r'/futebol/classificacao/', 60 * 60),
+    (r'/futebol/time/elenco/', 24 * 60 * 60),
+]
+DEFAULT_TTL = 60 * 60
+
+# Status of the summary of a game that is over (a postponed or canceled game may still be played)
+FINAL_STATUSES = ('STATUS_FULL_TIME', 'STATUS_FINAL', 'STATUS_FINAL_AET', 'STATUS_FINAL_PEN')
+
+# Clock of the game strip (class Gamestrip__Time) of the pages of a game that is over
+FINAL_LABELS = ('Fim', 'Final', 'FT', 'Encerrado')
+FINAL_CLOCK = re.compile(rb'class="[^"]*Gamestrip__Time[^"]*"[^>]*>\s*(?:<[^>]*>\s*)*(?:'
+                         + '|'.join(FINAL_LABELS).encode() + rb')\b')
+
+# Class of the title of the error pages (scraping.check_page), sometimes answered with 200
+ERROR_PAGE = b'Error404__Title'
+
+def is_summary(url: str) -> bool:
+    return '/summary?' in url
+
+def is_error_page(url: str, content: bytes) -> bool:
+    '''True for the bodies the scrapers reject: empty, error pages or summaries that are not JSON'''
+
+    if not content:
+        return True
+    if is_summary(url):
+        try:
+            json.loads(content)
+        except ValueError:
+            return True
+        return False
+    return ERROR_PAGE in content
+
+def game_finished(url: str, content: bytes) -> bool:
+    '''True when the page (or summary) of a game shows that it is over'''
+
+    if is_summary(url):
+        try:
+            status = json.loads(content)['header']['competitions'][0]['status']['type']
+        except (ValueError, KeyError, IndexError, TypeError):
+            return False
+        return status.get('name') in FINAL_STATUSES
+    return FINAL_CLOCK.search(content) is not None
+
+class CachedResponse:
+    '''The part of requests.Response used by the scrapers, built from the disk'''
+
+    def __init__(self, url: str, content: bytes, status_code: int = 200, headers: dict | None = None):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.from_cache = True
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+class PageCache:
+    '''
+    Disk cache of GET responses.
+    directory: where the index and the page bodies are saved.
+    max_bytes: size limit of the bodies, the least recently used pages are evicted above it.
+    offline: only answer from the disk, a page not saved returns status 504.
+    rules: list of (URL regex, TTL in seconds, None or GAME) overriding DEFAULT_RULES.
+    unfinished_ttl: TTL of the pages of the GAME rules while the game is not over.
+    '''
+
+    def __init__(self, directory: str = '.cache/pages', max_bytes: int = 512 * 1024 * 1024,
+                 offline: bool = False, rules: list | None = None, default_ttl: float | None = DEFAULT_TTL,
+                 unfinished_ttl: float = UNFINISHED_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.rules = [(re.compile(pattern), ttl) for pattern, ttl in (rules or DEFAULT_RULES)]
+        self.default_ttl = default_ttl
+        self.unfinished_ttl = unfinished_ttl
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stored': 0, 'evicted': 0, 'rejected': 0}
+
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                permanent INTEGER NOT NULL DEFAULT 0
+            )''')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(pages)')]
+        if 'permanent' not in columns:
+            # Index of a previous version: its game pages are checked again when they are revalidated
+            self._db.execute('ALTER TABLE pages ADD COLUMN permanent INTEGER NOT NULL DEFAULT 0')
+        self._db.commit()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def ttl(self, url: str) -> float | str | None:
+        for pattern, ttl in self.rules:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def is_permanent(self, url: str, content: bytes) -> bool:
+        '''True when the saved page never expires: a rule without TTL or a game that is over'''
+
+        ttl = self.ttl(url)
+        return ttl is None or (ttl == GAME and game_finished(url, content))
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _lookup(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT digest, etag, last_modified, fetched_at, permanent FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(self._path(row[0])):
+            return None
+        return {'digest': row[0], 'etag': row[1], 'last_modified': row[2], 'fetched_at': row[3], 'permanent': row[4]}
+
+    def _read(self, url: str, entry: dict) -> CachedResponse | None:
+        try:
+            with open(self._path(entry['digest']), 'rb') as file:
+                content = file.read()
+        except FileNotFoundError: # evicted by another thread
+            return None
+        with self._lock:
+            self._db.execute('UPDATE pages SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            self._db.commit()
+        return CachedResponse(url, content)
+
+    def _is_fresh(self, url: str, entry: dict) -> bool:
+        if entry['permanent']:
+            return True
+        ttl = self.ttl(url)
+        if ttl == GAME:
+            ttl = self.unfinished_ttl
+        return ttl is None or time.time() - entry['fetched_at'] < ttl
+
+    def store(self, url: str, content: bytes, etag: str | None = None, last_modified: str | None = None) -> bool:
+        '''Save the body of a page, replacing the previous one. Error pages are not saved (returns False).'''
+
+        if is_error_page(url, content):
+            self._count('rejected')
+            logging.info(f'Error page not cached: {url}')
+            return False
+        permanent = self.is_permanent(url, content)
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f'{path}.{threading.get_ident()}.tmp'
+            with open(temp, 'wb') as file:
+                file.write(content)
+            os.replace(temp, path)
+
+        now = time.time()
+        with self._lock:
+            old = self._db.execute('SELECT digest FROM pages WHERE url = ?', (url,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages (url, digest, size, etag, last_modified, fetched_at, accessed_at, permanent) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, len(content), etag, last_modified, now, now, int(permanent)))
+            self._db.commit()
+            if old is not None and old[0] != digest:
+                self._remove_object(old[0])
+            self.stats['stored'] += 1
+        self._evict()
+        return True
+
+    def _remove_object(self, digest: str) -> None:
+        # Called with the lock held, the body can be shared by other URLs
+        used = self._db.execute('SELECT 1 FROM pages WHERE digest = ? LIMIT 1', (digest,)).fetchone()
+        if used is None and os.path.exists(self._path(digest)):
+            os.remove(self._path(digest))
+
+    def _evict(self) -> None:
+        '''Remove the least recently used pages while the cache is above max_bytes'''
+
+        with self._lock:
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._db.execute('SELECT url, digest, size FROM pages ORDER BY accessed_at').fetchall()
+            for url, digest, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute('DELETE FROM pages WHERE url = ?', (url,))
+                self._remove_object(digest)
+                total -= size
+                self.stats['evicted'] += 1
+            self._db.commit()
+
+    def invalidate(self, url: str) -> None:
+        '''Forget a page (e.g. an error page saved by a previous version)'''
+
+        with self._lock:
+            row = self._db.execute('SELECT digest FROM pages WHERE url = ?', (url,)).fetchone()
+            self._db.execute('DELETE FROM pages WHERE url = ?', (url,))
+            self._db.commit()
+            if row is not None:
+                self._remove_object(row[0])
+
+    def fetch(self, url: str, request) -> CachedResponse:
+        '''
+        Return the page of url from the disk when it is fresh, otherwise call
+        request(url, headers) with the validators of the saved copy.
+        A 304 answer renews the saved copy, a 200 answer replaces it.
+        '''
+        entry = self._lookup(url)
+        if entry is not None and (self.offline or self._is_fresh(url, entry)):
+            cached = self._read(url, entry)
+            if cached is not None and not is_summary(url) and is_error_page(url, cached.content):
+                # Saved by a previous version, before the error pages were rejected
+                self.invalidate(url)
+                cached = None
+            if cached is not None:
+                self._count('hits')
+                return cached
+            entry = None
+        if self.offline:
+            self._count('misses')
+            logging.warning(f'Page not in cache: {url}')
+            return CachedResponse(url, b'', status_code=504)
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = request(url, headers)
+        if response.status_code == 304 and entry is not None:
+            cached = self._read(url, entry)
+            if cached is not None:
+                self._count('revalidated')
+                # The game may have ended since the page was saved
+                permanent = self.is_permanent(url, cached.content)
+                with self._lock:
+                    self._db.execute('UPDATE pages SET fetched_at = ?, permanent = ? WHERE url = ?',
+                                     (time.time(), int(permanent), url))
+                    self._db.commit()
+                return cached
+            response = request(url, {})
+
+        self._count('misses')
+        if response.status_code == 200:
+            self.store(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,99 @@
+'''
+This module records, in an SQLite file, which pages of each game were already
+scraped and saved in the csv files, so a new run only fetches new or failed games.
+A game that was not over when it was scraped (scheduled, in progress or postponed)
+stays pending, so the next run replaces its partial rows.
+'''
+
+import os
+import time
+import sqlite3
+import logging
+
+PAGES = ('estatisticas', 'lances', 'escalacoes')
+
+class Checkpoint:
+    '''
+    Status of each (jogoId, page): 'ok' when the page was scraped, 'failed' otherwise.
+    formatted is 1 after the rows of the page were saved in the csv files.
+    finished is 0 when the game was not over yet, its pages are fetched again.
+    '''
+
+    def __init__(self, filename: str = 'Datas/checkpoint.sqlite'):
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS paginas (
+                jogo_id TEXT NOT NULL,
+                pagina TEXT NOT NULL,
+                status TEXT NOT NULL,
+                formatted INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (jogo_id, pagina)
+            )''')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(paginas)')]
+        if 'finished' not in columns:
+            self._db.execute('ALTER TABLE paginas ADD COLUMN finished INTEGER NOT NULL DEFAULT 1')
+        self._db.commit()
+
+    def _finished(self, id: str, results: dict) -> bool:
+        '''
+        Whether the game was over, told by the record of its page Estatisticas (encerrada),
+        or by the previous run when that page was not fetched again (it is only skipped for finished games)
+        '''
+        if 'estatisticas' not in results:
+            row = self._db.execute("SELECT finished FROM paginas WHERE jogo_id = ? AND pagina = 'estatisticas'",
+                                   (str(id),)).fetchone()
+            return row is None or bool(row[0])
+        estatisticas = results['estatisticas']
+        return estatisticas is None or estatisticas.get('encerrada') is not False
+
+    def mark_pages(self, id: str, results: dict) -> None:
+        '''Record the result of each page of a game (None is a failure, e.g. page not found or game canceled)'''
+
+        now = time.time()
+        finished = self._finished(id, results)
+        if not finished:
+            logging.info(f'Game {id} is not over, it stays pending')
+        self._db.executemany(
+            'INSERT OR REPLACE INTO paginas (jogo_id, pagina, status, formatted, updated_at, finished) VALUES (?, ?, ?, 0, ?, ?)',
+            [(str(id), page, 'ok' if result is not None else 'failed', now, int(finished))
+             for page, result in results.items()])
+        self._db.commit()
+
+    def mark_formatted(self, ids: list) -> None:
+        '''Record that the scraped pages of the games were saved'''
+
+        self._db.executemany(
+            "UPDATE paginas SET formatted = 1, updated_at = ? WHERE jogo_id = ? AND status = 'ok'",
+            [(time.time(), str(id)) for id in ids])
+        self._db.commit()
+
+    def pending(self, ids: list) -> dict:
+        '''
+        Return {id: [pages still missing]} for the games not completely saved, in the order of ids.
+        Every page of a game not over yet is missing.
+        '''
+        done = {}
+        for id, page in self._db.execute(
+                "SELECT jogo_id, pagina FROM paginas WHERE status = 'ok' AND formatted = 1 AND finished = 1"):
+            done.setdefault(id, set()).add(page)
+
+        missing = {}
+        for id in ids:
+            pages = [page for page in PAGES if page not in done.get(str(id), ())]
+            if pages:
+                missing[str(id)] = pages
+        logging.info(f'Checkpoint: {len(missing)} of {len(ids)} games to update')
+        return missing
+
+    def reset(self, ids: list) -> None:
+        '''Forget the pages of the games, so they are all pending again'''
+
+        self._db.executemany('DELETE FROM paginas WHERE jogo_id = ?', [(str(id),) for id in ids])
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
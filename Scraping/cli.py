@@ -0,0 +1,275 @@
+'''
+Command line of the scraper, one subcommand for each step, so a cron job or a worker runs only
+the step it needs. The modules are imported by the subcommands: pandas (columnar copy) is loaded
+only by the options writing Parquet, so the small refreshes start fast.
+
+Usage: python cli.py <subcommand> [options]   (python cli.py <subcommand> -h for the options)
+  discover  IDs of the games between two dates (one per line), saved in the calendar
+  squads    teams, players and passagens of one or more seasons, each player saved once
+  games     games not saved yet between two dates, resolved with the squads saved by squads
+  format    games formatted again from the pages in the cache, without the network
+  export    csv files to the database and/or the columnar copy (Parquet)
+  live      new lances of games in progress, printed as JSON lines (see live.py)
+  reparse   csv files rebuilt from the archive of the pages (--archive), on a pool of processes
+e.g.   python cli.py squads --season 2024
+       python cli.py games --from 20240413 --to 20240430 --season 2024 --database Datas/espn.sqlite
+'''
+
+import os
+import sys
+import time
+import argparse
+import logging
+
+def _setup(args) -> None:
+    '''Log, transport and scrapers of the subcommands reading the site (or the cache)'''
+
+    import transport
+    import cache
+    import ratelimit
+    import metrics
+    import scraping as sc
+
+    os.makedirs(args.output, exist_ok=True)
+    logging.basicConfig(filename=args.log, level=logging.INFO, force=True,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    metrics.quiet_libraries()
+    limiter = None
+    if not args.offline:
+        limiter = ratelimit.RateLimiter(rate=args.rate, burst=max(args.rate, 1), concurrency=4, max_concurrency=10)
+    page_archive = None
+    if args.archive:
+        import archive # zstandard, only when the pages are archived
+        page_archive = archive.Archive(args.archive)
+    transport.configure(pool_size=10, timeout=(5, 30), compression=True, limiter=limiter, archive=page_archive,
+                        cache=cache.PageCache(args.cache, offline=args.offline) if args.cache else None)
+    sc.set_parser('auto')
+    sc.set_extraction(args.extraction)
+
+def _finish(args) -> None:
+    import transport
+    import metrics
+
+    logging.info(f'Transport stats: {transport.get_transport().report()}')
+    if args.metrics:
+        metrics.METRICS.add_report('transport', transport.get_transport().report())
+        metrics.METRICS.save(args.metrics)
+    transport.get_transport().close()
+
+def _shard(args):
+    import runner
+    return runner.Shard(args.league, args.season, args.from_date, args.to_date)
+
+def _ids(args, shard) -> list:
+    '''IDs of the games of the arguments: --ids, else the games of the dates'''
+
+    import runner
+
+    if args.ids:
+        return list(args.ids)
+    return runner.discover(shard, args.output, args.workers)
+
+def load_rosters(directory: str, season: int):
+    '''resolution.Rosters of the csv files saved by squads (None when they are missing)'''
+
+    import loader
+    import resolution
+
+    filenames = {table: os.path.join(directory, f'{table}.csv') for table in ('times', 'jogadores', 'passagens')}
+    if not all(os.path.exists(filename) for filename in filenames.values()):
+        logging.warning(f'No squads in {directory}, the names of the lances are not resolved')
+        return None
+    rosters = resolution.Rosters()
+    for row in loader.read_csv(filenames['times'], 'times'):
+        rosters.add_team(row['nome'], row['espn_id'])
+    names = {row['espn_id']: row['nome'] for row in loader.read_csv(filenames['jogadores'], 'jogadores')}
+    for row in loader.read_csv(filenames['passagens'], 'passagens'):
+        if row['ano'] == str(season) and row['id_jogador'] in names:
+            rosters.add_player(row['id_jogador'], names[row['id_jogador']], row['id_time'])
+    return rosters
+
+def command_discover(args) -> int:
+    import runner
+
+    _setup(args)
+    ids = runner.discover(_shard(args), args.output, args.workers)
+    print('\n'.join(ids))
+    _finish(args)
+    return 0
+
+def command_squads(args) -> int:
+    import squads
+
+    _setup(args)
+    seasons = args.seasons or [args.season]
+    index = squads.collect(seasons, args.league, args.workers, squads.PlayerIndex().load(args.output))
+    tables = index.save(args.output)
+    if args.columnar:
+        import columnar
+        # The passagens in the partition of their season, the teams and players in the one of --season
+        for season in seasons:
+            passagens = [position for position, ano in enumerate(tables['passagens']['ano']) if ano == season]
+            columns = {column: [values[position] for position in passagens] for column, values in tables['passagens'].items()}
+            columnar.write_table(columns, 'passagens', args.columnar, season=season, league=args.league)
+        for table in ('times', 'jogadores'):
+            columnar.write_table(tables[table], table, args.columnar, season=args.season, league=args.league)
+    print(f"{len(tables['jogadores']['espn_id'])} new players and {len(tables['passagens']['ano'])} new passagens"
+          f" of {len(index.players)} players saved in {args.output}")
+    _finish(args)
+    return 0
+
+def command_games(args) -> int:
+    import runner
+
+    _setup(args)
+    shard = _shard(args)
+    ids = _ids(args, shard)
+    sinks = ()
+    database = None
+    if args.database:
+        import loader
+        database = loader.Loader(loader.SQLiteBackend(args.database), batch_size=1000)
+        # The squads before the games, for the foreign keys of the lances
+        for table in ('times', 'jogadores', 'passagens'):
+            filename = os.path.join(args.output, f'{table}.csv')
+            if os.path.exists(filename):
+                database.load(table, loader.read_csv(filename, table))
+        sinks = (loader.DatabaseSink(database, buffer_size=1000, season=args.season),)
+    try:
+        count = runner.collect_games(shard, args.output, ids, load_rosters(args.output, args.season),
+                                     args.columnar, args.workers, sinks=sinks)
+    finally:
+        if database is not None:
+            database.close()
+    print(f'{count} of {len(ids)} games saved in {args.output}')
+    _finish(args)
+    return 0
+
+def command_format(args) -> int:
+    '''Format the games again from the cache (the rows of the games are replaced)'''
+
+    import checkpoint as ckpt
+    import runner
+
+    if not args.cache:
+        print('format reads the pages from the cache: give --cache')
+        return 2
+    args.offline = True
+    _setup(args)
+    shard = _shard(args)
+    ids = _ids(args, shard)
+    # Every page of the games is read again from the cache (a page not saved there fails, as a page not found)
+    checkpoint = ckpt.Checkpoint(os.path.join(args.output, 'checkpoint.sqlite'))
+    checkpoint.reset(ids)
+    checkpoint.close()
+    count = runner.collect_games(shard, args.output, ids, load_rosters(args.output, args.season),
+                                 args.columnar, args.workers)
+    print(f'{count} games formatted in {args.output}')
+    _finish(args)
+    return 0
+
+def command_export(args) -> int:
+    if not args.database and not args.columnar:
+        print('Nothing to export: give --database and/or --columnar')
+        return 2
+    logging.basicConfig(filename=args.log, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    if args.database:
+        import loader
+        database = loader.Loader(loader.SQLiteBackend(args.database))
+        loader.load_directory(database, args.output, args.season)
+        print(f'{database.stats["rows"]} rows loaded in {args.database}')
+        database.close()
+    if args.columnar:
+        import columnar
+        columnar.convert_csv(args.output, args.columnar, args.season, args.league)
+        print(f'Columnar copy saved in {args.columnar}')
+    return 0
+
+def command_live(args) -> int:
+    import json
+    import live
+
+    args.cache = ''
+    _setup(args)
+    try:
+        for event in live.tail(args.ids, args.league, args.min_interval, args.max_interval):
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+    _finish(args)
+    return 0
+
+def command_reparse(args) -> int:
+    import archive
+
+    logging.basicConfig(filename=args.log, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    start = time.time()
+    count = archive.reparse(args.archive, args.output, args.season, args.processes)
+    print(f'{count} games rebuilt in {args.output} in {time.time() - start:.1f}s')
+    return 0
+
+def _date(text: str) -> int:
+    try:
+        time.strptime(text, '%Y%m%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{text} is not a date YYYYMMDD') from None
+    return int(text)
+
+def parser() -> argparse.ArgumentParser:
+    main = argparse.ArgumentParser(prog='cli.py', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = main.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--league', default='bra.1', help='league of ESPN (default bra.1)')
+    common.add_argument('--season', type=int, default=2024, help='season (default 2024)')
+    common.add_argument('--output', default='Datas', help='folder of the csv files (default Datas)')
+    common.add_argument('--log', default='getting_data.log', help='log file (default getting_data.log)')
+
+    site = argparse.ArgumentParser(add_help=False)
+    site.add_argument('--from', dest='from_date', type=_date, help='first day YYYYMMDD (default: start of the season)')
+    site.add_argument('--to', dest='to_date', type=_date, help='last day YYYYMMDD (default: end of the season or today)')
+    site.add_argument('--workers', type=int, default=8, help='threads fetching pages (default 8)')
+    site.add_argument('--rate', type=float, default=10, help='requests per second (default 10)')
+    site.add_argument('--cache', default='.cache/pages', help="page cache ('' for none, default .cache/pages)")
+    site.add_argument('--extraction', choices=('json', 'dom'), default='json', help='data of the games from (default json)')
+    site.add_argument('--metrics', help='save the metrics of the run (.prom or .json)')
+    site.add_argument('--archive', help='archive every page fetched in this folder (needs zstandard)')
+    site.set_defaults(offline=False)
+
+    columnar = argparse.ArgumentParser(add_help=False)
+    columnar.add_argument('--columnar', help='root of the columnar copy (Parquet, needs pandas)')
+
+    games_ids = argparse.ArgumentParser(add_help=False)
+    games_ids.add_argument('--ids', nargs='+', help='IDs of the games (default: the games of the dates)')
+
+    commands.add_parser('discover', parents=[common, site], help='IDs of the games').set_defaults(run=command_discover)
+    command = commands.add_parser('squads', parents=[common, site, columnar], help='teams and players')
+    command.add_argument('--seasons', type=int, nargs='+', help='seasons of a backfill, fetched together (default --season)')
+    command.set_defaults(run=command_squads)
+    command = commands.add_parser('games', parents=[common, site, columnar, games_ids], help='games not saved yet')
+    command.add_argument('--database', help='SQLite database also filled with the rows')
+    command.set_defaults(run=command_games)
+    commands.add_parser('format', parents=[common, site, columnar, games_ids],
+                        help='games formatted again from the cache').set_defaults(run=command_format)
+    command = commands.add_parser('live', parents=[common, site], help='lances of games in progress')
+    command.add_argument('--ids', nargs='+', required=True, help='IDs of the games')
+    command.add_argument('--min-interval', type=float, default=10, help='seconds between polls with news (default 10)')
+    command.add_argument('--max-interval', type=float, default=60, help='longest seconds between polls (default 60)')
+    command.set_defaults(run=command_live)
+    command = commands.add_parser('reparse', parents=[common], help='csv files rebuilt from the archive')
+    command.add_argument('--archive', required=True, help='folder of the archive')
+    command.add_argument('--processes', type=int, help='processes parsing the pages (default: the cores)')
+    command.set_defaults(run=command_reparse)
+    command = commands.add_parser('export', parents=[common, columnar], help='csv files to the database or Parquet')
+    command.add_argument('--database', help='SQLite database')
+    command.set_defaults(run=command_export)
+    return main
+
+def main(argv: list | None = None) -> int:
+    args = parser().parse_args(argv)
+    return args.run(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
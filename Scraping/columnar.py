@@ -0,0 +1,174 @@
+'''
+This module saves the tables of data_format as typed and compressed columnar files
+(Parquet, or Feather), partitioned by season and league:
+
+    <root>/<table>/temporada=<season>/liga=<league>/part-<run>-<pid>-<n>.parquet
+
+Each run adds new parts instead of rewriting the tables. When a game (or player, team...)
+is saved again, read_table keeps only the rows of its newest part, as merge_toCSV does.
+Parquet needs pyarrow (or fastparquet) and Feather needs pyarrow.
+
+Usage: python columnar.py <directory of the csv files> <root> <season> [league]
+'''
+
+import os
+import re
+import sys
+import glob
+import time
+import logging
+import pandas as pd
+import data_format as df
+
+# Type of each column, the numbers accept missing values
+TYPES = {
+    'estatisticas': {'id_partida': 'Int64', 'id_time': 'string', 'chute_gol': 'Int16', 'gol': 'Int16',
+                     'chute': 'Int16', 'defesa': 'Int16', 'posse': 'Float32'},
+    'escalacoes': {'time': 'string', 'partida': 'Int64', 'jogador': 'Int64', 'status_': 'string'},
+    'lances': {'id_partida': 'Int64', 'jogador_1': 'string', 'jogador_2': 'string', 'tipo': 'string',
+               'minuto': 'string', 'descricao': 'string', 'time': 'string'},
+    'partidas': {'espn_id': 'Int64', 'local_': 'string', 'estadio': 'string', 'campeonato': 'string',
+                 'arbitro': 'string', 'data_': 'string', 'horario': 'string', 'audiencia': 'Int64'},
+    'jogadores': {'nome': 'string', 'espn_id': 'Int64', 'posicao': 'string', 'idade': 'Int16',
+                  'altura': 'Float32', 'nacionalidade': 'string'},
+    'passagens': {'id_jogador': 'Int64', 'id_time': 'Int64', 'ano': 'Int16'},
+    'times': {'nome': 'string', 'espn_id': 'Int64'},
+}
+
+FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+def to_frame(rows, table: str) -> pd.DataFrame:
+    '''DataFrame of the table with the types of TYPES, from a list of rows (dicts) or a dict of columns'''
+
+    frame = pd.DataFrame(rows, columns=df.COLUMNS[table])
+    for column, dtype in TYPES[table].items():
+        values = frame[column].replace('', None) # empty fields of the csv files
+        if dtype == 'string':
+            frame[column] = values.astype('string')
+        else:
+            frame[column] = pd.to_numeric(values, errors='coerce').astype(dtype)
+    return frame
+
+def partition(root: str, table: str, season: int, league: str) -> str:
+    return os.path.join(root, table, f'temporada={season}', f'liga={league}')
+
+def _new_part(directory: str, prefix: str, extension: str) -> str:
+    '''Create the next free part file of the prefix, the exclusive create keeps two writers from taking the same name'''
+
+    number = len(glob.glob(os.path.join(directory, f'{prefix}-*')))
+    while True:
+        filename = os.path.join(directory, f'{prefix}-{number:04d}{extension}')
+        try:
+            os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return filename
+        except FileExistsError:
+            number += 1
+
+def write_table(rows, table: str, root: str = 'Datas/colunar', season: int = 2024, league: str = 'bra.1',
+                run: str | None = None, format: str = 'parquet', compression: str = 'zstd') -> str | None:
+    '''Write the rows as a new part of the partition (season, league) of the table, returns its file'''
+
+    frame = rows if isinstance(rows, pd.DataFrame) else to_frame(rows, table)
+    if frame.empty:
+        return None
+    directory = partition(root, table, season, league)
+    os.makedirs(directory, exist_ok=True)
+    run = run or time.strftime('%Y%m%d%H%M%S')
+    filename = _new_part(directory, f'part-{run}-{os.getpid()}', FORMATS[format])
+    if format == 'parquet':
+        frame.to_parquet(filename, compression=compression, index=False)
+    else:
+        frame.to_feather(filename, compression=compression)
+    logging.info(f'{len(frame)} rows saved in {filename}')
+    return filename
+
+def _parts(root: str, table: str, season: int | None, league: str | None) -> list:
+    pattern = partition(root, table, season if season is not None else '*', league or '*')
+    return sorted(glob.glob(os.path.join(pattern, 'part-*')), key=os.path.basename)
+
+def read_table(table: str, root: str = 'Datas/colunar', season: int | None = None, league: str | None = None) -> pd.DataFrame:
+    '''
+    Read the parts of the table (all seasons/leagues when not given) with the columns temporada and liga.
+    The rows of a key (see data_format.KEYS) saved in more than one part come only from the newest one.
+    '''
+    frames = []
+    for number, filename in enumerate(_parts(root, table, season, league)):
+        frame = pd.read_parquet(filename) if filename.endswith('.parquet') else pd.read_feather(filename)
+        match = re.search(r'temporada=([^/\\]+)[/\\]liga=([^/\\]+)', filename)
+        frame['temporada'] = int(match.group(1))
+        frame['liga'] = match.group(2)
+        frame['_part'] = number
+        frames.append(frame)
+    if not frames:
+        return to_frame([], table).assign(temporada=pd.Series(dtype='Int16'), liga=pd.Series(dtype='string'))
+
+    frame = pd.concat(frames, ignore_index=True)
+    keys = df.KEYS[table] + ['temporada', 'liga']
+    newest = frame.groupby(keys, dropna=False)['_part'].transform('max')
+    frame = frame[frame['_part'] == newest].drop(columns='_part').reset_index(drop=True)
+    frame['temporada'] = frame['temporada'].astype('Int16')
+    frame['liga'] = frame['liga'].astype('string')
+    return frame
+
+class ColumnarSink:
+    '''
+    Same interface as pipeline.CSVSink, saving the rows of the games as parts of the
+    partition (season, league). Each flush writes one part per table.
+    '''
+
+    def __init__(self, root: str = 'Datas/colunar', season: int = 2024, league: str = 'bra.1',
+                 buffer_size: int = 10000, format: str = 'parquet', on_flush=None):
+        self.root = root
+        self.season = season
+        self.league = league
+        self.buffer_size = buffer_size
+        self.format = format
+        self.on_flush = on_flush
+        self.run = time.strftime('%Y%m%d%H%M%S')
+        self.buffers = {table: [] for table in df.COLUMNS}
+        self.buffered = 0
+        self.games = []
+
+    def write(self, table: str, row: dict) -> None:
+        self.buffers[table].append(row)
+        self.buffered += 1
+
+    def end_game(self, id: str) -> None:
+        self.games.append(id)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for table, rows in self.buffers.items():
+            if rows:
+                write_table(rows, table, self.root, self.season, self.league, self.run, self.format)
+                self.buffers[table] = []
+        self.buffered = 0
+        games, self.games = self.games, []
+        if games and self.on_flush is not None:
+            self.on_flush(games)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def convert_csv(directory: str, root: str, season: int, league: str = 'bra.1', format: str = 'parquet') -> None:
+    '''Save the csv files of data_format as a partition'''
+
+    for table in df.COLUMNS:
+        filename = os.path.join(directory, f'{table}.csv')
+        if os.path.exists(filename):
+            # The columns of the csv files are in the order of data_format.COLUMNS
+            frame = pd.read_csv(filename, dtype=str, keep_default_na=False, header=0, names=df.COLUMNS[table])
+            write_table(to_frame(frame, table), table, root, season, league, format=format)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(2)
+    convert_csv(sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4] if len(sys.argv) > 4 else 'bra.1')
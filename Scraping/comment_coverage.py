@@ -0,0 +1,130 @@
+'''
+This module collects the comments that no rule of commentary.RULES classifies,
+grouped by template (the comment with names, teams and numbers replaced), so the
+missing rules can be written in order of frequency.
+
+Usage: python comment_coverage.py [Datas/cobertura.json] [number of templates]
+'''
+
+import os
+import re
+import sys
+import json
+import logging
+import threading
+from collections import Counter
+
+# Content of parentheses is the team of a player
+_TEAM = re.compile(r'\([^)]*\)')
+_NUMBER = re.compile(r'\d+')
+# Sequence of capitalized words, joined by the usual particles of Portuguese names
+_PARTICLES = ('de', 'da', 'do', 'dos', 'das')
+_NAME = re.compile(r"[A-ZÀ-Þ][\w'-]*(?:\s(?:(?:" + '|'.join(_PARTICLES) + r")\s)?[A-ZÀ-Þ][\w'-]*)*")
+
+def normalize(text: str) -> str:
+    '''
+    Template of a comment: teams become (<time>), numbers <n> and names <nome>.
+    A capitalized word starting a sentence is kept (e.g. 'Escanteio', 'Assistência'),
+    unless it is followed by other capitalized word, by the team of the player or by a score.
+    '''
+    text = _NUMBER.sub('<n>', _TEAM.sub('(<time>)', ' '.join(text.split())))
+
+    def name(match: re.Match) -> str:
+        before = text[:match.start()].rstrip()
+        sentence_start = before == '' or before[-1] in '.!?:'
+        words = match.group().split(' ', 2)
+        if not sentence_start:
+            return '<nome>'
+        if len(words) == 3 and words[1] in _PARTICLES:
+            # 'Revisão do VAR', 'Assistência de Fulano'
+            return f'{words[0]} {words[1]} <nome>'
+        if len(words) == 1 and not text.startswith((' (', ' <n>'), match.end()):
+            return match.group()
+        return '<nome>'
+
+    return _NAME.sub(name, text)
+
+class Coverage:
+    '''
+    Non-standard comments by game: {jogoId: {'comentarios': total, 'fora_do_padrao': {template: count}}}
+    and one example of each template. A game parsed again replaces its previous counts.
+    '''
+
+    def __init__(self, filename: str = 'Datas/cobertura.json'):
+        self.filename = filename
+        self.games = {}
+        self.examples = {}
+        self._lock = threading.Lock() # the pages are parsed by many threads
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as file:
+                saved = json.load(file)
+            self.games = saved.get('jogos', {})
+            self.examples = saved.get('exemplos', {})
+
+    def add_game(self, id: str, total: int, unmatched: list) -> None:
+        '''Record the comments of a game: total of comments and the texts without rule'''
+
+        templates = Counter()
+        for text in unmatched:
+            template = normalize(text)
+            templates[template] += 1
+            with self._lock:
+                self.examples.setdefault(template, ' '.join(text.split()))
+        with self._lock:
+            self.games[str(id)] = {'comentarios': total, 'fora_do_padrao': dict(templates)}
+
+    def templates(self) -> Counter:
+        '''Number of comments of each template, in all games'''
+
+        total = Counter()
+        with self._lock:
+            for game in self.games.values():
+                total.update(game['fora_do_padrao'])
+        return total
+
+    def report(self, limit: int | None = None) -> list:
+        '''[{'template', 'comentarios', 'jogos', 'exemplo'}] sorted by number of comments'''
+
+        games = Counter()
+        with self._lock:
+            for game in self.games.values():
+                games.update(game['fora_do_padrao'].keys())
+        return [{'template': template, 'comentarios': count, 'jogos': games[template],
+                 'exemplo': self.examples.get(template)}
+                for template, count in self.templates().most_common(limit)]
+
+    def by_game(self) -> dict:
+        '''{jogoId: (non-standard comments, total of comments)} of the games with non-standard comments'''
+
+        with self._lock:
+            return {id: (sum(game['fora_do_padrao'].values()), game['comentarios'])
+                    for id, game in self.games.items() if game['fora_do_padrao']}
+
+    def rate(self) -> float:
+        '''Fraction of the comments classified by the rules'''
+
+        with self._lock:
+            total = sum(game['comentarios'] for game in self.games.values())
+            unmatched = sum(sum(game['fora_do_padrao'].values()) for game in self.games.values())
+        return 1.0 if total == 0 else 1 - unmatched / total
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        with self._lock:
+            used = {template for game in self.games.values() for template in game['fora_do_padrao']}
+            saved = {'jogos': self.games,
+                     'exemplos': {template: text for template, text in self.examples.items() if template in used}}
+            with open(self.filename, 'w', encoding='utf-8') as file:
+                json.dump(saved, file, indent=1, sort_keys=True, ensure_ascii=False)
+        logging.info(f'Coverage of the comments saved in {self.filename}')
+
+if __name__ == '__main__':
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Datas/cobertura.json'
+    if not os.path.exists(filename):
+        print(__doc__)
+        sys.exit(2)
+    coverage = Coverage(filename)
+    print(f'{len(coverage.games)} games, {coverage.rate():.2%} of the comments classified')
+    for item in coverage.report(int(sys.argv[2]) if len(sys.argv) > 2 else 20):
+        print(f"{item['comentarios']:6} comments {item['jogos']:5} games  {item['template']}")
+        print(f"{'':26}e.g. {item['exemplo']}")
@@ -0,0 +1,182 @@
+'''
+This module classifies the comments of the page Comentarios with a table of rules.
+Each rule has the keyword that identifies the kind of comment, a compiled regex whose
+named groups (jogador_1, jogador_2, time, descricao) are the fields of the play and its type.
+The rules are indexed by their keyword: one regex finds the keywords in the comment and the
+first rule of the table among them wins.
+'''
+
+import re
+import json
+import logging
+import records
+
+FIELDS = ('jogador_1', 'jogador_2', 'time', 'descricao')
+EMPTY = {}
+
+class Rule:
+    '''
+    keyword: text that identifies the comment.
+    pattern: regex (matched from the start of the comment) with named groups among FIELDS.
+    tipo: type of the play, or a function (text) -> type.
+    descricao: optional description, or a function (text) -> description, used instead of the group descricao.
+    defaults: values of the groups that do not take part in the match.
+    A comment with the keyword that does not follow the pattern is still a play of the rule, without the fields.
+    '''
+
+    def __init__(self, keyword: str, pattern: str | None = None, tipo=None, descricao=None, defaults: dict | None = None):
+        self.keyword = keyword
+        self.pattern = re.compile(pattern, re.DOTALL) if pattern is not None else None
+        self.tipo = tipo
+        self.descricao = descricao
+        self.defaults = defaults or {}
+        self._tipo_callable = callable(tipo)
+        self._descricao_callable = callable(descricao)
+
+    def apply(self, text: str, minute: str) -> records.Lance:
+        '''Return the play of the comment'''
+
+        groups = EMPTY
+        if self.pattern is not None:
+            match = self.pattern.match(text)
+            if match is None:
+                logging.debug(f'Comment out of the pattern of {self.keyword}')
+            else:
+                groups = match.groupdict()
+                for field, value in self.defaults.items():
+                    if groups[field] is None:
+                        groups[field] = value
+        return records.Lance(
+            groups.get('jogador_1'),
+            groups.get('jogador_2'),
+            groups.get('time'),
+            self.tipo(text) if self._tipo_callable else self.tipo,
+            groups.get('descricao') if self.descricao is None else
+            self.descricao(text) if self._descricao_callable else self.descricao,
+            minute,
+        )
+
+def _shot(text: str) -> str:
+    # Type of shot, written between the first comma and the first dot
+    description = text[text.find(','):text.find('.')]
+    if 'cabeça' in description:
+        return 'CABECEIO'
+    elif 'pé direito' in description:
+        return 'CHUTE (pé direito)'
+    return 'CHUTE (pé esquerdo)'
+
+def _card_reason(text: str) -> str | None:
+    # Reason of the card, after the team
+    if 'por' not in text:
+        return None
+    return text[text.find('por', text.find('(')):-1]
+
+def _card_type(text: str) -> str | None:
+    if 'amarelo' in text:
+        return 'CARTAO-AMARELO'
+    elif 'vermelho' in text:
+        return 'CARTAO-VERMELHO'
+    return None
+
+def _goal(text: str) -> str:
+    # How the goal was scored, written between the team and 'gol.'
+    description = text[text.find(')')+2:text.find('gol.')+3]
+    if 'direito' in description:
+        return 'pé direito'
+    elif 'esquerdo' in description:
+        return 'pé esquerdo'
+    elif 'cabeça' in description:
+        return 'cabeça'
+    return description
+
+# Rules of the comments of ESPN, in order of priority
+RULES = [
+    # Falta cometida por <jogador> (<time>).
+    Rule('Falta cometida', r'[^(]{19}(?P<jogador_1>[^(]*)[^(]\((?P<time>.*)..\Z', 'FALTA-FEITA'),
+    # <jogador> (<time>) sofre uma falta ...
+    Rule('sofre uma falta', r'(?P<jogador_2>[^()]*)[^()]\((?P<time>[^)]*)\)', 'FALTA-SOFRIDA'),
+    # Oportunidade perdida. <jogador> (<time>) <chute> ...
+    Rule('Oportunidade perdida', r'[^()]{21}(?P<jogador_1>[^()]*)[^()]\((?P<time>[^)]*)\)', 'GOL-PERDIDO', _shot),
+    # Escanteio, <time>.[ Cobrado por <jogador>.]
+    Rule('Escanteio', r'[^.]{11}(?P<time>[^.]*)\.(?:.{12}(?P<jogador_2>.*).\Z)?', 'ESCANTEIO', defaults={'jogador_2': ''}),
+    # Impedimento, <time>. <jogador> tentou ... mas encontrou <jogador> em posição de impedimento.
+    Rule('Impedimento', r'[^.]{13}(?P<time>[^.]*)\..(?P<jogador_1>.*?).tentou.*?encontrou.(?P<jogador_2>.*?) em posição', 'IMPEDIMENTO'),
+    # <jogador> (<time>) recebe cartão amarelo/vermelho [por ...].
+    Rule('cartão', r'(?P<jogador_1>[^()]*)[^()]\((?P<time>[^)]*)\)', _card_type, _card_reason),
+    # Gol! <placar>. <jogador> (<time>) <finalização> gol. [Assistência de <jogador>.]
+    # Gol contra de <jogador> (<time>). (own goals have no author, their names may have dots)
+    Rule('Gol', r'(?:[^.(]*\..(?P<jogador_1>[^(]*?)|[^(]*?) \((?P<time>[^)]*)\)(?:.*?Assistência .{3}(?P<jogador_2>.*).\Z)?',
+         'GOL', _goal, defaults={'jogador_1': ''}),
+    # Substituição, <time>. Entra em campo <jogador> substituindo <jogador>.
+    # (the team is only read when the first comma comes after it, as in the first scraper)
+    Rule('Substituição', r'(?:[^,]{13}(?P<time>[^,]*)|[^,]*),.*?campo.(?P<jogador_1>.*?).substituindo.(?P<jogador_2>[^.]*)\.',
+         'SUBSTITUICAO', defaults={'time': ''}),
+    # ... lesão de <jogador> (<time>).
+    Rule('lesão', r'[^(]*?lesão de.(?P<jogador_1>[^(]*)[^(]\((?P<time>[^)]*)\)', 'LESAO'),
+    Rule('Fim do primeiro', tipo='ENCERRAMENTO-1'),
+    Rule('Fim do segundo', tipo='ENCERRAMENTO-2'),
+]
+
+# keyword -> (position in RULES, rule), and the regex of the keywords, built from RULES by index_rules
+_index = {}
+_keywords = None
+
+def index_rules() -> None:
+    '''Index RULES by keyword (called by register, and to be called after changing RULES by hand)'''
+
+    global _keywords
+    _index.clear()
+    for position, rule in enumerate(RULES):
+        _index.setdefault(rule.keyword, (position, rule))
+    # At one position the alternation gives the keyword of the first rule. A keyword starting inside
+    # a found one is skipped, which only matters when its rule comes first: then a lookahead
+    # (slower) finds the keywords starting at every position
+    alternation = '|'.join(re.escape(keyword) for keyword in _index)
+    if any(_index[b][0] < _index[a][0] and _overlap(a, b) for a in _index for b in _index):
+        _keywords = re.compile(f'(?=({alternation}))')
+    else:
+        _keywords = re.compile(f'({alternation})')
+
+def _overlap(a: str, b: str) -> bool:
+    # An occurrence of b can start inside an occurrence of a
+    return any(b.startswith(a[i:]) or a[i:].startswith(b) for i in range(1, len(a)))
+
+def register(rule: Rule, before: str | None = None) -> None:
+    '''Add a rule to the table, at the end or before the rule with the keyword before'''
+
+    position = len(RULES)
+    if before is not None:
+        position = next((i for i, r in enumerate(RULES) if r.keyword == before), position)
+    RULES.insert(position, rule)
+    index_rules()
+
+def load_rules(filename: str) -> None:
+    '''
+    Register the rules of a JSON file: a list of {"keyword": ..., "pattern": ..., "tipo": ...,
+    "descricao": optional description, "defaults": optional {group: value}, "before": optional keyword}.
+    '''
+    with open(filename, 'r', encoding='utf-8') as file:
+        for item in json.load(file):
+            register(Rule(item['keyword'], item.get('pattern'), item.get('tipo'), item.get('descricao'),
+                          item.get('defaults')), item.get('before'))
+
+def find_rule(text: str) -> Rule | None:
+    '''Return the first rule of the table whose keyword is in the comment'''
+
+    found = _keywords.findall(text)
+    if not found:
+        return None
+    return min(_index[keyword] for keyword in found)[1] if len(found) > 1 else _index[found[0]][1]
+
+def classify_one(text: str, minute: str) -> records.Lance | None:
+    '''Return the play of a comment (a records.Lance, read also as {'jogador-1', 'jogador-2', 'time', 'tipo', 'descricao', 'minuto'}) or None'''
+
+    rule = find_rule(text)
+    return rule.apply(text, minute) if rule is not None else None
+
+index_rules()
+
+def classify(comments) -> list:
+    '''Classify a batch of (text, minute) comments, returns a play (or None) for each one'''
+
+    return [classify_one(text, minute) for text, minute in comments]
@@ -4,18 +4,44 @@ This module is responsible for formatting the data to be saved in the database.
 '''
 import os
 import csv
+import logging
+import metrics
+from records import as_record, Record, Lances, Partida, EstatisticaTime, Jogador, Passagem
+
+# Columns of each csv file (each csv is a table of the database)
+COLUMNS = {
+    'estatisticas': ['id_partida', 'id_time', 'chute_gol', 'gol', 'chute', 'defesa', 'posse'],
+    'escalacoes': ['time', 'partida', 'jogador', 'status_'],
+    'lances': ['id_partida', 'jogador_1', 'jogador_2', 'tipo', 'minuto', 'descricao', 'time'],
+    'partidas': ['espn_id', 'local_', 'estadio', 'campeonato', 'arbitro', 'data_', 'horario', 'audiencia'],
+    'jogadores': ['nome', 'espn_id', 'posicao', 'idade', 'altura', 'nacionalidade'],
+    'passagens': ['id_jogador', 'id_time', 'ano'],
+    'times': ['nome', 'espn_id'],
+}
+
+# Columns identifying the rows of each table, used to replace rows in merge_toCSV
+KEYS = {
+    'estatisticas': ['id_partida'],
+    'escalacoes': ['partida'],
+    'lances': ['id_partida'],
+    'partidas': ['espn_id'],
+    'jogadores': ['espn_id'],
+    'passagens': ['id_jogador', 'id_time', 'ano'],
+    'times': ['espn_id'],
+}
 
 def stats_formatting(data: dict, id: str) -> list:
         '''Atomic function to format the data from the stats of a game'''
 
+        data = as_record(EstatisticaTime, data)
         return {
             'id_partida': id,
-            'id_time': data['time'],
-            'chute_gol': int(data['chute a gol']),
-            'gol': int(data['gols']),
-            'chute': int(data['chute']),
-            'defesa': int(data['defesas']),
-            'posse': float(data['posse'])
+            'id_time': data.time,
+            'chute_gol': int(data.chute_gol),
+            'gol': int(data.gols),
+            'chute': int(data.chute),
+            'defesa': int(data.defesas),
+            'posse': float(data.posse)
         }
     
 def lineUp_formatting(data: dict, team: str, game: str) -> list:
@@ -40,58 +66,83 @@ def lineUp_formatting(data: dict, team: str, game: str) -> list:
             datas.append(player)
     return datas
 
+@metrics.timed('format', rows=True)
 def format_jogadores(data: dict) -> dict:
     '''Format the data from the table Jogadores'''
 
+    data = as_record(Jogador, data)
     return {
-        'nome': data['nome'],
-        'espn_id': int(data['espn_id']),
-        'posicao': data['posicao'],
-        'idade': int(data['idade']),
-        'altura': float(data['altura'].replace(' m', '')) if data['altura'] != None else None,
-        'nacionalidade': data['nacionalidade']
+        'nome': data.nome,
+        'espn_id': int(data.espn_id),
+        'posicao': data.posicao,
+        'idade': int(data.idade),
+        'altura': float(data.altura.replace(' m', '')) if data.altura != None else None,
+        'nacionalidade': data.nacionalidade
     }
 
-def format_lances(data: dict) -> list:
-    '''Format the data from the table Lances'''
+def _id_or_name(id: int | None, nome: str | None):
+    # A name not resolved is kept, the loader looks it up by name
+    return nome if id is None else id
 
-    datas = []
-    data_aux = data.copy()
-    game = data_aux.pop('partida')
-    for key, value in data_aux.items():
-        datas.append({
+@metrics.timed('format', rows=True)
+def format_lances(data: dict, index=None) -> list:
+    '''
+    Format the data from the table Lances.
+    With the resolution.Index of the game, the players and the team are ESPN ids instead of names
+    (the names not resolved are kept).
+    '''
+    return _lances_rows(as_record(Lances, data), index)
+
+def _lances_rows(data: Lances, index=None) -> list:
+    # Rows of format_lances, without counting them (format_lances_batch counts its own)
+    game = data.partida
+    if index is not None:
+        return [{
             'id_partida': game,
-            'jogador_1': value['jogador-1'],
-            'jogador_2': value['jogador-2'],
-            'tipo': value['tipo'],
-            'minuto': value['minuto'],
-            'descricao': value['descricao'],
-            'time': value['time']
-        })
-    return datas
+            'jogador_1': _id_or_name(index.player(play.jogador_1, play.time), play.jogador_1),
+            'jogador_2': _id_or_name(index.player(play.jogador_2, play.time), play.jogador_2),
+            'tipo': play.tipo,
+            'minuto': play.minuto,
+            'descricao': play.descricao,
+            'time': _id_or_name(index.team(play.time), play.time)
+        } for play in data.lances]
+    return [{
+        'id_partida': game,
+        'jogador_1': play.jogador_1,
+        'jogador_2': play.jogador_2,
+        'tipo': play.tipo,
+        'minuto': play.minuto,
+        'descricao': play.descricao,
+        'time': play.time
+    } for play in data.lances]
 
+@metrics.timed('format', rows=True)
 def format_partidas(data: dict) -> dict:
     '''Format the data from the table Partidas'''
 
+    data = as_record(Partida, data)
     return {
-        'espn_id': int(data['partida']),
-        'local_': data['local'],
-        'estadio': data['estadio'],
-        'campeonato': data['campeonato'],
-        'arbitro': data['arbitro'],
-        'data_': data['data'],
-        'horario': data['horario'],
-        'audiencia': int(data['audiencia']) if data['audiencia'] != None else None,
+        'espn_id': int(data.partida),
+        'local_': data.local,
+        'estadio': data.estadio,
+        'campeonato': data.campeonato,
+        'arbitro': data.arbitro,
+        'data_': data.data,
+        'horario': data.horario,
+        'audiencia': int(data.audiencia) if data.audiencia != None else None,
         # 'mandante': data['mandante']['time'],
         # 'visitante': data['visitante']['time'],
     }
 
+@metrics.timed('format', rows=True)
 def format_estatisticas_partida(data: dict) -> list:
     '''Format the data from the table EstatisticasPartida'''
-    datas = [stats_formatting(data['mandante'], data['partida'])]
-    datas.append(stats_formatting(data['visitante'], data['partida']))
+    data = as_record(Partida, data)
+    datas = [stats_formatting(data.mandante, data.partida)]
+    datas.append(stats_formatting(data.visitante, data.partida))
     return datas
 
+@metrics.timed('format', rows=True)
 def format_escalacoes(data: dict) -> list:
     '''Format the data from the table Escalacoes'''
 
@@ -100,6 +151,7 @@ def format_escalacoes(data: dict) -> list:
     datas.append(lineUp_formatting(data[teams[2]], teams[2], data['partida']))
     return datas
 
+@metrics.timed('format', rows=True)
 def format_times(data: dict) -> dict:
     '''Format the data from the table Times'''
 
@@ -109,21 +161,153 @@ def format_times(data: dict) -> dict:
         'espn_id': int(data[team].split('/')[0])
     }
 
+@metrics.timed('format', rows=True)
 def format_passagens(data: dict) -> list:
     '''Format the data from the table Passagens'''
 
+    data = as_record(Passagem, data)
     datas = []
-    time = data['time'].split('/')[0]
-    for player in data['jogadores']:
+    time = data.time.split('/')[0]
+    for player in data.jogadores:
         datas.append({
-            'id_jogador': int(player['espn_id']),
+            'id_jogador': int(player.espn_id),
             'id_time': int(time),
-            'ano': int(data['temporada'])
+            'ano': int(data.temporada)
         })
     return datas
 
+# Batch counterparts of the format_* functions: many games (or players, teams) at once,
+# returning the table by columns ({column: list of values}) with the types converted per column.
+# They give the same rows as the functions above, see to_rows.
+
+LINEUP_STATUS = {'titulares': 'TITULAR', 'substitutos': 'SUBSTITUTO'} # any other list is RESERVA
+
+def _empty(table: str) -> dict:
+    return {column: [] for column in COLUMNS[table]}
+
+def to_rows(columns: dict) -> list:
+    '''Rows (dicts) of a table given by columns'''
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+@metrics.timed('format', rows=True)
+def format_lances_batch(games, indexes: dict | None = None) -> dict:
+    '''
+    Table Lances of many games (dicts of get_datas_from_comentarios) by columns,
+    indexes: {id of the game: resolution.Index} to resolve the names as format_lances
+    '''
+    columns = _empty('lances')
+    for data in games:
+        data = as_record(Lances, data)
+        index = indexes.get(data.partida) if indexes is not None else None
+        if index is not None:
+            for column, values in zip(columns.values(), zip(*(row.values() for row in _lances_rows(data, index)))):
+                column.extend(values)
+            continue
+        plays = data.lances
+        columns['id_partida'].extend([data.partida] * len(plays))
+        columns['jogador_1'].extend([play.jogador_1 for play in plays])
+        columns['jogador_2'].extend([play.jogador_2 for play in plays])
+        columns['tipo'].extend([play.tipo for play in plays])
+        columns['minuto'].extend([play.minuto for play in plays])
+        columns['descricao'].extend([play.descricao for play in plays])
+        columns['time'].extend([play.time for play in plays])
+    return columns
+
+@metrics.timed('format', rows=True)
+def format_estatisticas_batch(games) -> dict:
+    '''Table EstatisticasPartida of many games (dicts of get_datas_from_estatisticas) by columns'''
+
+    teams, ids = [], []
+    for data in games:
+        data = as_record(Partida, data)
+        teams.extend((as_record(EstatisticaTime, data.mandante), as_record(EstatisticaTime, data.visitante)))
+        ids.extend((data.partida, data.partida))
+    return {
+        'id_partida': ids,
+        'id_time': [team.time for team in teams],
+        'chute_gol': list(map(int, (team.chute_gol for team in teams))),
+        'gol': list(map(int, (team.gols for team in teams))),
+        'chute': list(map(int, (team.chute for team in teams))),
+        'defesa': list(map(int, (team.defesas for team in teams))),
+        'posse': list(map(float, (team.posse for team in teams))),
+    }
+
+@metrics.timed('format', rows=True)
+def format_partidas_batch(games) -> dict:
+    '''Table Partidas of many games (dicts of get_datas_from_estatisticas) by columns'''
+
+    games = [as_record(Partida, data) for data in games]
+    return {
+        'espn_id': list(map(int, (data.partida for data in games))),
+        'local_': [data.local for data in games],
+        'estadio': [data.estadio for data in games],
+        'campeonato': [data.campeonato for data in games],
+        'arbitro': [data.arbitro for data in games],
+        'data_': [data.data for data in games],
+        'horario': [data.horario for data in games],
+        'audiencia': [int(data.audiencia) if data.audiencia is not None else None for data in games],
+    }
+
+@metrics.timed('format', rows=True)
+def format_escalacoes_batch(games) -> dict:
+    '''Table Escalacoes of many games (dicts of get_lineup) by columns, home team first as in format_escalacoes'''
+
+    columns = _empty('escalacoes')
+    for data in games:
+        game = int(data['partida'])
+        for team in list(data.keys())[1:3]:
+            for key, players in data[team].items():
+                if players is None:
+                    continue
+                columns['time'].extend([team] * len(players))
+                columns['partida'].extend([game] * len(players))
+                columns['jogador'].extend(map(int, players))
+                columns['status_'].extend([LINEUP_STATUS.get(key, 'RESERVA')] * len(players))
+    return columns
+
+@metrics.timed('format', rows=True)
+def format_jogadores_batch(players) -> dict:
+    '''Table Jogadores of many players (of the casts of get_cast) by columns'''
+
+    players = [as_record(Jogador, player) for player in players]
+    return {
+        'nome': [player.nome for player in players],
+        'espn_id': list(map(int, (player.espn_id for player in players))),
+        'posicao': [player.posicao for player in players],
+        'idade': list(map(int, (player.idade for player in players))),
+        'altura': [float(player.altura.replace(' m', '')) if player.altura != None else None for player in players],
+        'nacionalidade': [player.nacionalidade for player in players],
+    }
+
+@metrics.timed('format', rows=True)
+def format_passagens_batch(casts) -> dict:
+    '''Table Passagens of many casts (dicts of get_cast) by columns'''
+
+    columns = _empty('passagens')
+    for data in casts:
+        data = as_record(Passagem, data)
+        players = data.jogadores
+        columns['id_jogador'].extend(map(int, (player.espn_id for player in players)))
+        columns['id_time'].extend([int(data.time.split('/')[0])] * len(players))
+        columns['ano'].extend([int(data.temporada)] * len(players))
+    return columns
+
+@metrics.timed('format', rows=True)
+def format_times_batch(teams) -> dict:
+    '''Table Times of many teams (items of get_teams_id) by columns'''
+
+    items = [next(iter(data.items())) for data in teams]
+    return {
+        'nome': [name for name, id in items],
+        'espn_id': [int(id.split('/')[0]) for name, id in items],
+    }
+
 def save_toCSV(datas: list, filename: str, columns: list[str]) -> None:
 
+    if isinstance(datas, dict): # columns of the *_batch functions
+        datas = to_rows(datas)
     # Verify the file path and create the directory if needed
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     with open(filename, 'w', newline='', encoding='utf-8') as file:
@@ -134,11 +318,68 @@ def save_toCSV(datas: list, filename: str, columns: list[str]) -> None:
             writer.writerow(data)
         file.close()
 
-def data_formatting(data: dict, table: str) -> list | dict:
-    '''Formating the data to a save in the database'''
+def merge_toCSV(datas: list, filename: str, columns: list[str], key: list[str]) -> None:
+    '''
+    Add the rows to an existing csv. The rows of the file with the same key
+    (e.g. the same game) are replaced by the new ones, the others are kept.
+    '''
+    if isinstance(datas, dict): # columns of the *_batch functions
+        datas = to_rows(datas)
+    if not os.path.exists(filename):
+        save_toCSV(datas, filename, columns)
+        return
+
+    new_keys = {tuple(str(data[k]) for k in key) for data in datas}
+    with open(filename, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is not None and header != columns:
+            logging.warning(f'Columns of {filename} differ from {columns}, matching by position')
+        positions = [columns.index(k) for k in key]
+        old = [row for row in reader if len(row) == len(columns)]
+
+    if not any(tuple(row[i] for i in positions) in new_keys for row in old):
+        # Only new rows: appending is enough
+        with open(filename, 'a', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            for data in datas:
+                writer.writerow(data)
+        return
+
+    kept = [dict(zip(columns, row)) for row in old if tuple(row[i] for i in positions) not in new_keys]
+    temp = filename + '.tmp'
+    save_toCSV(kept + list(datas), temp, columns)
+    os.replace(temp, filename)
+
+def remove_fromCSV(filename: str, columns: list[str], key: str, values: set) -> None:
+    '''Remove the rows whose key column is in values, reading the file line by line'''
+
+    values = {str(value) for value in values}
+    position = columns.index(key)
+    temp = filename + '.tmp'
+    removed = 0
+    with open(filename, 'r', newline='', encoding='utf-8') as source, \
+         open(temp, 'w', newline='', encoding='utf-8') as target:
+        reader = csv.reader(source)
+        writer = csv.writer(target)
+        header = next(reader, None)
+        if header is not None:
+            writer.writerow(header)
+        for row in reader:
+            if len(row) > position and row[position] in values:
+                removed += 1
+                continue
+            writer.writerow(row)
+    if removed:
+        os.replace(temp, filename)
+    else:
+        os.remove(temp)
+
+def data_formatting(data: dict | Record | Lances, table: str) -> list | dict:
+    '''Formating the data (the dicts or the records of the scrapers) to a save in the database'''
 
-    if not isinstance(data, dict):
-        print('data should be a dictionary')
+    if not isinstance(data, (dict, Record, Lances)):
+        print('data should be a dictionary or a record')
         return []
     elif not isinstance(table, str):
         print('table should be a string')
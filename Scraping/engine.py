@@ -0,0 +1,97 @@
+'''
+This module fetches and parses the pages of many games at the same time.
+The three pages of a game (estatisticas, comentario and escalacoes) are requested
+in parallel and several games are kept in flight, but the results always come
+back in the same order as the given IDs.
+'''
+
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import scraping as sc
+import transport
+import metrics
+
+# Page type -> function that fetches and parses it
+PAGES = {
+    'estatisticas': sc.get_datas_from_estatisticas,
+    'lances': sc.get_datas_from_comentarios,
+    'escalacoes': sc.get_lineup,
+}
+
+def _safe_call(page: str, id: str, league: str = 'bra.1') -> dict | None:
+    '''Run the scraper of a page, an error in one page must not stop the other games'''
+
+    try:
+        return PAGES[page](id, league)
+    except Exception as error:
+        metrics.count('failures', stage='game', name=page)
+        logging.error(f'Error getting {page} from game {id}: {error!r}')
+        return None
+
+def iter_games(ids: list, workers: int = 8, per_host: int | None = 6, games_in_flight: int | None = None,
+               pages: dict | None = None, league: str = 'bra.1'):
+    '''
+    Yield (id, {'estatisticas': ..., 'lances': ..., 'escalacoes': ...}) for each game, in the order of ids.
+    workers: number of threads fetching pages.
+    per_host: maximum number of simultaneous requests to the same host.
+    games_in_flight: how many games are requested ahead of the one being yielded (default: workers).
+    pages: optional {id: [page types]} to fetch only some pages of a game (default: all of PAGES).
+    league: league of the games (for the summary API).
+    '''
+    if per_host is not None:
+        transport.get_transport().set_host_limit(per_host)
+    games_in_flight = games_in_flight or workers
+
+    ids = iter(ids)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit() -> bool:
+            id = next(ids, None)
+            if id is None:
+                return False
+            id = str(id)
+            game_pages = pages.get(id, PAGES) if pages is not None else PAGES
+            pending.append((id, {page: executor.submit(_safe_call, page, id, league) for page in game_pages}))
+            return True
+
+        while len(pending) < games_in_flight and submit():
+            pass
+        while pending:
+            id, futures = pending.popleft()
+            result = {page: future.result() for page, future in futures.items()}
+            submit()
+            yield id, result
+
+async def _fetch_games_async(ids: list, workers: int, league: str = 'bra.1') -> list:
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    loop.set_default_executor(executor)
+    semaphore = asyncio.Semaphore(workers)
+
+    async def fetch_page(page: str, id: str):
+        async with semaphore:
+            return await asyncio.to_thread(_safe_call, page, id, league)
+
+    async def fetch_game(id: str):
+        results = await asyncio.gather(*(fetch_page(page, id) for page in PAGES))
+        return id, dict(zip(PAGES, results))
+
+    return await asyncio.gather(*(fetch_game(str(id)) for id in ids))
+
+def fetch_games(ids: list, workers: int = 8, per_host: int | None = 6, mode: str = 'threads',
+                league: str = 'bra.1') -> list:
+    '''
+    Fetch and parse every game, returning a list of (id, results) in the order of ids.
+    mode: 'threads' (thread pool) or 'asyncio' (event loop delegating the blocking requests to threads).
+    league: league of the games (for the summary API).
+    '''
+    if mode == 'threads':
+        return list(iter_games(ids, workers=workers, per_host=per_host, league=league))
+    elif mode == 'asyncio':
+        if per_host is not None:
+            transport.get_transport().set_host_limit(per_host)
+        return asyncio.run(_fetch_games_async(ids, workers, league))
+    else:
+        raise ValueError(f'Unknown mode: {mode}')
@@ -0,0 +1,96 @@
+'''
+This module keeps, in one place, the tags and classes read from each page type of ESPN
+and collects all of them in a single walk over the tree of the page.
+'''
+
+from collections import namedtuple
+from bs4 import BeautifulSoup, Tag
+
+SCORE = 'Gamestrip__Score relative tc w-100 fw-heavy-900 h2 clr-gray-01'
+TEAM_NAME = 'ScoreCell__TeamName ScoreCell__TeamName--displayName db'
+
+# Page type -> {field: (tag, class, many)}
+# As in find_all(class_=...), a class with spaces must be the whole class attribute of the tag
+# and a class without spaces can be one of the classes of the tag.
+# many=True collects every tag in document order, many=False only the first one (or None).
+SPECS = {
+    'resultados': {
+        'no_data': ('h4', 'n5 tc pv6 clr-gray-05', False),
+        'links': ('a', 'AnchorLink Button Button--sm Button--anchorLink Button--alt mb4 w-100 mr2', True),
+    },
+    'estatisticas': {
+        'scores': ('div', SCORE, True),
+        'team_names': ('h2', TEAM_NAME, True),
+        'stats': ('span', 'bLeWt ZfQkn JoGSb hsDdd ICQCm', True),
+        'posse_mandante': ('span', 'bLeWt ZfQkn JoGSb VZTD pgHdv uHRs', False),
+        'posse_visitante': ('span', 'bLeWt ZfQkn JoGSb VZTD nljvg', False),
+        'campeonato': ('div', 'ScoreCell__GameNote di', False),
+        'estadio': ('div', 'n6 clr-gray-03 GameInfo__Location__Name--noImg', False),
+        'meta': ('div', 'n8 GameInfo__Meta', False),
+        'local': ('span', 'Location__Text', False),
+        'audiencia': ('div', 'Attendance__Numbers', False),
+        'arbitro': ('li', 'GameInfo__List__Item', False),
+        'clock': ('div', 'Gamestrip__Time', False),
+    },
+    'comentario': {
+        'scores': ('div', SCORE, True),
+        'minutes': ('div', 'MatchCommentary__Comment__Timestamp', True),
+        'comments': ('div', 'MatchCommentary__Comment__GameDetails', True),
+    },
+    'escalacoes': {
+        'scores': ('div', SCORE, True),
+        'team_names': ('h2', TEAM_NAME, True),
+        'players_tables': ('div', 'ResponsiveTable LineUps__PlayersTable', True),
+        'substitutes_tables': ('div', 'ResponsiveTable LineUps__SubstitutesTable', True),
+    },
+    'classificacao': {
+        'teams': ('span', 'hide-mobile', True),
+    },
+    'elenco': {
+        'lines': ('tr', 'Table__TR Table__TR--sm Table__even', True),
+    },
+}
+
+# Typed record returned by extract for each page type
+RECORDS = {page_type: namedtuple(f'{page_type.capitalize()}Record', spec) for page_type, spec in SPECS.items()}
+
+def _index(spec: dict) -> tuple:
+    '''Split the fields by the way the class is compared: whole attribute or single class'''
+
+    whole, single = {}, {}
+    for field, (name, class_, many) in spec.items():
+        target = whole if ' ' in class_ else single
+        target.setdefault((name, class_), []).append((field, many))
+    return whole, single
+
+INDEXES = {page_type: _index(spec) for page_type, spec in SPECS.items()}
+
+def classes(page_type: str) -> list:
+    '''Every class read from a page type (used to build the SoupStrainer of the page)'''
+    return [class_ for name, class_, many in SPECS[page_type].values()]
+
+def extract(page: BeautifulSoup, page_type: str):
+    '''Walk the tree of the page once and return the record of the page type with the tags found'''
+
+    whole, single = INDEXES[page_type]
+    values = {field: [] if many else None for field, (name, class_, many) in SPECS[page_type].items()}
+
+    for tag in page.descendants:
+        if not isinstance(tag, Tag):
+            continue
+        tag_classes = tag.get('class')
+        if not tag_classes:
+            continue
+
+        matches = whole.get((tag.name, ' '.join(tag_classes)), [])
+        for class_ in tag_classes:
+            matches = matches + single.get((tag.name, class_), [])
+
+        for field, many in matches:
+            if many:
+                if not values[field] or values[field][-1] is not tag:
+                    values[field].append(tag)
+            elif values[field] is None:
+                values[field] = tag
+
+    return RECORDS[page_type](**values)
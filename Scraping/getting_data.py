@@ -1,94 +1,137 @@
 '''
-This script is responsible for getting the data from the games and saving them in csv files.
+This script is responsible for getting the data from the games and saving them in csv files and in the database.
+The steps can also be run apart by cli.py (discover, squads, games, format, export).
+
+Usage: python getting_data.py [first day YYYYMMDD] [season] [league] [--no-columnar]
 '''
 
+import os
+import sys
 import scraping as sc
 import logging
-import data_format as df
-
-# Configurando o log
-logging.basicConfig(filename='getting_data.log', level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
-
-# obtendo os links dos jogos desde a primeira rodada 2024-04-13
-print('Getting games links...')
-jogos = sc.get_all_games(20240413) 
-print(f'+{len(jogos)} Games links obtained!')
-
-# Obterndo os dados de cada jogo
-dados = {
-    'estatisticas': [],
-    'lances': [],
-    'escalacoes': [],
-}
-
-print('Getting data from games...')
-for jogo in jogos.values():
-    if jogo is None:
-        continue
-    for id in jogo:
-        logging.info(f'Getting data from game {id}')
-        dados['estatisticas'].append(sc.get_datas_from_estatisticas(str(id)))
-        dados['lances'].append(sc.get_datas_from_comentarios(str(id)))
-        dados['escalacoes'].append(sc.get_lineup(str(id)))
-
-# Formatando os dados para utiliza-los no banco de dados
-print('Formatting data...')
-estatisticas, escalacoes, lances, partidas = [], [], [], []
-
-for i in range(len(dados['estatisticas'])):
-    if not dados['estatisticas'][i] is None:
-        aux = df.format_estatisticas_partida(dados['estatisticas'][i])
-        for e in aux:
-            estatisticas.append(e) 
-        partidas.append(df.format_partidas(dados['estatisticas'][i]))
-    
-    if not dados['lances'][i] is None:
-        aux = df.format_lances(dados['lances'][i])
-        for e in aux:
-            lances.append(e)
-    
-    if not dados['escalacoes'][i] is None:
-        aux = df.format_escalacoes(dados['escalacoes'][i])
-        for team in aux:
-            for e in team:
-                escalacoes.append(e)
-
-# Obtendo os dados dos times e jogadores
-print('Getting players...')
-times_id = sc.get_teams_id()
-elencos = []
-for time in times_id:
-    if time is None:
-        continue
-    for nome, id in time.items():
-        elencos.append(sc.get_cast(id))
-
-print('Formatting data...')
-jogadores, passagens = [], []
-for time in elencos:
-    if time is None:
-        continue
-    for jogador in time['jogadores']:
-        jogadores.append(df.format_jogadores(jogador))
-    aux = df.format_passagens(time)
-    for e in aux:
-        passagens.append(e)
-
-times = []
-for time in times_id:
-    if time is None:
-        continue
-    times.append(df.format_times(time))
-
-# Salvando os dados em arquivos csv (cada csv é uma tabela do banco de dados)
-print('Saving informations...')
-df.save_toCSV(estatisticas, 'Datas/estatisticas.csv', ['id_partida', 'id_time', 'chute_gol', 'gol', 'chute', 'defesa', 'posse'])
-df.save_toCSV(escalacoes, 'Datas/escalacoes.csv', ['time', 'partida', 'jogador', 'status_'])
-df.save_toCSV(lances, 'Datas/lances.csv', ['id_partida', 'jogador_1', 'jogador_2', 'tipo', 'minuto', 'descricao', 'time'])
-df.save_toCSV(partidas, 'Datas/partidas.csv', ['espn_id', 'local_', 'estadio', 'campeonato', 'arbitro', 'data_', 'horario', 'audiencia'])
-df.save_toCSV(jogadores, 'Datas/jogadores.csv', ['nome', 'espn_id', 'posicao', 'idade', 'altura', 'nacionalidade'])
-df.save_toCSV(passagens, 'Datas/passagens.csv', ['id_jogador', 'id_time', 'ano'])
-df.save_toCSV(times, 'Datas/times.csv', ['nome', 'espn_id'])
-
-print('Sucessfull operation!!')
+import transport
+import engine
+import matchdays
+import cache
+import ratelimit
+import checkpoint as ckpt
+import pipeline
+import loader
+import comment_coverage
+import resolution
+import squads
+import metrics
+
+def main(inicio: int = 20240413, temporada: int = 2024, liga: str = 'bra.1', pasta: str = 'Datas',
+         colunar: bool = True) -> None:
+    '''Jogos desde inicio, times e jogadores da temporada salvos nos csv de pasta, no banco e na copia colunar (se colunar)'''
+
+    # Configurando o log: INFO com os eventos de cada pagina amostrados (metrics.event), sem o DEBUG
+    # do urllib3 (uma linha por conexao); os tempos de cada etapa ficam nas metricas
+    logging.basicConfig(filename='getting_data.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    metrics.quiet_libraries()
+
+    # Uma unica sessao (keep-alive) para todas as paginas, com as paginas ja baixadas em disco.
+    # O limitador adapta o ritmo ao site e repete as paginas com 429/5xx em vez de perder o jogo
+    # As paginas tambem ficam num arquivo comprimido (zstd), para refazer as tabelas sem o site (archive.reparse)
+    try:
+        import archive
+        arquivo = archive.Archive(os.path.join(pasta, 'arquivo'))
+    except ImportError:
+        logging.warning('zstandard not installed, the pages are not archived')
+        arquivo = None
+    transport.configure(pool_size=10, timeout=(5, 30), compression=True, cache=cache.PageCache('.cache/pages'),
+                        limiter=ratelimit.RateLimiter(rate=10, burst=10, concurrency=4, max_concurrency=10),
+                        archive=arquivo)
+
+    # lxml quando instalado (mais rapido que html.parser)
+    sc.set_parser('auto')
+
+    # Dados dos jogos pelo resumo JSON da ESPN (uma requisicao por jogo), lendo a pagina quando ele falta
+    sc.set_extraction('json')
+
+    # Banco SQLite com o esquema de DataBase/creates.sql, preenchido direto pelas linhas formatadas
+    banco = loader.Loader(loader.SQLiteBackend(os.path.join(pasta, 'espn.sqlite')), batch_size=1000)
+
+    # Comentarios sem regra sao agrupados por modelo para orientar novas regras
+    cobertura = comment_coverage.Coverage(os.path.join(pasta, 'cobertura.json'))
+    sc.set_coverage(cobertura)
+
+    # obtendo os links dos jogos desde o inicio (a primeira rodada de 2024 foi em 2024-04-13)
+    print('Getting games links...')
+    jogos = dict(sc.iter_all_games(inicio, league=liga, workers=8, calendar=matchdays.Calendar(os.path.join(pasta, 'calendario.json'))))
+    print(f'+{len(jogos)} Games links obtained!')
+
+    # Obtendo os dados dos times e jogadores: os elencos sao baixados em paralelo e cada jogador
+    # entra uma vez no indice por espn_id; os ja salvos nos csv nao sao formatados de novo
+    print('Getting players...')
+    indice = squads.collect([temporada], liga, workers=8, index=squads.PlayerIndex().load(pasta))
+
+    # Salvando as linhas novas nos csv (cada csv é uma tabela do banco de dados)
+    print('Saving informations...')
+    tabelas = indice.save(pasta)
+
+    # Times, jogadores e passagens antes dos jogos, para resolver as chaves estrangeiras dos lances
+    for tabela in ('times', 'jogadores', 'passagens'):
+        banco.load(tabela, tabelas[tabela])
+
+    # Copia colunar (Parquet) particionada por temporada e liga, uma nova parte a cada execucao.
+    # columnar (pandas) so e importado aqui, quando a copia e pedida
+    sinks = []
+    if colunar:
+        import columnar
+        for tabela, linhas in tabelas.items():
+            columnar.write_table(linhas, tabela, os.path.join(pasta, 'colunar'), season=temporada, league=liga)
+        sinks.append(columnar.ColumnarSink(os.path.join(pasta, 'colunar'), season=temporada, league=liga))
+
+    # Nomes dos lances (jogadores e times) trocados pelos ids da ESPN, pelas escalacoes e elencos
+    elencos_temporada = indice.rosters(temporada)
+    nao_resolvidos = resolution.Report(os.path.join(pasta, 'nao_resolvidos.json'))
+
+    # Jogos (e paginas) ja salvos em execucoes anteriores nao sao baixados de novo
+    checkpoint = ckpt.Checkpoint(os.path.join(pasta, 'checkpoint.sqlite'))
+    ids = [id for data in sorted(jogos) for id in jogos[data]]
+    pendentes = checkpoint.pending(ids)
+    print(f'{len(pendentes)} games to update')
+
+    def jogos_baixados():
+        '''Jogos obtidos pelo engine, registrados no checkpoint assim que chegam'''
+
+        for id, paginas in engine.iter_games(list(pendentes), workers=8, per_host=6, pages=pendentes, league=liga):
+            metrics.event('game', id=id, pages=','.join(paginas))
+            checkpoint.mark_pages(id, paginas)
+            yield id, paginas
+
+    # Cada jogo e formatado e escrito nos csv assim que chega (sem guardar a temporada em memoria)
+    print('Getting data from games...')
+    # O banco vem antes dos csv: o checkpoint so marca o jogo depois que os dois foram gravados
+    csv_sink = pipeline.CSVSink(pasta, buffer_size=1000, on_flush=checkpoint.mark_formatted)
+    with pipeline.Tee(loader.DatabaseSink(banco, buffer_size=1000, season=temporada), *sinks, csv_sink) as sink:
+        sink.remove_games(pendentes)
+        pipeline.stream_games(jogos_baixados(), sink, elencos_temporada, nao_resolvidos)
+    cobertura.save()
+    nao_resolvidos.save()
+    print(f'{nao_resolvidos.rate():.2%} of the names in the plays resolved')
+    print(f'{cobertura.rate():.2%} of the comments classified')
+    for item in cobertura.report(10):
+        logging.info(f"Non-standard comments: {item['comentarios']} in {item['jogos']} games: {item['template']}")
+
+    banco.close()
+    logging.info(f'Transport stats: {transport.get_transport().report()}')
+
+    # Metricas da execucao (tempo de cada etapa, bytes, cache, falhas e linhas) para o Prometheus e em JSON
+    metrics.METRICS.add_report('transport', transport.get_transport().report())
+    metrics.METRICS.save(os.path.join(pasta, 'metricas.prom'))
+    metrics.METRICS.save(os.path.join(pasta, 'metricas.json'))
+    for etapa in metrics.METRICS.stages()[:5]:
+        print(f"{etapa['stage']} {etapa['name']}: {etapa['seconds']}s in {etapa['calls']} calls")
+    transport.get_transport().close()
+    print('Sucessfull operation!!')
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    colunar = '--no-columnar' not in args
+    args = [arg for arg in args if arg != '--no-columnar']
+    main(int(args[0]) if len(args) > 0 else 20240413, int(args[1]) if len(args) > 1 else 2024,
+         args[2] if len(args) > 2 else 'bra.1', colunar=colunar)
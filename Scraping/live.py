@@ -0,0 +1,221 @@
+'''
+This module follows games in progress and emits their new lances as a stream of events.
+Each game is polled on its JSON summary (summary.summary_url), without the page cache and with
+conditional requests (If-None-Match/If-Modified-Since, and the digest of the body when the site
+sends no validators), so a poll without news costs a 304 and nothing is decoded or parsed.
+Only the comments not seen yet, keyed by (minute, hash of the text), are classified.
+The interval of each game adapts: back to the shortest one when there are new comments, growing
+while nothing changes, longer before the start and at half time; a game is dropped after the end.
+The summary has a score from the kick-off, so a game in progress is not taken as canceled.
+
+Events (dicts): {'evento': 'status', 'partida', 'status', 'placar'} when the status changes,
+{'evento': 'lance', 'partida', <keys of the plays of get_datas_from_comentarios>} for each new play,
+{'evento': 'comentario', 'partida', 'minuto', 'descricao'} for the comments without rule and
+{'evento': 'fim', 'partida', 'placar'} at the end of the game.
+
+Usage: python live.py <id> [id ...] [--league bra.1]   (the events are printed as JSON lines)
+'''
+
+import sys
+import json
+import time
+import heapq
+import hashlib
+import logging
+import requests
+import transport
+import summary
+import cache
+import commentary
+import metrics
+
+# Seconds between the polls of a game
+MIN_INTERVAL = 10
+MAX_INTERVAL = 60
+PRE_INTERVAL = 120 # before the start
+HALFTIME_INTERVAL = 60
+BACKOFF = 1.5 # growth of the interval at each poll without news
+
+FINISHED = (*cache.FINAL_STATUSES, *summary.CANCELED)
+
+# Returned by LiveGame.fetch when the summary did not change
+NOT_MODIFIED = object()
+
+def comment_key(minute: str, text: str) -> tuple:
+    '''Key of a comment among the ones already emitted'''
+    return minute, hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+def game_status(data: dict) -> tuple:
+    '''(name of the status, 'pre' | 'in' | 'post', score 'home-away') of a summary'''
+
+    competition = data['header']['competitions'][0]
+    status = competition.get('status', {}).get('type', {})
+    name = status.get('name')
+    state = status.get('state')
+    if state is None:
+        if name in FINISHED or status.get('completed'):
+            state = 'post'
+        elif name == 'STATUS_SCHEDULED':
+            state = 'pre'
+        else:
+            state = 'in'
+    teams = sorted(competition['competitors'], key=lambda team: team['homeAway'] != 'home')
+    score = '-'.join(str(team.get('score') or 0) for team in teams)
+    return name, state, score
+
+class LiveGame:
+    '''Polling state of a game: validators of the last answer, comments emitted and interval'''
+
+    def __init__(self, id: str, league: str = 'bra.1', min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL):
+        self.id = str(id)
+        self.league = league
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.seen = set() # keys (comment_key + occurrence) of the comments emitted
+        self.status = None
+        self.state = 'pre'
+        self.polls = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.state == 'post'
+
+    def fetch(self):
+        '''The decoded summary, NOT_MODIFIED, or None when the request failed'''
+
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        self.polls += 1
+        try:
+            with metrics.timer('fetch', 'live'):
+                response = transport.get_transport().get(summary.summary_url(self.id, self.league),
+                                                         cached=False, headers=headers)
+        except requests.RequestException as error:
+            logging.warning(f'Live summary of game {self.id} failed: {error}')
+            return None
+        if response.status_code == 304:
+            metrics.count('live_polls', result='not_modified')
+            return NOT_MODIFIED
+        if response.status_code != 200:
+            metrics.count('live_polls', result='error')
+            logging.warning(f'Live summary of game {self.id}: error {response.status_code}')
+            return None
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if digest == self.digest:
+            metrics.count('live_polls', result='unchanged')
+            return NOT_MODIFIED
+        metrics.count('live_polls', result='changed')
+        metrics.count('bytes', len(response.content), page='live')
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.digest = digest
+        try:
+            return json.loads(response.content)
+        except ValueError:
+            logging.warning(f'Live summary of game {self.id} is not JSON')
+            return None
+
+    def new_comments(self, data: dict) -> list:
+        '''(text, minute) of the comments not emitted yet, in the order of the game'''
+
+        comments = sorted(data.get('commentary') or [], key=lambda comment: int(comment.get('sequence', 0)))
+        occurrences = {}
+        new = []
+        for comment in comments:
+            text = comment.get('text') or ''
+            minute = comment.get('time', {}).get('displayValue', '')
+            key = comment_key(minute, text)
+            # The same text twice in a minute are two comments
+            occurrences[key] = occurrences.get(key, 0) + 1
+            key = (*key, occurrences[key])
+            if key not in self.seen:
+                self.seen.add(key)
+                new.append((text, minute))
+        return new
+
+    def poll(self) -> list:
+        '''Events of the news since the last poll'''
+
+        data = self.fetch()
+        if data is None or data is NOT_MODIFIED:
+            self._adapt(False)
+            return []
+        events = []
+        try:
+            name, state, score = game_status(data)
+        except (KeyError, IndexError, TypeError) as error:
+            logging.warning(f'Live summary of game {self.id} without status ({error!r})')
+            self._adapt(False)
+            return []
+        if name != self.status:
+            events.append({'evento': 'status', 'partida': self.id, 'status': name, 'placar': score})
+            self.status, self.state = name, state
+
+        new = self.new_comments(data)
+        for (text, minute), play in zip(new, commentary.classify(new)):
+            if play is None:
+                events.append({'evento': 'comentario', 'partida': self.id, 'minuto': minute, 'descricao': text})
+            else:
+                events.append({'evento': 'lance', 'partida': self.id, **play.to_dict()})
+        if self.finished:
+            events.append({'evento': 'fim', 'partida': self.id, 'placar': score})
+        self._adapt(bool(new))
+        return events
+
+    def _adapt(self, changed: bool) -> None:
+        if self.state == 'pre':
+            self.interval = max(self.min_interval, PRE_INTERVAL)
+        elif self.status == 'STATUS_HALFTIME':
+            self.interval = max(self.min_interval, HALFTIME_INTERVAL)
+        elif changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * BACKOFF, self.max_interval)
+
+def tail(ids: list, league: str = 'bra.1', min_interval: float = MIN_INTERVAL, max_interval: float = MAX_INTERVAL,
+         clock=time.monotonic, sleep=time.sleep):
+    '''Yield the events of the games until all of them end, polling each one when it is due'''
+
+    games = [LiveGame(id, league, min_interval, max_interval) for id in ids]
+    queue = [(clock(), position, game) for position, game in enumerate(games)]
+    heapq.heapify(queue)
+    while queue:
+        due, position, game = heapq.heappop(queue)
+        wait = due - clock()
+        if wait > 0:
+            sleep(wait)
+        for event in game.poll():
+            metrics.event('live', every=50, evento=event['evento'], partida=event['partida'])
+            yield event
+        if game.finished:
+            logging.info(f'Game {game.id} ended after {game.polls} polls')
+            continue
+        heapq.heappush(queue, (clock() + game.interval, position, game))
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    league = 'bra.1'
+    if '--league' in args:
+        position = args.index('--league')
+        league = args[position + 1]
+        del args[position:position + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(2)
+
+    logging.basicConfig(filename='live.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    metrics.quiet_libraries()
+    try:
+        for event in tail(args, league):
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
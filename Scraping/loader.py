@@ -0,0 +1,532 @@
+'''
+This module writes the formatted rows (see data_format) straight into the tables of
+DataBase/creates.sql, replacing the csv files + LOAD DATA of DataBase/inserts.sql.
+The rows are inserted in batches, one transaction per batch, the ESPN ids and the names
+are resolved to the keys of the database through maps kept in memory, and the tables
+with espn_id are upserted by it. SQLite is built in, MySQL (mysql-connector-python)
+and SQL Server (pyodbc) are used through the same interface when installed.
+
+Usage: python loader.py [directory of the csv files] [SQLite file]
+'''
+
+import os
+import re
+import csv
+import sys
+import logging
+import sqlite3
+from contextlib import contextmanager
+import data_format as df
+import aggregation
+
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'DataBase', 'creates.sql')
+
+# Columns of the tables upserted by espn_id
+ENTITIES = {
+    'Times': ['espn_id', 'nome'],
+    'Jogadores': ['espn_id', 'nome', 'posicao', 'idade', 'altura', 'nacionalidade'],
+    'Partidas': ['espn_id', 'local_', 'estadio', 'campeonato', 'arbitro', 'data_', 'horario', 'audiencia'],
+}
+
+# Order of the tables, each one depends on the previous ones
+TABLES = ['times', 'jogadores', 'partidas', 'passagens', 'estatisticas', 'escalacoes', 'lances']
+
+def read_schema(filename: str = SCHEMA) -> list:
+    '''CREATE TABLE statements of the file'''
+
+    with open(filename, 'r', encoding='utf-8') as file:
+        sql = re.sub(r'^\s*--[^\n]*', '', file.read(), flags=re.MULTILINE) # not the '--' defaults
+    return [statement.strip() for statement in sql.split(';') if statement.strip()]
+
+def _table_name(statement: str) -> str:
+    return re.match(r'CREATE TABLE\s+(\w+)', statement).group(1)
+
+class SQLiteBackend:
+    '''Database in a SQLite file, the schema of MySQL is translated when created'''
+
+    placeholder = '?'
+
+    def __init__(self, filename: str = 'Datas/espn.sqlite'):
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+
+    def create_schema(self, statements: list) -> None:
+        for statement in statements:
+            statement = re.sub(r'\bid INT AUTO_INCREMENT', 'id INTEGER PRIMARY KEY AUTOINCREMENT', statement)
+            statement = re.sub(r',\s*CONSTRAINT \w+ PRIMARY KEY\s*\(id\)', '', statement)
+            statement = re.sub(r'YEAR DEFAULT\s+YEAR\(CURRENT_DATE\(\)\)', 'INTEGER', statement)
+            statement = statement.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1)
+            self.connection.execute(statement)
+        self.connection.commit()
+
+    def upsert(self, table: str, columns: list, key: str) -> str:
+        values = ', '.join(self.placeholder for _ in columns)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != key)
+        return (f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({values}) '
+                f'ON CONFLICT({key}) DO UPDATE SET {updates}')
+
+    def executemany(self, cursor, sql: str, rows: list) -> None:
+        cursor.executemany(sql, rows)
+
+    def has_trigger(self, name: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                                       (name,)).fetchone() is not None
+
+    def create_temp(self, cursor, name: str, columns: list) -> str:
+        '''Create (or empty) a temporary table (id, columns...) of integers, returns its name'''
+
+        cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS {name} (id INTEGER PRIMARY KEY, '
+                       f'{", ".join(f"{column} INTEGER" for column in columns)})')
+        cursor.execute(f'DELETE FROM {name}')
+        return name
+
+    def add_join(self, table: str, source: str, columns: list) -> str:
+        '''UPDATE adding to the columns of table the ones of source with the same id'''
+
+        sets = ', '.join(f'{column} = {table}.{column} + s.{column}' for column in columns)
+        return f'UPDATE {table} SET {sets} FROM {source} AS s WHERE {table}.id = s.id'
+
+    def close(self) -> None:
+        self.connection.close()
+
+class MySQLBackend(SQLiteBackend):
+    '''MySQL database, connect_args are given to mysql.connector.connect (host, user, password, database...)'''
+
+    placeholder = '%s'
+
+    def __init__(self, **connect_args):
+        import mysql.connector
+        self.connection = mysql.connector.connect(**connect_args)
+
+    def create_schema(self, statements: list) -> None:
+        cursor = self.connection.cursor()
+        for statement in statements:
+            cursor.execute(statement.replace('CREATE TABLE', 'CREATE TABLE IF NOT EXISTS', 1))
+        self.connection.commit()
+
+    def upsert(self, table: str, columns: list, key: str) -> str:
+        values = ', '.join(self.placeholder for _ in columns)
+        updates = ', '.join(f'{column} = VALUES({column})' for column in columns if column != key)
+        return f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({values}) ON DUPLICATE KEY UPDATE {updates}'
+
+    def has_trigger(self, name: str) -> bool:
+        cursor = self.connection.cursor()
+        cursor.execute('SELECT 1 FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s',
+                       (name,))
+        found = cursor.fetchone() is not None
+        cursor.close()
+        return found
+
+    def create_temp(self, cursor, name: str, columns: list) -> str:
+        cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {name} (id INT PRIMARY KEY, '
+                       f'{", ".join(f"{column} INT" for column in columns)})')
+        cursor.execute(f'DELETE FROM {name}')
+        return name
+
+    def add_join(self, table: str, source: str, columns: list) -> str:
+        sets = ', '.join(f't.{column} = t.{column} + s.{column}' for column in columns)
+        return f'UPDATE {table} t JOIN {source} s ON s.id = t.id SET {sets}'
+
+class MSSQLBackend(SQLiteBackend):
+    '''SQL Server database, connection is the ODBC connection string given to pyodbc'''
+
+    placeholder = '?'
+
+    def __init__(self, connection: str):
+        import pyodbc
+        self.connection = pyodbc.connect(connection)
+
+    def create_schema(self, statements: list) -> None:
+        cursor = self.connection.cursor()
+        for statement in statements:
+            statement = statement.replace('AUTO_INCREMENT', 'IDENTITY(1, 1)')
+            statement = re.sub(r'YEAR DEFAULT\s+YEAR\(CURRENT_DATE\(\)\)', 'SMALLINT DEFAULT YEAR(GETDATE())', statement)
+            statement = re.sub(r'\bREAL\b', 'FLOAT', statement)
+            cursor.execute(f"IF OBJECT_ID('{_table_name(statement)}') IS NULL {statement}")
+        self.connection.commit()
+
+    def upsert(self, table: str, columns: list, key: str) -> str:
+        values = ', '.join(self.placeholder for _ in columns)
+        updates = ', '.join(f'target.{column} = source.{column}' for column in columns if column != key)
+        return (f'MERGE INTO {table} AS target USING (VALUES ({values})) AS source ({", ".join(columns)}) '
+                f'ON target.{key} = source.{key} '
+                f'WHEN MATCHED THEN UPDATE SET {updates} '
+                f'WHEN NOT MATCHED THEN INSERT ({", ".join(columns)}) '
+                f'VALUES ({", ".join("source." + column for column in columns)});')
+
+    def executemany(self, cursor, sql: str, rows: list) -> None:
+        cursor.fast_executemany = True
+        cursor.executemany(sql, rows)
+
+    def has_trigger(self, name: str) -> bool:
+        return self.connection.cursor().execute('SELECT 1 FROM sys.triggers WHERE name = ?', name).fetchone() is not None
+
+    def create_temp(self, cursor, name: str, columns: list) -> str:
+        cursor.execute(f"IF OBJECT_ID('tempdb..#{name}') IS NULL CREATE TABLE #{name} (id INT PRIMARY KEY, "
+                       f'{", ".join(f"{column} INT" for column in columns)})')
+        cursor.execute(f'DELETE FROM #{name}')
+        return f'#{name}'
+
+    def add_join(self, table: str, source: str, columns: list) -> str:
+        sets = ', '.join(f't.{column} = t.{column} + s.{column}' for column in columns)
+        return f'UPDATE t SET {sets} FROM {table} t JOIN {source} s ON s.id = t.id'
+
+def _value(value):
+    # Empty fields of the csv files are NULL in the database
+    return None if value == '' else value
+
+def _espn_id(value) -> int | None:
+    # Lances resolved by resolution.Index have ESPN ids instead of names
+    if isinstance(value, int):
+        return value
+    return int(value) if isinstance(value, str) and value.isdigit() else None
+
+def _season(campeonato: str | None) -> int | None:
+    # The season starts the name of the championship, e.g. '2024 Brasileiro Serie A '
+    match = re.match(r'\s*(\d{4})', campeonato or '')
+    return int(match.group(1)) if match else None
+
+def _batches(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class Loader:
+    '''
+    Loads the formatted rows of each table into the database of the backend.
+    batch_size: rows of each executemany (and of each transaction).
+    aggregate: keep the counters of Passagens from the lances loaded (see aggregation),
+    turned off when the database has the trigger insert_Lance doing it.
+    The rows of a game already in the database (estatisticas, escalacoes, lances) are replaced.
+    '''
+
+    def __init__(self, backend, batch_size: int = 1000, schema: str | None = SCHEMA, aggregate: bool = True):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.stats = {'rows': 0, 'batches': 0, 'unresolved': 0}
+        if schema is not None:
+            backend.create_schema(read_schema(schema))
+        self.aggregate = aggregate
+        if aggregate and backend.has_trigger('insert_Lance'):
+            logging.warning('The trigger insert_Lance keeps the counters of Passagens, aggregation turned off')
+            self.aggregate = False
+        self._replaced = {'EstatisticasPartida': set(), 'Escalacoes': set(), 'Lances': set()}
+        self._load_maps()
+
+    @contextmanager
+    def transaction(self):
+        '''Cursor of a transaction, rolled back if the batch fails'''
+
+        cursor = self.backend.connection.cursor()
+        try:
+            yield cursor
+            self.backend.connection.commit()
+        except Exception:
+            self.backend.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        cursor = self.backend.connection.cursor()
+        try:
+            cursor.execute(sql.replace('?', self.backend.placeholder), params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _load_maps(self) -> None:
+        '''espn_id -> id of the tables and the names used by the csv files, read from the database'''
+
+        self.ids = {table: {int(espn_id): id for espn_id, id in self._query(f'SELECT espn_id, id FROM {table}')}
+                    for table in ENTITIES}
+        self.team_names = {nome: id for id, nome in self._query('SELECT id, nome FROM Times')}
+        self.player_names = {id: nome for id, nome in self._query('SELECT id, nome FROM Jogadores')}
+        self.passagens = {} # (id_jogador, id_time, ano) -> id
+        self.team_players = {} # (id_time, id_jogador) -> id of the last passagem
+        self.last_passagem = {} # id_jogador -> id of the last passagem
+        self.names = {} # (id_time, nome) -> id of the last passagem
+        self.name_players = {} # nome -> ids of the players with the name
+        self.game_seasons = {espn_id: _season(campeonato) for espn_id, campeonato in self._query(
+            'SELECT espn_id, campeonato FROM Partidas')} # espn_id of the game -> season
+        self._last_id = 0
+        self._read_passagens()
+
+    def _read_passagens(self) -> None:
+        # Only the passagens created after the last read
+        for id, jogador, time, ano in self._query(
+                'SELECT id, id_jogador, id_time, ano FROM Passagens WHERE id > ? ORDER BY ano, id', (self._last_id,)):
+            self.passagens[(jogador, time, int(ano) if ano is not None else None)] = id
+            self.team_players[(time, jogador)] = id
+            self.last_passagem[jogador] = id
+            nome = self.player_names.get(jogador)
+            if nome is not None:
+                self.names[(time, nome)] = id
+                self.name_players.setdefault(nome, set()).add(jogador)
+            self._last_id = max(self._last_id, id)
+
+    def _count(self, rows: int) -> None:
+        self.stats['rows'] += rows
+        self.stats['batches'] += 1
+
+    def _upsert_entities(self, table: str, rows) -> None:
+        columns = ENTITIES[table]
+        sql = self.backend.upsert(table, columns, 'espn_id')
+        for batch in _batches(rows, self.batch_size):
+            values = [tuple(_value(row.get(column)) for column in columns) for row in batch]
+            keys = [int(row['espn_id']) for row in batch]
+            with self.transaction() as cursor:
+                self.backend.executemany(cursor, sql, values)
+            found = self._query(f'SELECT espn_id, id FROM {table} WHERE espn_id IN ({", ".join("?" for _ in keys)})',
+                                tuple(keys))
+            self.ids[table].update({int(espn_id): id for espn_id, id in found})
+            if table == 'Times':
+                self.team_names.update({row['nome']: self.ids['Times'][int(row['espn_id'])] for row in batch})
+            elif table == 'Jogadores':
+                self.player_names.update({self.ids['Jogadores'][int(row['espn_id'])]: row['nome'] for row in batch})
+            self._count(len(batch))
+
+    def load_times(self, rows) -> None:
+        self._upsert_entities('Times', rows)
+
+    def load_jogadores(self, rows) -> None:
+        self._upsert_entities('Jogadores', rows)
+
+    def load_partidas(self, rows) -> None:
+        rows = list(rows)
+        self._upsert_entities('Partidas', rows)
+        self.game_seasons.update({int(row['espn_id']): _season(row.get('campeonato')) for row in rows})
+
+    def _insert(self, table: str, columns: list, values: list) -> None:
+        '''Insert a batch of rows in one transaction'''
+
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(self.backend.placeholder for _ in columns)})'
+        with self.transaction() as cursor:
+            self.backend.executemany(cursor, sql, values)
+        self._count(len(values))
+
+    def _new_passagens(self, keys: list) -> None:
+        '''Create the passagens (id_jogador, id_time, ano) not in the database yet'''
+
+        keys = [key for key in dict.fromkeys(keys) if key not in self.passagens]
+        for batch in _batches(keys, self.batch_size):
+            self._insert('Passagens', ['id_jogador', 'id_time', 'ano'], batch)
+        if keys:
+            self._read_passagens()
+
+    def load_passagens(self, rows) -> None:
+        '''Rows of data_format.format_passagens (ESPN ids of the player and of the team)'''
+
+        keys = []
+        for row in rows:
+            jogador = self.ids['Jogadores'].get(int(row['id_jogador']))
+            time = self.ids['Times'].get(int(row['id_time']))
+            if jogador is None or time is None:
+                self.stats['unresolved'] += 1
+                continue
+            keys.append((jogador, time, int(row['ano'])))
+        self._new_passagens(keys)
+
+    def _replace_games(self, cursor, table: str, column: str, games: list) -> None:
+        if games:
+            cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({", ".join(self.backend.placeholder for _ in games)})',
+                           tuple(games))
+            self._replaced[table].update(games)
+
+    def _load_game_rows(self, table: str, columns: list, rows, resolve, on_batch=None) -> None:
+        '''
+        resolve(row) -> tuple of values (the first one is the id of the game) or None when it is not resolved.
+        on_batch(loader, cursor, replaced games, values) runs in the transaction of each batch, before the old rows are deleted.
+        '''
+
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(self.backend.placeholder for _ in columns)})'
+        for batch in _batches(rows, self.batch_size):
+            values = []
+            for row in batch:
+                value = resolve(row)
+                if value is None:
+                    self.stats['unresolved'] += 1
+                    continue
+                values.append(value)
+            # The rows of a game loaded again replace the old ones (once per game in each run)
+            replaced = [game for game in dict.fromkeys(value[0] for value in values) if game not in self._replaced[table]]
+            with self.transaction() as cursor:
+                if on_batch is not None:
+                    on_batch(self, cursor, replaced, values)
+                self._replace_games(cursor, table, 'id_partida', replaced)
+                self.backend.executemany(cursor, sql, values)
+            self._count(len(values))
+
+    def load_estatisticas(self, rows) -> None:
+        '''Rows of data_format.format_estatisticas_partida (ESPN id of the game, name of the team)'''
+
+        def resolve(row: dict) -> tuple | None:
+            partida = self.ids['Partidas'].get(int(row['id_partida']))
+            time = self.team_names.get(row['id_time'])
+            if partida is None or time is None:
+                return None
+            return (partida, time, row['chute_gol'], row['gol'], row['chute'], row['defesa'], row['posse'])
+
+        self._load_game_rows('EstatisticasPartida',
+                             ['id_partida', 'id_time', 'chute_gol', 'gol', 'chute', 'defesa', 'posse'], rows, resolve)
+
+    def load_escalacoes(self, rows, season: int | None = None) -> None:
+        '''
+        Rows of data_format.format_escalacoes (name of the team, ESPN ids of the game and of the player).
+        A player without a passagem in the team gets one (players can switch teams during the season),
+        in the season of the game (its campeonato), or else in the season given (of the games loaded).
+        '''
+        rows = list(rows)
+        missing = []
+        for row in rows:
+            time = self.team_names.get(row['time'])
+            jogador = self.ids['Jogadores'].get(int(row['jogador']))
+            if time is not None and jogador is not None and (time, jogador) not in self.team_players:
+                ano = self.game_seasons.get(int(row['partida'])) or season
+                if ano is None:
+                    logging.warning(f"Season of game {row['partida']} unknown, no passagem for player {row['jogador']}")
+                    continue
+                missing.append((jogador, time, ano))
+        self._new_passagens(missing)
+
+        def resolve(row: dict) -> tuple | None:
+            partida = self.ids['Partidas'].get(int(row['partida']))
+            time = self.team_names.get(row['time'])
+            jogador = self.ids['Jogadores'].get(int(row['jogador']))
+            passagem = self.team_players.get((time, jogador))
+            if partida is None or passagem is None:
+                return None
+            return (partida, passagem, row['status_'])
+
+        self._load_game_rows('Escalacoes', ['id_partida', 'id_passagem', 'status_'], rows, resolve)
+
+    def passagem_by_name(self, nome: str | None, time: int | None) -> int | None:
+        '''
+        Passagem of a player named in a comment, in the team of the play or the only one with the name.
+        A player given by the ESPN id gets its passagem in the team, else its last one.
+        '''
+        if not nome:
+            return None
+        espn_id = _espn_id(nome)
+        if espn_id is not None:
+            jogador = self.ids['Jogadores'].get(espn_id)
+            return self.team_players.get((time, jogador), self.last_passagem.get(jogador))
+        passagem = self.names.get((time, nome))
+        if passagem is None and len(self.name_players.get(nome, ())) == 1:
+            passagem = self.last_passagem[next(iter(self.name_players[nome]))]
+        return passagem
+
+    def load_lances(self, rows) -> None:
+        '''Rows of data_format.format_lances (ESPN id of the game, ESPN ids or names of the players and of the team)'''
+
+        def resolve(row: dict) -> tuple | None:
+            partida = self.ids['Partidas'].get(int(row['id_partida']))
+            if partida is None:
+                return None
+            team = _espn_id(row['time'])
+            time = self.ids['Times'].get(team) if team is not None else self.team_names.get(row['time'])
+            return (partida, self.passagem_by_name(row['jogador_1'], time), self.passagem_by_name(row['jogador_2'], time),
+                    _value(row['tipo']), _value(row['minuto']), _value(row['descricao']), time)
+
+        self._load_game_rows('Lances', ['id_partida', 'jogador_1', 'jogador_2', 'tipo', 'minuto', 'descricao',
+                                        'time_beneficiado'], rows, resolve,
+                             aggregation.on_lances if self.aggregate else None)
+
+    def new_source(self) -> None:
+        '''The next rows come from another source (e.g. another shard): their games replace the rows loaded before'''
+
+        for games in self._replaced.values():
+            games.clear()
+
+    def load(self, table: str, rows, season: int | None = None) -> None:
+        '''
+        Load the rows (or the columns of the data_format *_batch functions) of a table of data_format.COLUMNS.
+        season: season of the games loaded, for the passagens created by escalacoes when the game does not tell it.
+        '''
+        if isinstance(rows, dict):
+            rows = df.to_rows(rows)
+        if table == 'escalacoes':
+            self.load_escalacoes(rows, season)
+        else:
+            getattr(self, f'load_{table}')(rows)
+
+    def close(self) -> None:
+        self.backend.close()
+        logging.info(f'Loader stats: {self.stats}')
+
+class DatabaseSink:
+    '''
+    Same interface as pipeline.CSVSink, loading the rows of the games into the database.
+    The teams, players and passagens must be loaded before, to resolve the rows of the games.
+    season: season of the games (see Loader.load).
+    '''
+
+    def __init__(self, loader: Loader, buffer_size: int = 1000, on_flush=None, season: int | None = None):
+        self.loader = loader
+        self.season = season
+        self.buffer_size = buffer_size
+        self.on_flush = on_flush
+        self.buffers = {table: [] for table in TABLES}
+        self.buffered = 0
+        self.games = []
+
+    def write(self, table: str, row: dict) -> None:
+        self.buffers[table].append(row)
+        self.buffered += 1
+
+    def end_game(self, id: str) -> None:
+        self.games.append(id)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for table in TABLES:
+            if self.buffers[table]:
+                self.loader.load(table, self.buffers[table], self.season)
+                self.buffers[table] = []
+        self.buffered = 0
+        games, self.games = self.games, []
+        if games and self.on_flush is not None:
+            self.on_flush(games)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def read_csv(filename: str, table: str):
+    '''Rows of a csv file of data_format, with the columns named as in data_format.COLUMNS'''
+
+    with open(filename, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None) # header, the order of the columns is the one of data_format.COLUMNS
+        for values in reader:
+            yield dict(zip(df.COLUMNS[table], values))
+
+def load_directory(loader: Loader, directory: str = 'Datas', season: int | None = None) -> None:
+    '''Load every csv file of the directory, in the order of the foreign keys (season: see Loader.load)'''
+
+    for table in TABLES:
+        filename = os.path.join(directory, f'{table}.csv')
+        if os.path.exists(filename):
+            loader.load(table, read_csv(filename, table), season)
+            logging.info(f'{filename} loaded')
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'Datas'
+    database = sys.argv[2] if len(sys.argv) > 2 else os.path.join(directory, 'espn.sqlite')
+    loader = Loader(SQLiteBackend(database))
+    load_directory(loader, directory)
+    print(f'{loader.stats["rows"]} rows loaded in {database} ({loader.stats["unresolved"]} not resolved)')
+    print(f'{len(aggregation.verify(loader))} passagens with counters different from Lances')
+    loader.close()
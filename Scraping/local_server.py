@@ -0,0 +1,134 @@
+'''
+This module serves saved pages of ESPN on a local HTTP server standing in for the site,
+optionally throttling like it: a cap of requests per second answered with 429 and Retry-After,
+random 503 answers and a latency growing with the number of simultaneous requests.
+Point scraping.BASE_URL to the server to run the scrapers against it.
+
+Usage: python local_server.py <directory> [port] [max requests per second] [error rate]
+The pages must be named <page type>_<id>.html (see parity.py), e.g. comentario_699353.html,
+resultados_20240413.html, classificacao_2024.html, elenco_1234.html, and the summaries
+of the games summary_<id>.json.
+'''
+
+import os
+import sys
+import time
+import hashlib
+import random
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from scraping import ROUTES
+
+NOT_FOUND = b'<html><body><h1 class="Error404__Title">Not found</h1></body></html>'
+
+def page_name(path: str) -> str | None:
+    '''Name of the saved page of a path of the site, e.g. comentario_699353.html'''
+
+    for pattern, page_type in ROUTES:
+        match = pattern.match(path)
+        if match is not None:
+            extension = 'json' if page_type == 'summary' else 'html'
+            return f'{page_type}_{match.group(1)}.{extension}'
+    return None
+
+class LocalServer(ThreadingHTTPServer):
+    '''
+    directory: folder of the saved pages (None answers an empty page to every path).
+    max_rate: requests per second answered, the others get 429 with Retry-After (None for no cap).
+    error_rate: fraction of the requests answered with 503.
+    latency: seconds of each answer, multiplied by the number of requests in flight.
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, directory: str | None = None, port: int = 0, max_rate: float | None = None,
+                 error_rate: float = 0.0, latency: float = 0.0, retry_after: int = 1):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.directory = directory
+        self.max_rate = max_rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.retry_after = retry_after
+        self.stats = {'requests': 0, '200': 0, '304': 0, '404': 0, '429': 0, '503': 0}
+        self.in_flight = 0
+        self.peak = 0 # most requests in flight at once
+        self._window = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self) -> 'LocalServer':
+        '''Serve in a background thread'''
+
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def answer(self, path: str, headers: dict | None = None) -> tuple:
+        '''Return (status, headers, body) of a request, 304 when its If-None-Match is the ETag of the page'''
+
+        with self._lock:
+            self.stats['requests'] += 1
+            now = time.monotonic()
+            self._window = [moment for moment in self._window if now - moment < 1.0]
+            if self.max_rate is not None and len(self._window) >= self.max_rate:
+                self.stats['429'] += 1
+                return 429, {'Retry-After': str(self.retry_after)}, b''
+            self._window.append(now)
+            if random.random() < self.error_rate:
+                self.stats['503'] += 1
+                return 503, {}, b''
+            self.in_flight += 1
+            in_flight = self.in_flight
+            self.peak = max(self.peak, in_flight)
+
+        try:
+            if self.latency:
+                time.sleep(self.latency * in_flight)
+            if self.directory is None:
+                status, body = 200, b'<html><body></body></html>'
+            else:
+                name = page_name(path)
+                filename = os.path.join(self.directory, name) if name is not None else None
+                if filename is not None and os.path.exists(filename):
+                    with open(filename, 'rb') as file:
+                        status, body = 200, file.read()
+                else:
+                    status, body = 404, NOT_FOUND
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if status == 200 and headers is not None and headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+        with self._lock:
+            self.stats[str(status)] += 1
+        content_type = 'application/json' if path.split('?')[0].endswith('/summary') else 'text/html; charset=utf-8'
+        return status, {'Content-Type': content_type, 'ETag': etag}, body
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive, as the site
+
+    def do_GET(self):
+        status, headers, body = self.server.answer(self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f'Local server: {format % args}')
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    server = LocalServer(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000,
+                         max_rate=float(sys.argv[3]) if len(sys.argv) > 3 else None,
+                         error_rate=float(sys.argv[4]) if len(sys.argv) > 4 else 0.0)
+    print(f'Serving {sys.argv[1]} on {server.url}')
+    server.serve_forever()
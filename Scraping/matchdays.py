@@ -0,0 +1,51 @@
+'''
+This module keeps a calendar of the days already searched for games, saved in a JSON file.
+Past days without games are not requested again and past matchdays reuse the IDs found.
+'''
+
+import os
+import json
+import datetime
+import logging
+
+class Calendar:
+    '''Matchdays by league: {league: {YYYYMMDD: [ids]}}, an empty list is a day without games'''
+
+    def __init__(self, filename: str = 'Datas/calendario.json'):
+        self.filename = filename
+        self.days = {}
+        self.changed = False
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as file:
+                self.days = json.load(file)
+
+    @staticmethod
+    def _is_past(date: str) -> bool:
+        # The results of today (and later) can still change
+        return date < datetime.date.today().strftime('%Y%m%d')
+
+    def is_known(self, league: str, date: str) -> bool:
+        return self._is_past(date) and date in self.days.get(league, {})
+
+    def get(self, league: str, date: str) -> list | None:
+        return self.days.get(league, {}).get(date)
+
+    def record(self, league: str, date: str, ids: list) -> None:
+        '''Record the IDs of a day (empty list when there are no games)'''
+
+        if not self._is_past(date):
+            return
+        self.days.setdefault(league, {})[date] = list(ids)
+        self.changed = True
+
+    def empty_days(self, league: str) -> list:
+        return sorted(date for date, ids in self.days.get(league, {}).items() if not ids)
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        with open(self.filename, 'w', encoding='utf-8') as file:
+            json.dump(self.days, file, indent=1, sort_keys=True)
+        self.changed = False
+        logging.info(f'Calendar saved in {self.filename}')
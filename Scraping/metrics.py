@@ -0,0 +1,275 @@
+'''
+This module measures where the time of a run goes: timers and counters of each stage (fetch of
+the pages, building of the soup, parsers, data_format functions, pipeline), by page type or function.
+They are kept in memory and exported at the end of the run as a Prometheus text file
+(node_exporter textfile collector) or as a JSON summary.
+A timer costs two reads of the clock and a lock, so it wraps a page or a game, not the loops
+over the comments. The events of each page are logged sampled (see event), not one line per request.
+
+Metrics (labels between braces):
+  seconds{stage, name}: histogram of the time of each call
+  calls{stage, name}, failures{stage, name}: calls, and calls that returned None or raised
+  rows{name}: rows emitted by the data_format functions
+  bytes{page}, pages{page, source}: bytes downloaded and pages read from the network or the cache
+  events{event}: events logged by event (one of every `every` is written to the log)
+'''
+
+import json
+import time
+import bisect
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the buckets of the histograms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Prefix of the names in the Prometheus file
+NAMESPACE = 'espn'
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+def _rows(result) -> int:
+    '''Rows of a result of data_format: a row, a list of rows, a list of tables or a table by columns'''
+
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        values = list(result.values())
+        if values and all(isinstance(value, list) for value in values):
+            return len(values[0])
+        return 1
+    if result and isinstance(result[0], list):
+        return sum(len(table) for table in result)
+    return len(result)
+
+class Metrics:
+    '''Counters, gauges and histograms of the run, shared by the threads'''
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {} # (name, labels) -> value
+        self.gauges = {} # (name, labels) -> value
+        self.histograms = {} # (name, labels) -> [count of each bucket ..., count over the last bucket, sum]
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1, /, **labels) -> int:
+        '''Add value to a counter, returns the new value'''
+
+        key = _key(name, labels)
+        with self._lock:
+            total = self.counters[key] = self.counters.get(key, 0) + value
+        return total
+
+    def set_gauge(self, name: str, value: float, /, **labels) -> None:
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, /, **labels) -> None:
+        '''Add a value (e.g. seconds) to a histogram'''
+
+        key = _key(name, labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[position] += 1
+            histogram[-1] += value
+
+    @contextmanager
+    def timer(self, stage: str, name: str):
+        '''Time the block as a call of the stage (an exception counts as a failure)'''
+
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count('failures', stage=stage, name=name)
+            raise
+        finally:
+            self.observe('seconds', time.perf_counter() - start, stage=stage, name=name)
+            self.count('calls', stage=stage, name=name)
+
+    def timed(self, stage: str, name: str | None = None, rows: bool = False):
+        '''
+        Decorator timing every call of the function as a call of the stage (named by the function).
+        A call returning None counts as a failure. rows: count the rows returned (data_format).
+        '''
+        def decorator(function):
+            label = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, label):
+                    result = function(*args, **kwargs)
+                if result is None:
+                    self.count('failures', stage=stage, name=label)
+                elif rows:
+                    self.count('rows', _rows(result), name=label)
+                return result
+            return wrapper
+        return decorator
+
+    def event(self, event: str, every: int = 100, level: int = logging.INFO, **fields) -> None:
+        '''
+        Count an event and log the first one and then one of every `every`, as a line of
+        key=value ('event=fetch n=201 page=elenco seconds=0.213'), so the log stays small.
+        '''
+        n = self.count('events', event=event)
+        if n == 1 or n % every == 0:
+            logging.log(level, ' '.join([f'event={event}', f'n={n}', *(f'{key}={value}' for key, value in fields.items())]))
+
+    def add_report(self, prefix: str, report: dict) -> None:
+        '''
+        Numbers of a report (e.g. transport.report()) as gauges named prefix_key, the dicts of
+        dicts (e.g. the hosts) with the key as the label item
+        '''
+        for key, value in report.items():
+            name = f'{prefix}_{key}'
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.set_gauge(name, value)
+            elif isinstance(value, dict) and value and all(isinstance(item, dict) for item in value.values()):
+                for item, values in value.items():
+                    for field, number in values.items():
+                        if isinstance(number, (int, float)):
+                            self.set_gauge(f'{name}_{field}', number, item=item)
+            elif isinstance(value, dict):
+                self.add_report(name, value)
+
+    def snapshot(self) -> dict:
+        '''Copy of the metrics that can be sent to another process and merged there'''
+
+        with self._lock:
+            return {'counters': dict(self.counters), 'gauges': dict(self.gauges),
+                    'histograms': {key: list(values) for key, values in self.histograms.items()}}
+
+    def merge(self, snapshot: dict) -> None:
+        '''Add the metrics of a snapshot (e.g. of a shard of runner), the gauges are summed'''
+
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, value in snapshot['gauges'].items():
+                self.gauges[key] = self.gauges.get(key, 0) + value
+            for key, values in snapshot['histograms'].items():
+                histogram = self.histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for position, value in enumerate(values):
+                    histogram[position] += value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+
+    def _quantile(self, histogram: list, quantile: float) -> float | None:
+        '''Upper bound of the bucket of the quantile'''
+
+        total = sum(histogram[:-1])
+        seen = 0
+        for bound, count in zip(self.buckets, histogram):
+            seen += count
+            if seen >= quantile * total:
+                return bound
+        return float('inf') if total else None
+
+    def stages(self) -> list:
+        '''[{stage, name, calls, failures, seconds, mean, p50, p95}] sorted by the total time'''
+
+        with self._lock:
+            histograms = {key: list(values) for key, values in self.histograms.items()}
+            counters = dict(self.counters)
+        table = []
+        for (name, labels), histogram in histograms.items():
+            if name != 'seconds':
+                continue
+            calls = sum(histogram[:-1])
+            labels = dict(labels)
+            table.append({
+                'stage': labels.get('stage'),
+                'name': labels.get('name'),
+                'calls': calls,
+                'failures': counters.get(('failures', tuple(sorted(labels.items()))), 0),
+                'seconds': round(histogram[-1], 4),
+                'mean': round(histogram[-1] / calls, 6) if calls else None,
+                'p50': self._quantile(histogram, 0.5),
+                'p95': self._quantile(histogram, 0.95),
+            })
+        return sorted(table, key=lambda stage: -stage['seconds'])
+
+    def summary(self) -> dict:
+        '''The metrics as a dict for JSON'''
+
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            'stages': self.stages(),
+            'counters': [{'name': name, **dict(labels), 'value': value} for (name, labels), value in sorted(counters.items())],
+            'gauges': [{'name': name, **dict(labels), 'value': value} for (name, labels), value in sorted(gauges.items())],
+        }
+
+    def prometheus(self) -> str:
+        '''The metrics in the text format of Prometheus'''
+
+        def labels_text(labels) -> str:
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{str(value)}"' for key, value in labels) + '}'
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f'{NAMESPACE}_{name}_total'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{labels_text(labels)} {value}')
+        for (name, labels), value in gauges:
+            metric = f'{NAMESPACE}_{name}'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} gauge')
+            lines.append(f'{metric}{labels_text(labels)} {value}')
+        for (name, labels), histogram in histograms:
+            metric = f'{NAMESPACE}_{name}'
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f'# TYPE {metric} histogram')
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), histogram):
+                cumulative += count
+                lines.append(f'{metric}_bucket{labels_text((*labels, ("le", bound)))} {cumulative}')
+            lines.append(f'{metric}_sum{labels_text(labels)} {histogram[-1]}')
+            lines.append(f'{metric}_count{labels_text(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, filename: str) -> None:
+        '''Save the metrics: Prometheus text for .prom files, JSON for the others'''
+
+        with open(filename, 'w', encoding='utf-8') as file:
+            if filename.endswith('.prom'):
+                file.write(self.prometheus())
+            else:
+                json.dump(self.summary(), file, ensure_ascii=False, indent=1)
+        logging.info(f'Metrics saved in {filename}')
+
+# Metrics of the process, used by the scrapers
+METRICS = Metrics()
+
+count = METRICS.count
+observe = METRICS.observe
+timer = METRICS.timer
+timed = METRICS.timed
+event = METRICS.event
+
+def quiet_libraries(level: int = logging.WARNING) -> None:
+    '''Keep the loggers of the HTTP libraries (one line per connection in DEBUG) at level'''
+
+    for name in ('urllib3', 'requests', 'charset_normalizer', 'asyncio'):
+        logging.getLogger(name).setLevel(level)
@@ -0,0 +1,49 @@
+'''
+This script checks that the fast parsing path (parser chosen by scraping.set_parser
+and only the parts of the page in scraping.STRAINERS) gives the same result as
+the whole page parsed by html.parser, for saved pages. The comparison with the first version
+of the scrapers, for each page type and parser, is in tests/test_parsers.py.
+
+Usage: python Scraping/parity.py <directory> [parser]
+The pages must be named <page type>_<id>.html, e.g. comentario_699353.html.
+'''
+
+import os
+import sys
+import logging
+import scraping as sc
+
+def compare(page_type: str, content: bytes, id: str | None = None) -> tuple:
+    '''Return (equal, reference result, fast result) for a saved page'''
+
+    reference = sc.parse_page(page_type, content, id, strain=False, parser='html.parser')
+    fast = sc.parse_page(page_type, content, id, strain=True)
+    return reference == fast, reference, fast
+
+def check_directory(directory: str) -> list:
+    '''Compare every saved page of the directory, returns the names of the pages that differ'''
+
+    different = []
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension != '.html' or '_' not in name:
+            continue
+        page_type, id = name.split('_', 1)
+        if page_type not in sc.STRAINERS:
+            logging.warning(f'Unknown page type: {filename}')
+            continue
+        with open(os.path.join(directory, filename), 'rb') as file:
+            equal, reference, fast = compare(page_type, file.read(), id)
+        if not equal:
+            different.append(filename)
+            print(f'DIFFERENT {filename}\n  reference: {reference}\n  fast:      {fast}')
+    return different
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    print(f'Parser: {sc.set_parser(sys.argv[2] if len(sys.argv) > 2 else "auto")}')
+    different = check_directory(sys.argv[1])
+    print(f'{len(different)} pages differ')
+    sys.exit(1 if different else 0)
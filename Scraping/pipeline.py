@@ -0,0 +1,164 @@
+'''
+This module streams the games from the scrapers to the csv files.
+Each game is formatted as soon as it arrives and its rows are appended to the
+files, so only a bounded buffer of rows is kept in memory, whatever the number of games.
+'''
+
+import os
+import csv
+import logging
+import data_format as df
+import metrics
+
+# Tables filled by each page of a game
+PAGE_TABLES = {
+    'estatisticas': ['estatisticas', 'partidas'],
+    'lances': ['lances'],
+    'escalacoes': ['escalacoes'],
+}
+
+def iter_game_rows(paginas: dict, rosters=None, report=None):
+    '''
+    Yield (table, row) for every row formatted from the pages of a game.
+    With the resolution.Rosters of the season, the names of the lances are resolved to ESPN ids
+    (the names not resolved go to the resolution.Report).
+    '''
+
+    if paginas.get('estatisticas') is not None:
+        for row in df.format_estatisticas_partida(paginas['estatisticas']):
+            yield 'estatisticas', row
+        yield 'partidas', df.format_partidas(paginas['estatisticas'])
+
+    if paginas.get('lances') is not None:
+        index = None
+        if rosters is not None:
+            estatisticas = paginas.get('estatisticas')
+            teams = (estatisticas['mandante']['time'], estatisticas['visitante']['time']) if estatisticas is not None else ()
+            index = rosters.index(paginas.get('escalacoes'), teams)
+        for row in df.format_lances(paginas['lances'], index):
+            yield 'lances', row
+        if index is not None and report is not None:
+            report.add_game(paginas['lances']['partida'], index)
+
+    if paginas.get('escalacoes') is not None:
+        for team in df.format_escalacoes(paginas['escalacoes']):
+            for row in team:
+                yield 'escalacoes', row
+
+class CSVSink:
+    '''
+    Appends rows to Datas/<table>.csv.
+    buffer_size: rows kept in memory before writing them to the files.
+    on_flush: called with the IDs of the games whose rows were all written.
+    '''
+
+    def __init__(self, directory: str = 'Datas', buffer_size: int = 1000, on_flush=None):
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.on_flush = on_flush
+        self.buffers = {table: [] for table in df.COLUMNS}
+        self.buffered = 0
+        self.games = []
+        self.files = {}
+        self.writers = {}
+
+    def _writer(self, table: str) -> csv.DictWriter:
+        if table not in self.writers:
+            filename = os.path.join(self.directory, f'{table}.csv')
+            os.makedirs(self.directory, exist_ok=True)
+            new = not os.path.exists(filename) or os.path.getsize(filename) == 0
+            self.files[table] = open(filename, 'a', newline='', encoding='utf-8')
+            self.writers[table] = csv.DictWriter(self.files[table], fieldnames=df.COLUMNS[table])
+            if new:
+                self.writers[table].writeheader()
+        return self.writers[table]
+
+    def remove_games(self, pages: dict) -> None:
+        '''Remove from the files the rows of the games fetched again ({id: [pages]})'''
+
+        for table in df.COLUMNS:
+            ids = {id for id, game_pages in pages.items()
+                   if any(table in PAGE_TABLES[page] for page in game_pages)}
+            filename = os.path.join(self.directory, f'{table}.csv')
+            if ids and os.path.exists(filename):
+                df.remove_fromCSV(filename, df.COLUMNS[table], df.KEYS[table][0], ids)
+
+    def write(self, table: str, row: dict) -> None:
+        self.buffers[table].append(row)
+        self.buffered += 1
+
+    def end_game(self, id: str) -> None:
+        '''All rows of the game were written, flush if the buffer is full'''
+
+        self.games.append(id)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for table, rows in self.buffers.items():
+            if rows:
+                self._writer(table).writerows(rows)
+                self.files[table].flush()
+                rows.clear()
+        self.buffered = 0
+        games, self.games = self.games, []
+        if games and self.on_flush is not None:
+            self.on_flush(games)
+
+    def close(self) -> None:
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.files, self.writers = {}, {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class Tee:
+    '''Sink writing every row to all the given sinks (e.g. the csv files and the database)'''
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def remove_games(self, pages: dict) -> None:
+        for sink in self.sinks:
+            if hasattr(sink, 'remove_games'):
+                sink.remove_games(pages)
+
+    def write(self, table: str, row: dict) -> None:
+        for sink in self.sinks:
+            sink.write(table, row)
+
+    def end_game(self, id: str) -> None:
+        for sink in self.sinks:
+            sink.end_game(id)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def stream_games(games, sink: CSVSink, rosters=None, report=None) -> int:
+    '''Format every (id, pages) of games into the sink, returns the number of games (see iter_game_rows)'''
+
+    count = 0
+    for id, paginas in games:
+        with metrics.timer('pipeline', 'game'):
+            for table, row in iter_game_rows(paginas, rosters, report):
+                sink.write(table, row)
+            sink.end_game(id)
+        count += 1
+    logging.info(f'{count} games saved')
+    return count
@@ -0,0 +1,201 @@
+'''
+This module controls the pace of the requests to each host: a token bucket caps the
+requests per second, an AIMD limit adapts the number of simultaneous requests to the
+latency and to the throttling answers (429/5xx) of the site, and a retry policy
+repeats the throttled requests with jittered exponential backoff honouring Retry-After.
+'''
+
+import time
+import random
+import logging
+import threading
+import email.utils
+from urllib.parse import urlsplit
+
+# Answers of a site asking to slow down or temporarily failing
+THROTTLING = (429, 503)
+RETRYABLE = (429, 500, 502, 503, 504)
+
+class TokenBucket:
+    '''rate: requests per second, burst: requests allowed at once after an idle period'''
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        '''Take a token, sleeping until it is available. Returns the time waited.'''
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1 # a negative value reserves the next tokens for the threads already waiting
+            wait = max(-self.tokens / self.rate, 0.0)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class AdaptiveLimit:
+    '''
+    Number of simultaneous requests, adapted in AIMD style: grows by about one request
+    for each window of successful answers and is cut by decrease when the site throttles
+    or the latency gets higher than latency_factor times the lowest latency seen.
+    '''
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16,
+                 decrease: float = 0.5, latency_factor: float = 2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self.base_latency = None
+        self.latency = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, status: int | None, latency: float) -> None:
+        '''Free the slot and adapt the limit to the answer (status None is a network error)'''
+
+        with self._condition:
+            self.in_flight -= 1
+            if status is not None and status not in RETRYABLE:
+                # Smoothed latency compared with the lowest one, which is the latency of an idle site
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                self.base_latency = latency if self.base_latency is None else min(self.base_latency, latency)
+
+            if status is None or status in RETRYABLE or self._congested():
+                self._cut()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _congested(self) -> bool:
+        # Small variations of very fast answers (e.g. a local server) are not congestion
+        return self.latency > max(self.latency_factor * self.base_latency, self.base_latency + 0.05)
+
+    def _cut(self) -> None:
+        # The requests in flight answer the same congestion, the limit is cut once for them
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 0.0) * 2:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        logging.info(f'Concurrency limit decreased to {int(self.limit)}')
+
+class RetryPolicy:
+    '''
+    retries: maximum number of times a request is repeated.
+    backoff: first delay in seconds, doubled on each attempt up to max_backoff (with full jitter).
+    statuses: answers repeated, besides the network errors.
+    '''
+
+    def __init__(self, retries: int = 4, backoff: float = 0.5, max_backoff: float = 60.0, statuses: tuple = RETRYABLE):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def should_retry(self, attempt: int, status: int | None = None) -> bool:
+        '''attempt: number of retries already done, status: None for a network error'''
+        return attempt < self.retries and (status is None or status in self.statuses)
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        '''Seconds to wait before the next attempt, never less than the Retry-After of the site'''
+
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        wait = parse_retry_after(retry_after)
+        if wait is not None:
+            delay = max(delay, min(wait, self.max_backoff))
+        return delay
+
+def parse_retry_after(value: str | None) -> float | None:
+    '''Seconds of a Retry-After header, given in seconds or as an HTTP date'''
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+class _Host:
+    def __init__(self, bucket: TokenBucket | None, limit: AdaptiveLimit):
+        self.bucket = bucket
+        self.limit = limit
+        self.paused_until = 0.0
+
+class RateLimiter:
+    '''
+    Pace of the requests of each host.
+    rate, burst: token bucket of each host, requests per second (None for no cap).
+    concurrency, min_concurrency, max_concurrency: initial value and bounds of the adaptive limit.
+    retry: RetryPolicy of the throttled and failed requests.
+    '''
+
+    def __init__(self, rate: float | None = None, burst: float | None = None, concurrency: int = 4,
+                 min_concurrency: int = 1, max_concurrency: int = 16, latency_factor: float = 2.0,
+                 retry: RetryPolicy | None = None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_factor = latency_factor
+        self.retry = retry or RetryPolicy()
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url: str) -> _Host:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                bucket = TokenBucket(self.rate, self.burst) if self.rate else None
+                limit = AdaptiveLimit(self.concurrency, self.min_concurrency, self.max_concurrency,
+                                      latency_factor=self.latency_factor)
+                self._hosts[host] = _Host(bucket, limit)
+            return self._hosts[host]
+
+    def acquire(self, url: str) -> None:
+        '''Wait for a token and a free slot of the host of the url'''
+
+        host = self._host(url)
+        wait = host.paused_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        if host.bucket is not None:
+            host.bucket.acquire()
+        host.limit.acquire()
+
+    def release(self, url: str, status: int | None, latency: float) -> None:
+        self._host(url).limit.release(status, latency)
+
+    def pause(self, url: str, seconds: float) -> None:
+        '''Hold every request to the host of the url (Retry-After)'''
+
+        host = self._host(url)
+        with self._lock:
+            host.paused_until = max(host.paused_until, time.monotonic() + seconds)
+
+    def report(self) -> dict:
+        '''{host: {'limit', 'latency'}} with the current state of each host'''
+
+        with self._lock:
+            return {name: {'limit': int(host.limit.limit), 'latency': host.limit.latency}
+                    for name, host in self._hosts.items()}
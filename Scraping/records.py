@@ -0,0 +1,227 @@
+'''
+This module has the records emitted by the scrapers: classes with __slots__ instead of one dict
+per comment, player or team, which are smaller and do not hash their keys at every access.
+They can still be read as the dicts of the scrapers (record['jogador-1'], .items(), .get()...),
+so the code written for the dicts keeps working, and to_dict gives the dict itself.
+'''
+
+from dataclasses import dataclass, fields, replace
+
+class Record:
+    '''Base of the records, with the methods of a dict over the keys of the scrapers'''
+
+    __slots__ = ()
+
+    # Attribute -> key of the dict, when they differ (keys with '-' or spaces)
+    ALIASES = {}
+    # Attribute -> record of its dicts (or of the dicts of its list)
+    NESTED = {}
+    _attributes = {} # key -> attribute, filled by record
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        '''Record of a dict of the scrapers (the extra keys are ignored)'''
+
+        values = {attribute: data.get(key) for key, attribute in cls._attributes.items()}
+        for attribute, nested in cls.NESTED.items():
+            value = values[attribute]
+            if isinstance(value, list):
+                values[attribute] = [as_record(nested, item) for item in value]
+            else:
+                values[attribute] = as_record(nested, value)
+        return cls(**values)
+
+    def to_dict(self) -> dict:
+        '''The dict of the scrapers, with the records inside it converted too'''
+
+        return {key: _to_value(getattr(self, attribute)) for key, attribute in self._attributes.items()}
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._attributes[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value) -> None:
+        try:
+            setattr(self, self._attributes[key], value)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key) -> bool:
+        return key in self._attributes
+
+    def __iter__(self):
+        return iter(self._attributes)
+
+    def __len__(self) -> int:
+        return len(self._attributes)
+
+    def get(self, key, default=None):
+        return getattr(self, self._attributes[key]) if key in self._attributes else default
+
+    def keys(self):
+        return self._attributes.keys()
+
+    def values(self) -> list:
+        return [getattr(self, attribute) for attribute in self._attributes.values()]
+
+    def items(self) -> list:
+        return [(key, getattr(self, attribute)) for key, attribute in self._attributes.items()]
+
+    def copy(self):
+        return replace(self)
+
+def _to_value(value):
+    if isinstance(value, (Record, Lances)):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_to_value(item) for item in value]
+    return value
+
+def record(cls):
+    '''Make cls a dataclass with __slots__ and map its attributes to the keys of the dicts'''
+
+    cls = dataclass(slots=True)(cls)
+    cls._attributes = {cls.ALIASES.get(field.name, field.name): field.name for field in fields(cls)}
+    return cls
+
+@record
+class Lance(Record):
+    '''Play of a comment (commentary.classify)'''
+
+    ALIASES = {'jogador_1': 'jogador-1', 'jogador_2': 'jogador-2'}
+
+    jogador_1: str | None = None
+    jogador_2: str | None = None
+    time: str | None = None
+    tipo: str | None = None
+    descricao: str | None = None
+    minuto: str | None = None
+
+@record
+class EstatisticaTime(Record):
+    '''Stats of a team in a game'''
+
+    ALIASES = {'chute_gol': 'chute a gol'}
+
+    time: str | None = None
+    gols: str | None = None
+    chute_gol: str | None = None
+    chute: str | None = None
+    defesas: str | None = None
+    posse: str | None = None
+
+@record
+class Partida(Record):
+    '''General information and stats of a game (page Estatisticas)'''
+
+    NESTED = {'mandante': EstatisticaTime, 'visitante': EstatisticaTime}
+
+    partida: str | None = None
+    campeonato: str | None = None
+    estadio: str | None = None
+    horario: str | None = None
+    data: str | None = None
+    local: str | None = None
+    audiencia: str | None = None
+    arbitro: str | None = None
+    mandante: EstatisticaTime | None = None
+    visitante: EstatisticaTime | None = None
+    encerrada: bool | None = None # the game is over (None when the page does not tell)
+
+@record
+class Escalacao(Record):
+    '''Lineup of a team in a game (IDs of the players)'''
+
+    titulares: list | None = None
+    substitutos: list | None = None
+    reservas: list | None = None
+
+@record
+class Jogador(Record):
+    '''Player of a cast (page Elenco)'''
+
+    nome: str | None = None
+    espn_id: str | None = None
+    posicao: str | None = None
+    idade: str | None = None
+    altura: str | None = None
+    nacionalidade: str | None = None
+
+@record
+class Passagem(Record):
+    '''Players of a team in a season (page Elenco), each one a row of Passagens'''
+
+    NESTED = {'jogadores': Jogador}
+
+    time: str | None = None
+    temporada: int | None = None
+    jogadores: list | None = None
+
+class Lances:
+    '''
+    Plays of a game. Read as a dict it is the dict of get_datas_from_comentarios:
+    {'partida': id, 1: play, 2: play, ...}
+    '''
+
+    __slots__ = ('partida', 'lances')
+
+    def __init__(self, partida: str | None = None, lances: list | None = None):
+        self.partida = partida
+        self.lances = lances if lances is not None else []
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get('partida'), [as_record(Lance, play) for key, play in data.items() if key != 'partida'])
+
+    def to_dict(self) -> dict:
+        datas = {'partida': self.partida}
+        for index, play in enumerate(self.lances, start=1):
+            datas[index] = play.to_dict()
+        return datas
+
+    def append(self, play: Lance) -> None:
+        self.lances.append(play)
+
+    def __getitem__(self, key):
+        if key == 'partida':
+            return self.partida
+        if isinstance(key, int) and 1 <= key <= len(self.lances):
+            return self.lances[key - 1]
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return key == 'partida' or (isinstance(key, int) and 1 <= key <= len(self.lances))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.lances) + 1
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Lances):
+            return self.partida == other.partida and self.lances == other.lances
+        return NotImplemented
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self) -> list:
+        return ['partida', *range(1, len(self.lances) + 1)]
+
+    def values(self) -> list:
+        return [self.partida, *self.lances]
+
+    def items(self) -> list:
+        return [('partida', self.partida), *enumerate(self.lances, start=1)]
+
+    def copy(self) -> dict:
+        # A dict, as the code of the dicts pops 'partida' from the copy
+        return dict(self.items())
+
+def as_record(cls, data):
+    '''data as a record of cls (None, records and other objects are returned as they are)'''
+
+    return cls.from_dict(data) if isinstance(data, dict) else data
@@ -0,0 +1,244 @@
+'''
+This module resolves the names of players and teams written in the comments (e.g. 'Rodrigo Sam',
+'Juventude') to their ESPN ids, so the lances can be saved with the keys of Lances (jogador_1,
+jogador_2, time_beneficiado) instead of free text.
+Rosters keeps the players of the casts (get_cast) and the ids of the teams (get_teams_id) of the
+season; for each game it builds an Index with the players of the lineup (get_lineup) and of the casts
+of the two teams, looked up by the normalized name, then by prefix and words of the name.
+The names not resolved are collected by Report.
+'''
+
+import re
+import json
+import bisect
+import logging
+import threading
+import functools
+import unicodedata
+from records import as_record, Passagem
+
+@functools.lru_cache(maxsize=8192)
+def normalize(name: str | None) -> str:
+    '''Name without accents, punctuation, case and extra spaces'''
+
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r'[^\w ]', ' ', name.lower()).split())
+
+def _team_id(value) -> int:
+    # Values of get_teams_id/get_cast: '6086/botafogo' or '6086'
+    return int(str(value).split('/')[0])
+
+class Rosters:
+    '''
+    Players of the casts and ids of the teams of a season.
+    teams: items of get_teams_id ({nome: 'id/slug'}), casts: results of get_cast.
+    '''
+
+    def __init__(self, teams=(), casts=()):
+        self.team_ids = {} # normalized name -> espn id of the team
+        self.player_names = {} # espn id of the player -> name
+        self.players = {} # espn id of the team -> espn ids of its players
+        for team in teams:
+            if team is not None:
+                self.add_team(*next(iter(team.items())))
+        for cast in casts:
+            if cast is not None:
+                self.add_cast(cast)
+
+    def add_team(self, nome: str, id) -> None:
+        self.team_ids[normalize(nome)] = _team_id(id)
+
+    def add_cast(self, cast) -> None:
+        cast = as_record(Passagem, cast)
+        players = self.players.setdefault(_team_id(cast.time), set())
+        for player in cast.jogadores:
+            espn_id = int(player.espn_id)
+            self.player_names[espn_id] = player.nome
+            players.add(espn_id)
+
+    def add_player(self, espn_id, nome: str, time=None) -> None:
+        '''Player known by other sources (e.g. the csv files of previous runs)'''
+
+        self.player_names[int(espn_id)] = nome
+        if time is not None:
+            self.players.setdefault(_team_id(time), set()).add(int(espn_id))
+
+    def team_id(self, nome: str, lineup: set = frozenset()) -> int | None:
+        '''
+        ESPN id of a team of a lineup: by the name, else the team whose cast has most of the
+        players of the lineup (the names of the table and of the game pages can differ)
+        '''
+        id = self.team_ids.get(normalize(nome))
+        if id is None and lineup:
+            shared = {team: len(lineup & players) for team, players in self.players.items()}
+            best = max(shared, key=shared.get, default=None)
+            if best is not None and shared[best] > len(lineup) // 2:
+                id = best
+        return id
+
+    def index(self, lineup: dict | None, teams: tuple = ()) -> 'Index':
+        '''
+        Index of a game from its lineup (dict of get_lineup). Without the lineup,
+        teams are the names of the teams of the game and only their casts are used.
+        '''
+        index = Index(lineup['partida'] if lineup is not None else None)
+        if lineup is None:
+            for nome in teams:
+                team = self.team_id(nome)
+                index.add_team(nome, team)
+                if team is not None:
+                    index.add_players(nome, [(id, self.player_names.get(id)) for id in self.players.get(team, ())])
+            return index
+        for nome, escalacao in list(lineup.items())[1:3]:
+            ids = {int(id) for key, players in escalacao.items() if players is not None for id in players}
+            team = self.team_id(nome, ids)
+            index.add_team(nome, team)
+            # Players of the lineup first, the rest of the cast only when they do not match
+            index.add_players(nome, [(id, self.player_names.get(id)) for id in ids], lineup=True)
+            if team is not None:
+                index.add_players(nome, [(id, self.player_names.get(id)) for id in self.players.get(team, set()) - ids])
+        return index
+
+class _Names:
+    '''Players of a team: exact lookup and sorted names for the prefix lookup'''
+
+    def __init__(self):
+        self.exact = {} # normalized name -> espn ids
+        self.sorted = [] # (normalized name, espn id)
+
+    def add(self, nome: str, id: int) -> None:
+        self.exact.setdefault(nome, set()).add(id)
+        bisect.insort(self.sorted, (nome, id))
+
+    def find(self, nome: str) -> set:
+        ids = self.exact.get(nome)
+        if ids:
+            return ids
+        # Name of the comment starting the name of the cast ('Gabriel' -> 'Gabriel Barbosa')
+        start = bisect.bisect_left(self.sorted, (nome,))
+        ids = set()
+        for other, id in self.sorted[start:]:
+            if not other.startswith(nome):
+                break
+            if other[len(nome)] == ' ':
+                ids.add(id)
+        if ids:
+            return ids
+        # Every word of the comment in the name of the cast ('Rodrigo Sam' -> 'Rodrigo Sam Santos')
+        words = set(nome.split())
+        return {id for other, id in self.sorted if words <= set(other.split())}
+
+class Index:
+    '''
+    Names of the players and teams of a game -> ESPN ids. A name matching more
+    than one player of a team is not resolved. The names not found are kept in unresolved.
+    '''
+
+    def __init__(self, partida: str | None = None):
+        self.partida = partida
+        self.teams = {} # normalized name -> espn id of the team (None when unknown)
+        self.lineup = {} # normalized name of the team -> _Names of the players of the lineup
+        self.cast = {} # normalized name of the team -> _Names of the rest of the cast
+        self.aliases = {} # other names of the teams in the comments -> normalized name
+        self.resolved = 0
+        self.unresolved = [] # (kind, name)
+
+    def add_team(self, nome: str, id: int | None) -> None:
+        self.teams[normalize(nome)] = id
+        self.lineup.setdefault(normalize(nome), _Names())
+        self.cast.setdefault(normalize(nome), _Names())
+
+    def add_players(self, team: str, players, lineup: bool = False) -> None:
+        names = (self.lineup if lineup else self.cast)[normalize(team)]
+        for id, nome in players:
+            if nome:
+                names.add(normalize(nome), int(id))
+
+    def _team_key(self, nome: str) -> str | None:
+        key = normalize(nome)
+        if not key or key in self.teams:
+            return key or None
+        if key in self.aliases:
+            return self.aliases[key]
+        found = [team for team in self.teams if team.startswith(key) or key.startswith(team)]
+        if not found:
+            # A word in common ('RB Bragantino', 'Red Bull Bragantino')
+            words = {word for word in key.split() if len(word) > 3}
+            found = [team for team in self.teams if words & set(team.split())]
+        return found[0] if len(found) == 1 else None
+
+    def team(self, nome: str | None) -> int | None:
+        '''ESPN id of the team named in a comment'''
+
+        if not nome or not nome.strip():
+            return None
+        key = self._team_key(nome)
+        id = self.teams.get(key) if key is not None else None
+        if id is None:
+            self.unresolved.append(('time', nome.strip()))
+        else:
+            self.resolved += 1
+        return id
+
+    def player(self, nome: str | None, team: str | None = None) -> int | None:
+        '''ESPN id of the player named in a comment, looked up first in the team of the play'''
+
+        key = normalize(nome)
+        if not key:
+            return None
+        first = self._team_key(team) if team else None
+        teams = [first] if first is not None else []
+        teams += [other for other in self.teams if other != first]
+        for names in (self.lineup, self.cast):
+            for other in teams:
+                ids = names[other].find(key)
+                if len(ids) == 1:
+                    if first is None and normalize(team):
+                        # The team of the play is the team of the player ('Atlético Mineiro' -> 'Atlético-MG')
+                        self.aliases[normalize(team)] = other
+                    self.resolved += 1
+                    return next(iter(ids))
+                if ids: # more than one player with the name in the team
+                    self.unresolved.append(('jogador', nome.strip()))
+                    return None
+        self.unresolved.append(('jogador', nome.strip()))
+        return None
+
+class Report:
+    '''Names not resolved in each game, saved as JSON to find the gaps of the casts'''
+
+    def __init__(self, filename: str = 'Datas/nao_resolvidos.json'):
+        self.filename = filename
+        self.games = {} # id -> {'resolvidos': n, 'nao_resolvidos': [[kind, name], ...]}
+        self._lock = threading.Lock()
+
+    def add_game(self, id: str, index: Index) -> None:
+        with self._lock:
+            self.games[str(id)] = {'resolvidos': index.resolved, 'nao_resolvidos': [list(item) for item in index.unresolved]}
+        if index.unresolved:
+            logging.info(f'{len(index.unresolved)} names not resolved in game {id}')
+
+    def names(self) -> list:
+        '''[(kind, name, number of lances, number of games)] sorted by the number of lances'''
+
+        counts = {}
+        for id, game in self.games.items():
+            for kind, nome in game['nao_resolvidos']:
+                count = counts.setdefault((kind, nome), [0, set()])
+                count[0] += 1
+                count[1].add(id)
+        return sorted(((kind, nome, lances, len(games)) for (kind, nome), (lances, games) in counts.items()),
+                      key=lambda item: -item[2])
+
+    def rate(self) -> float:
+        '''Fraction of the names resolved'''
+
+        resolved = sum(game['resolvidos'] for game in self.games.values())
+        total = resolved + sum(len(game['nao_resolvidos']) for game in self.games.values())
+        return resolved / total if total else 1.0
+
+    def save(self) -> None:
+        with self._lock, open(self.filename, 'w', encoding='utf-8') as file:
+            json.dump({'jogos': self.games, 'nomes': self.names()}, file, ensure_ascii=False, indent=1)
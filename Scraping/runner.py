@@ -0,0 +1,262 @@
+'''
+This module scrapes many (league, season) shards in one job, each shard in its own process
+of a pool, so the parsing of the pages uses all the cores. Each shard keeps its progress apart
+(csv files, checkpoint, calendar and log in <root>/<league>_<season>) and a failing shard does
+not stop the others: it is reported and resumed by the next run. The outputs of the shards are
+merged in the order of the shards (not of their ending), so the result does not depend on timing.
+
+Usage: python runner.py <league>:<season>[:<from YYYYMMDD>:<to YYYYMMDD>] ... [-p processes]
+e.g.   python runner.py bra.1:2024:20240413 bra.1:2023 eng.1:2023:20230801:20240531
+'''
+
+import os
+import sys
+import csv
+import json
+import time
+import datetime
+import logging
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import scraping as sc
+import data_format as df
+import transport
+import engine
+import matchdays
+import cache
+import ratelimit
+import checkpoint as ckpt
+import pipeline
+import comment_coverage
+import resolution
+import squads
+import loader
+import metrics
+
+# Leagues whose season spans two years (ESPN names the season by the year it starts):
+# league -> (first day MMDD of the season, last day MMDD in the next year)
+SPLIT_SEASONS = {
+    'eng.1': (801, 630), 'esp.1': (801, 630), 'ita.1': (801, 630), 'ger.1': (801, 630),
+    'fra.1': (801, 630), 'por.1': (801, 630), 'ned.1': (801, 630),
+    'uefa.champions': (601, 630), 'uefa.europa': (601, 630),
+}
+# Prefixes of the leagues known to play in one year, the others without dates are warned about
+YEAR_SEASONS = ('bra.', 'arg.', 'usa.')
+
+@dataclass(frozen=True)
+class Shard:
+    '''
+    League and season scraped by one process, by default the games of the whole season:
+    the year of the season, or from the start of the season to the next year for the leagues of SPLIT_SEASONS
+    '''
+
+    league: str
+    season: int
+    from_date: int | None = None
+    to_date: int | None = None
+
+    @property
+    def name(self) -> str:
+        return f'{self.league}_{self.season}'
+
+    def dates(self) -> tuple:
+        '''(from_date, to_date) for scraping.iter_all_games, 0 is today'''
+
+        today = int(datetime.date.today().strftime('%Y%m%d'))
+        first, last = self.season * 10000 + 101, self.season * 10000 + 1231
+        if self.league in SPLIT_SEASONS:
+            start, end = SPLIT_SEASONS[self.league]
+            first, last = self.season * 10000 + start, (self.season + 1) * 10000 + end
+        end = self.to_date or last
+        return self.from_date or first, 0 if end >= today else end
+
+    def order(self) -> tuple:
+        '''Key of the order of the merge'''
+        return (self.league, self.season, *self.dates())
+
+    @classmethod
+    def parse(cls, text: str) -> 'Shard':
+        '''Shard of 'league:season[:from:to]' '''
+
+        parts = text.split(':')
+        return cls(parts[0], int(parts[1]), *(int(part) for part in parts[2:4]))
+
+def _setup(shard: Shard, directory: str, rate: float, cache_directory: str) -> comment_coverage.Coverage:
+    '''Log, transport and scrapers of the process running the shard'''
+
+    logging.basicConfig(filename=os.path.join(directory, 'getting_data.log'), level=logging.INFO, force=True,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    metrics.quiet_libraries()
+    metrics.METRICS.reset() # the process may have run another shard
+    transport.configure(pool_size=10, timeout=(5, 30), compression=True,
+                        cache=cache.PageCache(os.path.join(cache_directory, shard.name)),
+                        limiter=ratelimit.RateLimiter(rate=rate, burst=max(rate, 1), concurrency=4, max_concurrency=10))
+    sc.set_parser('auto')
+    sc.set_extraction('json')
+    coverage = comment_coverage.Coverage(os.path.join(directory, 'cobertura.json'))
+    sc.set_coverage(coverage)
+    return coverage
+
+def discover(shard: Shard, directory: str, workers: int = 8) -> list:
+    '''IDs of the games of the shard, in the order of the dates'''
+
+    if shard.league not in SPLIT_SEASONS and not shard.league.startswith(YEAR_SEASONS) \
+            and (shard.from_date is None or shard.to_date is None):
+        logging.warning(f'Shard {shard.name}: the season of {shard.league} is taken as the year {shard.season}, '
+                        'give the dates if it spans two years')
+    from_date, to_date = shard.dates()
+    calendar = matchdays.Calendar(os.path.join(directory, 'calendario.json'))
+    games = dict(sc.iter_all_games(from_date, to_date, league=shard.league, workers=workers, calendar=calendar))
+    return [id for date in sorted(games) for id in games[date]]
+
+def collect_squads(shard: Shard, directory: str, columnar_root: str | None = None) -> resolution.Rosters:
+    '''Save the new teams, players and passagens of the shard (and their columnar copy), returns its rosters'''
+
+    index = squads.collect([shard.season], shard.league, index=squads.PlayerIndex().load(directory))
+    tables = index.save(directory)
+    if columnar_root is not None:
+        import columnar # pandas, only when the columnar copy is asked
+        for table, columns in tables.items():
+            columnar.write_table(columns, table, columnar_root, season=shard.season, league=shard.league)
+    return index.rosters(shard.season)
+
+def collect_games(shard: Shard, directory: str, ids: list, rosters: resolution.Rosters | None,
+                  columnar_root: str | None = None, workers: int = 8, per_host: int = 6, sinks: tuple = ()) -> int:
+    '''
+    Scrape and save the games not saved yet, returns the number of games saved.
+    sinks: other sinks of the rows (e.g. loader.DatabaseSink), written before the csv files.
+    '''
+
+    checkpoint = ckpt.Checkpoint(os.path.join(directory, 'checkpoint.sqlite'))
+    pending = checkpoint.pending(ids)
+    report = resolution.Report(os.path.join(directory, 'nao_resolvidos.json'))
+
+    def games():
+        for id, pages in engine.iter_games(list(pending), workers=workers, per_host=per_host,
+                                           pages=pending, league=shard.league):
+            checkpoint.mark_pages(id, pages)
+            yield id, pages
+
+    try:
+        # The csv files come last: the checkpoint marks the games when they are written
+        sinks = list(sinks)
+        if columnar_root is not None:
+            import columnar
+            sinks.append(columnar.ColumnarSink(columnar_root, season=shard.season, league=shard.league))
+        sinks.append(pipeline.CSVSink(directory, buffer_size=1000, on_flush=checkpoint.mark_formatted))
+        with pipeline.Tee(*sinks) as sink:
+            sink.remove_games(pending)
+            return pipeline.stream_games(games(), sink, rosters, report)
+    finally:
+        report.save()
+        checkpoint.close()
+
+def run_shard(shard: Shard, root: str = 'Datas/shards', columnar_root: str = 'Datas/colunar',
+              workers: int = 8, rate: float = 10, cache_directory: str = '.cache/pages') -> dict:
+    '''Scrape a shard (in a process of the pool), an error is returned in the result instead of raised'''
+
+    directory = os.path.join(root, shard.name)
+    os.makedirs(directory, exist_ok=True)
+    started = time.time()
+    result = {'shard': shard, 'directory': directory, 'status': 'ok', 'games': 0, 'error': None}
+    try:
+        coverage = _setup(shard, directory, rate, cache_directory)
+        ids = discover(shard, directory, workers)
+        rosters = collect_squads(shard, directory, columnar_root)
+        result['games'] = collect_games(shard, directory, ids, rosters, columnar_root, workers)
+        coverage.save()
+        logging.info(f'Transport stats: {transport.get_transport().report()}')
+    except Exception as error:
+        logging.exception(f'Shard {shard.name} failed')
+        result.update(status='failed', error=repr(error))
+    result['elapsed'] = round(time.time() - started, 1)
+    # The metrics of the shard, merged by run in the metrics of the job
+    metrics.METRICS.add_report('transport', transport.get_transport().report())
+    metrics.METRICS.save(os.path.join(directory, 'metricas.json'))
+    result['metrics'] = metrics.METRICS.snapshot()
+    return result
+
+def run(shards: list, processes: int | None = None, rate: float = 10, **options) -> list:
+    '''
+    Run the shards on a pool of processes, returns their results in the order of the shards.
+    rate: requests per second of the whole job, shared by the processes.
+    options: arguments of run_shard.
+    '''
+    shards = sorted(set(shards), key=Shard.order)
+    processes = min(processes or os.cpu_count() or 1, len(shards)) or 1
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(run_shard, shard, rate=rate / processes, **options): shard for shard in shards}
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                result = future.result()
+            except Exception as error: # the process died (e.g. out of memory)
+                result = {'shard': shard, 'directory': None, 'status': 'failed', 'games': 0, 'error': repr(error)}
+            snapshot = result.pop('metrics', None)
+            if snapshot is not None:
+                metrics.METRICS.merge(snapshot)
+            if result['status'] == 'ok':
+                logging.info(f"Shard {shard.name}: {result['games']} games in {result.get('elapsed')}s")
+            else:
+                logging.error(f"Shard {shard.name} failed: {result['error']}")
+            results.append(result)
+    return sorted(results, key=lambda result: result['shard'].order())
+
+def _read_rows(filename: str, table: str) -> list:
+    with open(filename, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return [dict(zip(df.COLUMNS[table], row)) for row in reader if len(row) == len(df.COLUMNS[table])]
+
+def merge(results: list, directory: str = 'Datas', database: loader.Loader | None = None) -> None:
+    '''
+    Merge the csv files of the shards that ended well into the files of directory (and the
+    database), in the order of the shards: a row saved by two shards comes from the last one.
+    '''
+    for result in sorted(results, key=lambda result: result['shard'].order()):
+        if result['status'] != 'ok':
+            logging.warning(f"Shard {result['shard'].name} not merged: {result['error']}")
+            continue
+        for table in loader.TABLES:
+            filename = os.path.join(result['directory'], f'{table}.csv')
+            if os.path.exists(filename):
+                df.merge_toCSV(_read_rows(filename, table), os.path.join(directory, f'{table}.csv'),
+                               df.COLUMNS[table], df.KEYS[table])
+        if database is not None:
+            database.new_source()
+            loader.load_directory(database, result['directory'], result['shard'].season)
+        logging.info(f"Shard {result['shard'].name} merged")
+
+def save_report(results: list, filename: str) -> None:
+    '''Status of each shard of the job, as JSON'''
+
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump([dict(result, shard=result['shard'].name) for result in results], file, indent=1)
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    processes = None
+    if '-p' in args:
+        position = args.index('-p')
+        processes = int(args[position + 1])
+        del args[position:position + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(2)
+
+    os.makedirs('Datas/shards', exist_ok=True)
+    logging.basicConfig(filename='runner.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s', encoding='utf-8')
+    metrics.quiet_libraries()
+    results = run([Shard.parse(arg) for arg in args], processes)
+    save_report(results, 'Datas/shards/execucao.json')
+    metrics.METRICS.save('Datas/shards/metricas.prom')
+    metrics.METRICS.save('Datas/shards/metricas.json')
+
+    banco = loader.Loader(loader.SQLiteBackend('Datas/espn.sqlite'))
+    merge(results, 'Datas', banco)
+    banco.close()
+    for result in results:
+        print(f"{result['shard'].name}: {result['status']}, {result['games']} games"
+              + (f" ({result['error']})" if result['error'] else ''))
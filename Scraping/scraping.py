@@ -4,33 +4,133 @@ This file contains the code for scraping the data from the website from ESPN.
 By @luc-llb
 '''
 
+import re
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import numpy as np
+from bs4 import BeautifulSoup, SoupStrainer
+import time
 import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import transport
+import ratelimit
+import cache
+import metrics
+import extract
+import commentary
+import summary
+import records
+
+# Root of every page, can be pointed to a local server serving saved pages
+BASE_URL = 'https://www.espn.com.br'
+
+# Path of a page of the site or of the summary API -> (page type, id) of the page
+ROUTES = [
+    (re.compile(r'/futebol/partida-estatisticas/_/jogoId/(\d+)'), 'estatisticas'),
+    (re.compile(r'/futebol/comentario/_/jogoId/(\d+)'), 'comentario'),
+    (re.compile(r'/futebol/escalacoes/_/jogoId/(\d+)'), 'escalacoes'),
+    (re.compile(r'/futebol/resultados/_/data/(\d+)'), 'resultados'),
+    (re.compile(r'/futebol/classificacao/_/liga/[^/]+/temporada/(\d+)'), 'classificacao'),
+    (re.compile(r'/futebol/time/elenco/_/id/(\d+)'), 'elenco'),
+    (re.compile(r'/apis/site/v2/sports/soccer/[^/]+/summary\?event=(\d+)'), 'summary'),
+]
+
+# Parser used by BeautifulSoup, see set_parser
+PARSER = 'html.parser'
+
+def set_parser(name: str = 'auto') -> str:
+    '''
+    Choose the parser of the pages: 'lxml' (faster, needs the lxml package),
+    'html.parser' (always available) or 'auto' (lxml when installed).
+    '''
+    global PARSER
+    if name == 'auto':
+        try:
+            import lxml
+            name = 'lxml'
+        except ImportError:
+            name = 'html.parser'
+    PARSER = name
+    logging.info(f'Parser: {PARSER}')
+    return PARSER
+
+def class_strainer(classes: list[str]) -> SoupStrainer:
+    '''
+    SoupStrainer keeping only the tags (and their children) with one of the classes.
+    As in find_all(class_=...), a value with spaces must be the whole class attribute
+    and a value without spaces can be one of the classes of the tag.
+    '''
+    keep = set(classes) | {'Error404__Title'} # used by verify_page
 
-def get_soup(url: str) -> BeautifulSoup | None:
-    '''Return de BeautifulSoup object from a url'''
+    def match(value) -> bool:
+        if value is None:
+            return False
+        return value in keep or any(token in keep for token in value.split())
 
-    headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'
-    }
+    return SoupStrainer(attrs={'class': match})
+
+# Parts of each page used by the scrapers (see extract.SPECS), the rest of the page is not parsed
+STRAINERS = {page_type: class_strainer(extract.classes(page_type)) for page_type in extract.SPECS}
+
+# Where the data of the games come from: 'dom' (the pages) or 'json' (the summary of the game,
+# reading the page only when the summary is missing), see set_extraction
+EXTRACTION = 'dom'
+
+def set_extraction(mode: str = 'json') -> str:
+    '''Choose how the pages of the games are read: 'json' (summary of ESPN) or 'dom' (the pages)'''
+    global EXTRACTION
+    if mode not in ('json', 'dom'):
+        raise ValueError(f'Unknown extraction mode: {mode}')
+    EXTRACTION = mode
+    logging.info(f'Extraction: {EXTRACTION}')
+    return EXTRACTION
+
+# Collector of the comments without rule (comment_coverage.Coverage), see set_coverage
+COVERAGE = None
+
+def set_coverage(coverage) -> None:
+    '''Record in coverage the non-standard comments of every game parsed (None to stop)'''
+    global COVERAGE
+    COVERAGE = coverage
+
+# Prefix of the links to the players
+PLAYER_URL = 'https://www.espn.com.br/futebol/jogador/_/id/'
+
+def make_soup(content: bytes | str, parse_only: SoupStrainer | None = None, parser: str | None = None) -> BeautifulSoup:
+    '''Parse a page with the chosen parser, only the parts accepted by parse_only (if given)'''
+    return BeautifulSoup(content, parser or PARSER, parse_only=parse_only)
+
+def get_soup(url: str, parse_only: SoupStrainer | None = None, page_type: str = 'outra') -> BeautifulSoup | None:
+    '''Return de BeautifulSoup object from a url (page_type labels its metrics)'''
 
     if(type(url) != str):
         logging.warning('URL must be a string')
         return None
 
-    page = requests.get(url, headers=headers)
+    start = time.perf_counter()
+    try:
+        with metrics.timer('fetch', page_type):
+            page = transport.get_transport().get(url)
+    except requests.RequestException as error:
+        logging.warning(f'Request failed: {error}')
+        return None
+    source = 'cache' if isinstance(page, cache.CachedResponse) else 'network'
+    metrics.count('pages', page=page_type, source=source)
+    metrics.count('bytes', len(page.content), page=page_type)
+    metrics.event('fetch', page=page_type, status=page.status_code, source=source,
+                  bytes=len(page.content), seconds=round(time.perf_counter() - start, 3))
     if page.status_code != 200:
-        logging.warning(f'Error {page.status_code}')
+        metrics.count('failures', stage='fetch', name=page_type)
+        if page.status_code in ratelimit.RETRYABLE:
+            # The site is throttling or failing, the page exists but could not be fetched
+            logging.error(f'Error {page.status_code} (gave up) from {url}')
+        else:
+            logging.warning(f'Error {page.status_code}')
         return None
-    return BeautifulSoup(page.content, 'html.parser')
+    with metrics.timer('soup', page_type):
+        return make_soup(page.content, parse_only)
 
-def verify_page(url: str) -> BeautifulSoup | None:
+def check_page(page: BeautifulSoup | None) -> BeautifulSoup | None:
     '''Verify if the page is empty'''
-    page = get_soup(url)
 
     if page is None:
         logging.warning('Page not found')
@@ -40,30 +140,38 @@ def verify_page(url: str) -> BeautifulSoup | None:
         return None
     return page
 
-def get_games(url: str) -> list | None:
-    '''Get the IDs of all games from a specific URL'''
-    
-    page = verify_page(url)
-    
-    if page is None:
-        return None
-    elif not page.find('h4', class_='n5 tc pv6 clr-gray-05') is None:
+def verify_page(url: str, parse_only: SoupStrainer | None = None, page_type: str = 'outra') -> BeautifulSoup | None:
+    '''Verify if the page is empty'''
+    return check_page(get_soup(url, parse_only, page_type))
+
+@metrics.timed('parse', 'resultados')
+def parse_games(page: BeautifulSoup) -> list | None:
+    '''Get the IDs of all games from a results page'''
+
+    record = extract.extract(page, 'resultados')
+    if not record.no_data is None:
         logging.warning('No data found')
         return None
     
-    links = page.find_all('a', class_='AnchorLink Button Button--sm Button--anchorLink Button--alt mb4 w-100 mr2')
+    links = record.links
     ids = [l['href'].replace('/futebol/partida-estatisticas/_/jogoId/','') for l in links if 'partida-estatisticas' in l['href']]
     if not ids:
         logging.warning('No links found')
         return None
     return ids
 
-def get_all_games(from_date: int, to_date: int = 0) -> dict | None:
-    '''
-    Gets all links to games within a specific date range.
-    If no end date is given, it is considered the current date.
-    Use from_date < to_date .
-    '''
+def get_games(url: str) -> list | None:
+    '''Get the IDs of all games from a specific URL'''
+    
+    page = verify_page(url, STRAINERS['resultados'], 'resultados')
+    
+    if page is None:
+        return None
+    return parse_games(page)
+
+def _date_range(from_date: int, to_date: int = 0) -> list | None:
+    '''Validate the dates and return every day between them as YYYYMMDD strings'''
+
     today = int(datetime.date.today().strftime('%Y%m%d'))
     if to_date == 0:
         to_date = today
@@ -77,47 +185,116 @@ def get_all_games(from_date: int, to_date: int = 0) -> dict | None:
     
     init = datetime.datetime.strptime(str(from_date), '%Y%m%d')
     end = datetime.datetime.strptime(str(to_date), '%Y%m%d')
-    data_range = pd.date_range(start=init, end=end)
-    data_range = [date.strftime('%Y%m%d') for date in data_range]
+    return [(init + datetime.timedelta(days=day)).strftime('%Y%m%d') for day in range((end - init).days + 1)]
+
+def get_all_games(from_date: int, to_date: int = 0, league: str = 'bra.1') -> dict | None:
+    '''
+    Gets all links to games within a specific date range.
+    If no end date is given, it is considered the current date.
+    Use from_date < to_date .
+    '''
+    data_range = _date_range(from_date, to_date)
+    if data_range is None:
+        return None
 
     pages = {}
     for date in data_range:
-        url = f'https://www.espn.com.br/futebol/resultados/_/data/{date}/liga/bra.1'
+        url = f'{BASE_URL}/futebol/resultados/_/data/{date}/liga/{league}'
         logging.info(f'Getting IDs from {url}:')
         links = get_games(url)
         if not links is None:
             pages[date] = links
     return pages
 
-def get_datas_from_estatisticas(id: str) -> dict | None:
+def _discover_day(date: str, league: str) -> tuple:
+    '''
+    Return (date, ids, fetched) for a results day, fetched is False when the page could not be obtained
+    or did not tell the day is empty (a page without links and without the marker of no games
+    may be a partial page or a new layout, the day is searched again in the next run)
+    '''
+    url = f'{BASE_URL}/futebol/resultados/_/data/{date}/liga/{league}'
+    logging.info(f'Getting IDs from {url}:')
+    page = verify_page(url, STRAINERS['resultados'], 'resultados')
+    if page is None:
+        return date, None, False
+    ids = parse_games(page)
+    if ids is None:
+        return date, None, extract.extract(page, 'resultados').no_data is not None
+    return date, ids, True
+
+def iter_all_games(from_date: int, to_date: int = 0, league: str = 'bra.1', workers: int = 8, calendar=None):
+    '''
+    Same search as get_all_games, but the days are requested concurrently and
+    (date, ids) pairs are yielded as soon as they arrive (not in date order).
+    calendar: optional matchdays.Calendar, days already known are not requested again
+    and the days requested are recorded in it.
+    '''
+    data_range = _date_range(from_date, to_date)
+    if data_range is None:
+        return
+
+    pending = []
+    for date in data_range:
+        if calendar is not None and calendar.is_known(league, date):
+            ids = calendar.get(league, date)
+            if ids:
+                yield date, ids
+        else:
+            pending.append(date)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(_discover_day, date, league) for date in pending]
+        for future in as_completed(futures):
+            date, ids, fetched = future.result()
+            if calendar is not None and fetched:
+                calendar.record(league, date, ids or [])
+            if ids is not None:
+                yield date, ids
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if calendar is not None:
+            calendar.save()
+
+def get_datas_from_estatisticas(id: str, league: str = 'bra.1') -> records.Partida | None:
     '''Get the stats from a game by the page Estatisticas'''
 
     if type(id) != str:
         logging.warning('ID must be a string')
         return None
 
-    url = f'https://www.espn.com.br/futebol/partida-estatisticas/_/jogoId/{id}'
-    page = verify_page(url)
+    if EXTRACTION == 'json':
+        data = summary.game_page('estatisticas', id, league)
+        if data is not summary.MISSING:
+            return data
+
+    url = f'{BASE_URL}/futebol/partida-estatisticas/_/jogoId/{id}'
+    page = verify_page(url, STRAINERS['estatisticas'], 'estatisticas')
 
     if page is None:
         return None
-    elif page.find_all('div', class_='Gamestrip__Score relative tc w-100 fw-heavy-900 h2 clr-gray-01') == []:
+    return parse_estatisticas(page, id)
+
+@metrics.timed('parse', 'estatisticas')
+def parse_estatisticas(page: BeautifulSoup, id: str) -> records.Partida | None:
+    '''Get the stats from a game by its parsed page Estatisticas'''
+
+    record = extract.extract(page, 'estatisticas')
+    if record.scores == []:
         # This is a way to check if the game was canceled, when there is no score
         logging.warning('Game canceled')
         return None
     
-    team1 = {}
-    team2 = {}
+    team1 = records.EstatisticaTime()
+    team2 = records.EstatisticaTime()
 
     # Finding team names
-    aux = page.find_all('h2', class_='ScoreCell__TeamName ScoreCell__TeamName--displayName db')
-    aux = [name.text for name in aux]
+    aux = [name.text for name in record.team_names]
     
     team1['time'], team2['time'] = aux[0], aux[1]
 
     # Finding gols
-    aux = page.find_all('div', class_='Gamestrip__Score relative tc w-100 fw-heavy-900 h2 clr-gray-01')
-    aux = [gol.text for gol in aux]
+    aux = [gol.text for gol in record.scores]
     for i in range(len(aux)):
         index = aux[i].find('V') # Removing extra information
         if index != -1:
@@ -126,8 +303,7 @@ def get_datas_from_estatisticas(id: str) -> dict | None:
 
     # Finding team stats
     labels = ['chute a gol', 'chute', 'faltas', 'amarelos', 'vermelhos', 'escanteios', 'defesas']
-    aux = page.find_all('span', class_='bLeWt ZfQkn JoGSb hsDdd ICQCm')
-    aux = [stat.text for stat in aux]
+    aux = [stat.text for stat in record.stats]
     
     count = 0
     for i in range(0, len(labels)*2, 2):
@@ -136,202 +312,143 @@ def get_datas_from_estatisticas(id: str) -> dict | None:
         count += 1
     
     # Finding possession
-    aux = page.find('span', class_='bLeWt ZfQkn JoGSb VZTD pgHdv uHRs')
-    team1['posse'] = aux.text.replace('%','')
-
-    aux = page.find('span', class_='bLeWt ZfQkn JoGSb VZTD nljvg')
-    team2['posse'] = aux.text.replace('%','')
+    team1['posse'] = record.posse_mandante.text.replace('%','')
+    team2['posse'] = record.posse_visitante.text.replace('%','')
 
     # Finding general information about the game
-    general_inf = {
-        'partida': id
-    } 
+    general_inf = records.Partida(id)
 
-    aux = page.find('div', class_='ScoreCell__GameNote di')
+    aux = record.campeonato
     general_inf['campeonato'] = aux.text if aux is not None else None
 
-    aux = page.find('div', class_='n6 clr-gray-03 GameInfo__Location__Name--noImg')
+    aux = record.estadio
     general_inf['estadio'] = aux.text if aux is not None else None
 
-    aux = page.find('div', class_='n8 GameInfo__Meta')
+    aux = record.meta
     aux = aux.find('span').text.split(',') if aux is not None else None
     general_inf['horario'] = aux[0] if aux is not None else None
     general_inf['data'] = aux[1] if aux is not None else None
 
-    aux = page.find('span', class_='Location__Text')
+    aux = record.local
     general_inf['local'] = aux.text if aux is not None else None
 
-    aux = page.find('div', class_='Attendance__Numbers')
+    aux = record.audiencia
     general_inf['audiencia'] = aux.text.replace('Attendance:','').replace(',','') if aux is not None else None
 
-    aux = page.find('li', class_='GameInfo__List__Item')
+    aux = record.arbitro
     general_inf['arbitro'] = aux.text if aux is not None else None
 
     general_inf['mandante'] = team1
     general_inf['visitante'] = team2
 
+    # Clock of the game strip, a final label once the game is over
+    aux = record.clock
+    general_inf['encerrada'] = aux.text.strip() in cache.FINAL_LABELS if aux is not None else None
+
     return general_inf
 
-def get_data_from_comment(index: int, text: str, minute: str) -> None:
-    key = index
-    datas = {key:{'jogador-1':None, 'jogador-2':None, 'time':None, 'tipo':None, 'descricao':None, 'minuto':''}}
-
-    datas[key]['minuto'] = minute
-    if "Falta cometida" in text:
-        point = text.find('(') # Dot where is the team name
-        datas[key]['jogador-1'] = text[19:point-1]
-        datas[key]['time'] = text[point+1:len(text)-2] # removing the parentheses
-        datas[key]['tipo'] = 'FALTA-FEITA'
-
-    elif "sofre uma falta" in text:
-        point = text.find('(')
-        datas[key]['jogador-2'] = text[:point-1]
-        datas[key]['time'] = text[point+1:text.find(')')]
-        datas[key]['tipo'] = 'FALTA-SOFRIDA'
-
-    elif "Oportunidade perdida" in text:
-        point = text.find('(')
-        datas[key]['jogador-1'] = text[21:point-1]
-        datas[key]['time'] = text[point+1:text.find(')')]
-        datas[key]['tipo'] = 'GOL-PERDIDO'
-        description = text[text.find(','):text.find('.')]
-        if 'cabeça' in description: # Checking the type of shot
-            datas[key]['descricao'] = 'CABECEIO'
-        elif 'pé direito' in description: 
-            datas[key]['descricao'] = 'CHUTE (pé direito)'
-        else:
-            datas[key]['descricao'] = 'CHUTE (pé esquerdo)'
-
-    elif "Escanteio" in text:
-        point = text.find('.')
-        datas[key]['time'] = text[11:point]
-        datas[key]['jogador-2'] = text[point+13:-1]
-        datas[key]['tipo'] = 'ESCANTEIO'
-
-    elif "Impedimento" in text:
-        point = text.find('.')
-        datas[key]['jogador-1'] = text[point+2:text.find('tentou')-1]
-        datas[key]['jogador-2'] = text[text.find('encontrou')+10:text.find(' em posição')]
-        datas[key]['time'] = text[13:point]
-        datas[key]['tipo'] = 'IMPEDIMENTO'
-
-    elif "cartão" in text:
-        point = text.find('(')
-        datas[key]["jogador-1"] = text[:point-1]
-        datas[key]['time'] = text[point+1:text.find(')')]
-        if 'por' in text:
-            datas[key]['descricao'] = text[text.find('por', point):-1]
-        if 'amarelo' in text:
-            datas[key]['tipo'] = 'CARTAO-AMARELO'
-        elif 'vermelho' in text:
-            datas[key]['tipo'] = 'CARTAO-VERMELHO'
-
-    elif "Gol" in text:
-        point = text.find(' (')
-        datas[key]["jogador-1"] = text[text.find('.')+2: point]
-        if 'Assistência' in text:
-            datas[key]['jogador-2'] = text[text.find('Assistência ')+15:-1]
-        datas[key]['time'] = text[point+2:text.find(')')]
-        descroption = text[text.find(')')+2:text.find('gol.')+3]
-        if 'direito' in descroption:
-            datas[key]['descricao'] = "pé direito"
-        elif 'esquerdo' in descroption:
-            datas[key]['descricao'] = "pé esquerdo"
-        elif 'cabeça' in descroption:
-            datas[key]['descricao'] = "cabeça"
-        else:
-            datas[key]['descricao'] = text[text.find(')')+2:text.find('gol.')+3]
-        datas[key]['tipo'] = 'GOL'
-
-    elif "Substituição" in text:
-        point = text.find('substituindo')
-        datas[key]['jogador-1'] = text[text.find('campo')+6:point-1]
-        datas[key]['jogador-2'] = text[point+13:text.find('.', point)]
-        datas[key]['time'] = text[13:text.find(',')]
-        datas[key]['tipo'] = 'SUBSTITUICAO'
-
-    elif "lesão" in text:
-        point = text.find('(')
-        datas[key]['jogador-1'] = text[text.find('lesão de')+9:point-1]
-        datas[key]['time'] = text[point+1:text.find(')', point)]
-        datas[key]['tipo'] = 'LESAO'
-
-    elif "Fim do primeiro" in text:
-        datas[key]['tipo'] = 'ENCERRAMENTO-1'
-
-    elif "Fim do segundo" in text:
-        datas[key]['tipo'] = 'ENCERRAMENTO-2'
-    
-    else:
-        logging.warning(f'Non-standard comment')
-        return
-    
-    return datas
+def get_data_from_comment(index: int, text: str, minute: str) -> dict | None:
+    '''Classify a comment with the rules of commentary.RULES, returns {index: play}'''
 
-def get_datas_from_comentarios(id: str) -> dict | None:
+    data = commentary.classify_one(text, minute)
+    if data is None:
+        logging.warning(f'Non-standard comment: {text}')
+        return None
+    return {index: data}
+
+def get_datas_from_comentarios(id: str, league: str = 'bra.1') -> records.Lances | None:
     '''Get the stats from a game by the page Comentarios'''
 
     if type(id) != str:
         logging.warning('ID must be a string')
         return None
 
-    url = f'https://www.espn.com.br/futebol/comentario/_/jogoId/{id}'
-    page = verify_page(url)
+    if EXTRACTION == 'json':
+        texts = summary.game_page('comentario', id, league)
+        if texts is None:
+            return None
+        if texts is not summary.MISSING:
+            return classify_comments(texts, id)
+
+    url = f'{BASE_URL}/futebol/comentario/_/jogoId/{id}'
+    page = verify_page(url, STRAINERS['comentario'], 'comentario')
 
     if page is None:
         return None
-    elif page.find_all('div', class_='Gamestrip__Score relative tc w-100 fw-heavy-900 h2 clr-gray-01') == []:
+    return parse_comentarios(page, id)
+
+@metrics.timed('parse', 'comentario')
+def parse_comentarios(page: BeautifulSoup, id: str) -> dict | None:
+    '''Get the plays from a game by its parsed page Comentarios'''
+
+    record = extract.extract(page, 'comentario')
+    if record.scores == []:
         # This is a way to check if the game was canceled, when there is no score
         logging.warning('Game canceled')
         return None
 
     # Getting comments
-    minutes = page.find_all('div', class_='MatchCommentary__Comment__Timestamp')
-    comments = page.find_all('div', class_='MatchCommentary__Comment__GameDetails')
+    minutes = record.minutes
+    comments = record.comments
     if len(minutes) != len(comments):
         logging.warning('Data inconsistency')
         return None
-    
-    bids = {
-        'partida': id,
-    } # Dictionary to store the data from comments
-
-    for comment, minute in zip(comments, minutes):
-        index = len(bids)
-        data = get_data_from_comment(index, comment.text, minute.text)
-        if data is not None:
-            data['partida'] = id
-            bids.update(data)
-        # else:
-        #     print(comment.text)
-        
+    return classify_comments([(comment.text, minute.text) for comment, minute in zip(comments, minutes)], id)
+
+def classify_comments(texts: list, id: str) -> records.Lances:
+    '''Get the plays from the (text, minute) comments of a game'''
+
+    bids = records.Lances(id) # Plays of the comments, read also as {'partida': id, 1: play, ...}
+
+    unmatched = []
+    for (text, minute), play in zip(texts, commentary.classify(texts)):
+        if play is None:
+            unmatched.append(text)
+            continue
+        bids.append(play)
+
+    if unmatched:
+        logging.warning(f'{len(unmatched)} non-standard comments in game {id}')
+    if COVERAGE is not None:
+        COVERAGE.add_game(id, len(texts), unmatched)
     return bids
 
-def get_lineup(id: str) -> dict | None:
+def get_lineup(id: str, league: str = 'bra.1') -> dict | None:
     '''Get the lineup from a game by the page Escalacoes'''
 
     if type(id) != str:
         logging.warning('ID must be a string')
         return None
 
-    url = f'https://www.espn.com.br/futebol/escalacoes/_/jogoId/{id}'
-    page = verify_page(url)
-    
+    if EXTRACTION == 'json':
+        data = summary.game_page('escalacoes', id, league)
+        if data is not summary.MISSING:
+            return data
+
+    url = f'{BASE_URL}/futebol/escalacoes/_/jogoId/{id}'
+    page = verify_page(url, STRAINERS['escalacoes'], 'escalacoes')
+
     if page is None:
         return None
-    elif page.find_all('div', class_='Gamestrip__Score relative tc w-100 fw-heavy-900 h2 clr-gray-01') == []:
+    logging.info(f'Getting lineup from {url}:')
+    return parse_lineup(page, id)
+
+@metrics.timed('parse', 'escalacoes')
+def parse_lineup(page: BeautifulSoup, id: str) -> dict | None:
+    '''Get the lineup from a game by its parsed page Escalacoes'''
+
+    record = extract.extract(page, 'escalacoes')
+    if record.scores == []:
         # This is a way to check if the game was canceled, when there is no score
         logging.warning('Game canceled')
         return None
-    
-    logging.info(f'Getting lineup from {url}:')
 
     substitute = 'SoccerLineUpPlayer__Header SoccerLineUpPlayer__Header--subbedIn' # div
     starting_player = 'SoccerLineUpPlayer__Header' # div
     class_names = 'AnchorLink SoccerLineUpPlayer__Header__Name' # a
 
     # Getting the table with the components of the page
-    aux = list(page.find_all('div', class_='ResponsiveTable LineUps__PlayersTable'))
+    aux = record.players_tables
     team1_component = aux[0]
     team2_component = aux[1]
 
@@ -342,16 +459,16 @@ def get_lineup(id: str) -> dict | None:
     for name1, name2 in zip(substitutes1, substitutes2):
         player1 = name1.find('a', class_=class_names)
         player2 = name2.find('a', class_=class_names)
-        team1_substitute.append(player1['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/', '').split('/')[0])
-        team2_substitute.append(player2['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/', '').split('/')[0])
+        team1_substitute.append(player1['href'].replace(PLAYER_URL, '').split('/')[0])
+        team2_substitute.append(player2['href'].replace(PLAYER_URL, '').split('/')[0])
     
     # Getting the names of the starting players
     team1_starting, team2_starting = [], []
     startings1 = team1_component.find_all('div', class_=starting_player)
     startings2 = team2_component.find_all('div', class_=starting_player)
     for name1, name2 in zip(startings1, startings2):
-        player1 = name1.find('a', class_=class_names)['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/', '').split('/')[0]
-        player2 = name2.find('a', class_=class_names)['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/', '').split('/')[0]
+        player1 = name1.find('a', class_=class_names)['href'].replace(PLAYER_URL, '').split('/')[0]
+        player2 = name2.find('a', class_=class_names)['href'].replace(PLAYER_URL, '').split('/')[0]
         if player1 not in team1_substitute:
             team1_starting.append(player1)
         if player2 not in team2_substitute:
@@ -359,47 +476,43 @@ def get_lineup(id: str) -> dict | None:
     
     # Getting the names of the reserve players
     team1_reserve, team2_reserve = [], []
-    aux = page.find_all('div', class_='ResponsiveTable LineUps__SubstitutesTable')
+    aux = record.substitutes_tables
     team1_component = aux[0]
     team2_component = aux[1]
 
     aux = team1_component.find_all('a', class_=class_names)
-    team1_reserve = [player['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/', '').split('/')[0] for player in aux]
+    team1_reserve = [player['href'].replace(PLAYER_URL, '').split('/')[0] for player in aux]
     aux = team2_component.find_all('a', class_=class_names)
-    team2_reserve = [player['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/', '').split('/')[0] for player in aux]
+    team2_reserve = [player['href'].replace(PLAYER_URL, '').split('/')[0] for player in aux]
 
     # Finding team names
-    aux = page.find_all('h2', class_='ScoreCell__TeamName ScoreCell__TeamName--displayName db')
-    aux = [name.text for name in aux]
+    aux = [name.text for name in record.team_names]
     
     team1, team2 = aux[0], aux[1]
 
     datas = {
         'partida': id,
-        team1: {
-            'titulares': team1_starting,
-            'substitutos': team1_substitute,
-            'reservas': team1_reserve
-        },
-        team2: {
-            'titulares': team2_starting,
-            'substitutos': team2_substitute,
-            'reservas': team2_reserve
-        }
+        team1: records.Escalacao(team1_starting, team1_substitute, team1_reserve),
+        team2: records.Escalacao(team2_starting, team2_substitute, team2_reserve),
     }
     return datas
 
-def get_teams_id(temporada: int = 2024) -> list | None:
+def get_teams_id(temporada: int = 2024, league: str = 'bra.1') -> list | None:
     '''Get the IDs of the teams from the table'''
 
-    url = f'https://www.espn.com.br/futebol/classificacao/_/liga/BRA.1/temporada/{temporada}'
-    page = verify_page(url)
+    url = f'{BASE_URL}/futebol/classificacao/_/liga/{league.upper()}/temporada/{temporada}'
+    page = verify_page(url, STRAINERS['classificacao'], 'classificacao')
     if page is None:
         return None
 
     logging.info(f'Getting teams IDs from {url}:')
+    return parse_teams_id(page)
+
+@metrics.timed('parse', 'classificacao')
+def parse_teams_id(page: BeautifulSoup) -> list:
+    '''Get the IDs of the teams from the parsed page of the table'''
 
-    aux = page.find_all('span', class_='hide-mobile')
+    aux = extract.extract(page, 'classificacao').teams
     id = []
     for element in aux:
         id.append({
@@ -408,41 +521,65 @@ def get_teams_id(temporada: int = 2024) -> list | None:
 
     return id
 
-def get_cast(id: str, season: int = 2024) -> dict | None:
+def get_cast(id: str, season: int = 2024, league: str = 'bra.1') -> records.Passagem | None:
     '''Get the cast of the team'''
 
-    url = f'https://www.espn.com.br/futebol/time/elenco/_/id/{id}/liga/BRA.1/temporada/{season}'
-    page = verify_page(url)
+    url = f'{BASE_URL}/futebol/time/elenco/_/id/{id}/liga/{league.upper()}/temporada/{season}'
+    page = verify_page(url, STRAINERS['elenco'], 'elenco')
 
     if page is None:
         return None
     elif not page.find('h1', class_='Error404__Title') is None:
         logging.warning('Team not found')
         return None
-    
-    line_class = 'Table__TR Table__TR--sm Table__even' # tr
+    return parse_cast(page, id, season)
+
+@metrics.timed('parse', 'elenco')
+def parse_cast(page: BeautifulSoup, id: str, season: int = 2024) -> records.Passagem:
+    '''Get the cast of the team from its parsed page Elenco'''
+
     column_class = 'Table__TD' # td
     class_names = 'AnchorLink' # a
 
     tags = {'A': 'ATACANTE', 'G': 'GOLEIRO', 'D': 'DEFENSOR', 'M':'MEIO-CAMPO'}
     
     players = []
-    table = page.find_all('tr', class_=line_class)
+    table = extract.extract(page, 'elenco').lines
     for line in table:
         player = line.find('a', class_=class_names).text
-        espn_id = line.find('a', class_=class_names)['href'].replace('https://www.espn.com.br/futebol/jogador/_/id/','').split('/')[0]
+        espn_id = line.find('a', class_=class_names)['href'].replace(PLAYER_URL,'').split('/')[0]
         columns = line.find_all('td', class_=column_class)
-        players.append({
-            'nome': player,
-            'espn_id': espn_id,
-            'posicao': tags[columns[1].text] if columns[1].text in tags else None,
-            'idade': columns[2].text if columns[2].text != '--' else None,
-            'altura': columns[3].text if columns[3].text != '--' else None,
-            'nacionalidade': columns[5].text if columns[5].text != '--' else None,
-        })
-    cast = {
-        'time': id,
-        'temporada': season,
-        'jogadores': players
-    }
-    return cast
\ No newline at end of file
+        players.append(records.Jogador(
+            nome=player,
+            espn_id=espn_id,
+            posicao=tags[columns[1].text] if columns[1].text in tags else None,
+            idade=columns[2].text if columns[2].text != '--' else None,
+            altura=columns[3].text if columns[3].text != '--' else None,
+            nacionalidade=columns[5].text if columns[5].text != '--' else None,
+        ))
+    return records.Passagem(time=id, temporada=season, jogadores=players)
+
+def parse_page(page_type: str, content: bytes | str, id: str | None = None,
+               strain: bool = True, parser: str | None = None):
+    '''
+    Parse a page already downloaded with the same code of the get_* functions.
+    page_type: one of STRAINERS ('resultados', 'estatisticas', 'comentario', 'escalacoes', 'classificacao', 'elenco').
+    id: the jogoId of game pages or the team id of 'elenco' pages.
+    strain: parse only the parts of the page used (False builds the whole tree).
+    '''
+    page = check_page(make_soup(content, STRAINERS[page_type] if strain else None, parser))
+    if page is None:
+        return None
+    if page_type == 'resultados':
+        return parse_games(page)
+    elif page_type == 'estatisticas':
+        return parse_estatisticas(page, id)
+    elif page_type == 'comentario':
+        return parse_comentarios(page, id)
+    elif page_type == 'escalacoes':
+        return parse_lineup(page, id)
+    elif page_type == 'classificacao':
+        return parse_teams_id(page)
+    elif page_type == 'elenco':
+        return parse_cast(page, id)
+    raise ValueError(f'Unknown page type: {page_type}')
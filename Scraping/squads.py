@@ -0,0 +1,158 @@
+'''
+This module collects the squads of many seasons at once: the tables of the seasons and then the
+casts of every (team, season) are fetched concurrently, and the players go to an index by ESPN id.
+A player in several seasons or clubs is formatted once (with the data of the last season) and each
+of the clubs is only a passagem (id_jogador, id_time, ano) of the index, so the rows of a backfill
+grow with the players and the passagens, not with the casts times the players.
+The index can start from the csv files of previous runs, then only new players are formatted again.
+
+Usage: python squads.py <league> <season> [season ...]   e.g. python squads.py bra.1 2022 2023 2024
+'''
+
+import os
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import scraping as sc
+import data_format as df
+import resolution
+import loader
+from records import as_record, Passagem
+
+def _team_id(value) -> int:
+    # Values of get_teams_id/get_cast: '6086/botafogo' or '6086'
+    return int(str(value).split('/')[0])
+
+class PlayerIndex:
+    '''Teams, players (by ESPN id) and passagens of the squads collected'''
+
+    def __init__(self):
+        self.teams = {} # espn id of the team -> name
+        self.players = {} # espn id of the player -> Jogador (of his last season)
+        self.saved = {} # espn id of the player -> name, players already in the csv files
+        self.seasons = {} # espn id of the player -> last season seen
+        self.passagens = set() # (id_jogador, id_time, ano)
+        self.changed = set() # espn ids of the players to format (new or of a later season)
+        self.new_teams = set()
+        self.new_passagens = set()
+
+    def add_team(self, nome: str, id) -> None:
+        id = _team_id(id)
+        if self.teams.get(id) != nome:
+            self.teams[id] = nome
+            self.new_teams.add(id)
+
+    def add_cast(self, cast) -> None:
+        '''Add the players of a cast (result of get_cast)'''
+
+        cast = as_record(Passagem, cast)
+        team, season = _team_id(cast.time), int(cast.temporada)
+        for player in cast.jogadores:
+            id = int(player.espn_id)
+            last = self.seasons.get(id)
+            if last is None or season > last:
+                self.players[id] = player
+                self.seasons[id] = season
+                self.changed.add(id)
+            elif season == last and id not in self.players:
+                # Same season of the csv files: the row saved is kept
+                self.players[id] = player
+                if id not in self.saved:
+                    self.changed.add(id)
+            passagem = (id, team, season)
+            if passagem not in self.passagens:
+                self.passagens.add(passagem)
+                self.new_passagens.add(passagem)
+
+    def load(self, directory: str) -> 'PlayerIndex':
+        '''Start from the csv files of previous runs (their rows are not formatted again)'''
+
+        filenames = {table: os.path.join(directory, f'{table}.csv') for table in ('times', 'jogadores', 'passagens')}
+        if os.path.exists(filenames['times']):
+            for row in loader.read_csv(filenames['times'], 'times'):
+                self.teams[int(row['espn_id'])] = row['nome']
+        if os.path.exists(filenames['passagens']):
+            for row in loader.read_csv(filenames['passagens'], 'passagens'):
+                passagem = (int(row['id_jogador']), int(row['id_time']), int(row['ano']))
+                self.passagens.add(passagem)
+                self.seasons[passagem[0]] = max(self.seasons.get(passagem[0], passagem[2]), passagem[2])
+        if os.path.exists(filenames['jogadores']):
+            for row in loader.read_csv(filenames['jogadores'], 'jogadores'):
+                # Only the name is needed (resolution), the row itself stays in the file
+                self.saved[int(row['espn_id'])] = row['nome']
+        logging.info(f'Squads of {directory}: {len(self.saved)} players and {len(self.passagens)} passagens')
+        return self
+
+    def tables(self, new: bool = True) -> dict:
+        '''
+        {table: columns} of times, jogadores and passagens: only the new rows by default,
+        else every row (the players of the csv files loaded are not formatted again)
+        '''
+        teams = sorted(self.new_teams if new else self.teams)
+        players = sorted(self.changed if new else self.players)
+        passagens = sorted(self.new_passagens if new else self.passagens)
+        return {
+            'times': {'nome': [self.teams[id] for id in teams], 'espn_id': teams},
+            'jogadores': df.format_jogadores_batch(self.players[id] for id in players),
+            'passagens': {column: [passagem[position] for passagem in passagens]
+                          for position, column in enumerate(df.COLUMNS['passagens'])},
+        }
+
+    def save(self, directory: str) -> dict:
+        '''Merge the new rows into the csv files of directory, returns the tables saved'''
+
+        tables = self.tables()
+        for table, columns in tables.items():
+            df.merge_toCSV(columns, os.path.join(directory, f'{table}.csv'), df.COLUMNS[table], df.KEYS[table])
+        self.changed, self.new_teams, self.new_passagens = set(), set(), set()
+        return tables
+
+    def name(self, id: int) -> str | None:
+        player = self.players.get(id)
+        return player.nome if player is not None else self.saved.get(id)
+
+    def rosters(self, season: int) -> resolution.Rosters:
+        '''resolution.Rosters of a season (players and teams of its passagens)'''
+
+        rosters = resolution.Rosters()
+        teams = {team for player, team, year in self.passagens if year == season}
+        for team in teams:
+            if team in self.teams:
+                rosters.add_team(self.teams[team], team)
+        for player, team, year in self.passagens:
+            if year == season:
+                rosters.add_player(player, self.name(player), team)
+        return rosters
+
+def collect(seasons: list, league: str = 'bra.1', workers: int = 8, index: PlayerIndex | None = None) -> PlayerIndex:
+    '''Fetch the teams and casts of the seasons concurrently into the index (a new one by default)'''
+
+    index = index if index is not None else PlayerIndex()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tables = list(executor.map(lambda season: sc.get_teams_id(season, league), seasons))
+        jobs = []
+        for season, teams in zip(seasons, tables):
+            if teams is None:
+                logging.warning(f'No teams of {league} {season}')
+                continue
+            for team in teams:
+                if team is None:
+                    continue
+                nome, id = next(iter(team.items()))
+                index.add_team(nome, id)
+                jobs.append((id, season))
+        # In the order of the jobs, so the last season read of a player is the same in every run
+        for cast in executor.map(lambda job: sc.get_cast(job[0], job[1], league), jobs):
+            if cast is not None:
+                index.add_cast(cast)
+    logging.info(f'Squads of {league} {seasons}: {len(jobs)} casts, {len(index.players)} players')
+    return index
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    sc.set_parser('auto')
+    index = collect([int(season) for season in sys.argv[2:]], sys.argv[1], index=PlayerIndex().load('Datas'))
+    tables = index.save('Datas')
+    print(', '.join(f"{len(columns[df.COLUMNS[table][0]])} {table}" for table, columns in tables.items()) + ' saved')
@@ -0,0 +1,202 @@
+'''
+This module reads the data of a game from the JSON summary of ESPN, the endpoint behind
+the pages Estatisticas, Comentario and Escalacoes. One request gives the three pages and
+decoding it is much cheaper than parsing them, and it does not depend on the CSS classes.
+The functions return the same dicts as the scrapers of the pages, or MISSING when the
+summary cannot be fetched or does not have the data, so the scraper reads the page instead.
+'''
+
+import json
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import requests
+import transport
+import cache
+import metrics
+import records
+
+# Root of the API, can be pointed to a local server serving saved summaries
+API_URL = 'https://site.api.espn.com'
+
+# Returned when the page must be scraped instead
+MISSING = object()
+
+# Summaries kept in memory, so the three pages of a game share one request
+MEMO_SIZE = 64
+
+# Statistic of the summary -> key of the dict of each team
+STATS = {
+    'shotsOnTarget': 'chute a gol',
+    'totalShots': 'chute',
+    'saves': 'defesas',
+    'possessionPct': 'posse',
+}
+
+MONTHS = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho',
+          'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+
+# Time of the site (Brasília, without daylight saving time)
+TIMEZONE = datetime.timezone(datetime.timedelta(hours=-3))
+
+CANCELED = ('STATUS_CANCELED', 'STATUS_POSTPONED', 'STATUS_ABANDONED')
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+def summary_url(id: str, league: str = 'bra.1') -> str:
+    return f'{API_URL}/apis/site/v2/sports/soccer/{league}/summary?event={id}&lang=pt&region=br'
+
+def _download(id: str, league: str) -> dict | None:
+    try:
+        with metrics.timer('fetch', 'summary'):
+            response = transport.get_transport().get(summary_url(id, league))
+    except requests.RequestException as error:
+        logging.warning(f'Summary of game {id} failed: {error}')
+        return None
+    source = 'cache' if isinstance(response, cache.CachedResponse) else 'network'
+    metrics.count('pages', page='summary', source=source)
+    metrics.count('bytes', len(response.content), page='summary')
+    metrics.event('fetch', page='summary', status=response.status_code, source=source, bytes=len(response.content))
+    if response.status_code != 200:
+        metrics.count('failures', stage='fetch', name='summary')
+        logging.warning(f'Summary of game {id}: error {response.status_code}')
+        return None
+    try:
+        with metrics.timer('decode', 'summary'):
+            return json.loads(response.content)
+    except ValueError:
+        logging.warning(f'Summary of game {id} is not JSON')
+        return None
+
+def get_summary(id: str, league: str = 'bra.1') -> dict | None:
+    '''Return the decoded summary of a game, fetched once for all the threads asking for it'''
+
+    key = (str(id), league)
+    with _memo_lock:
+        future = _memo.get(key)
+        owner = future is None
+        if owner:
+            future = _memo[key] = Future()
+            while len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+    if owner:
+        try:
+            future.set_result(_download(str(id), league))
+        except Exception as error:
+            future.set_exception(error)
+    return future.result()
+
+def _competition(data: dict) -> dict:
+    return data['header']['competitions'][0]
+
+def _teams(data: dict) -> list:
+    '''Competitors of the game, home team first (as in the pages)'''
+    return sorted(_competition(data)['competitors'], key=lambda team: team['homeAway'] != 'home')
+
+def _canceled(data: dict) -> bool:
+    competition = _competition(data)
+    status = competition.get('status', {}).get('type', {}).get('name')
+    return status in CANCELED or any(team.get('score') in (None, '') for team in competition['competitors'])
+
+@metrics.timed('parse', 'summary_estatisticas')
+def parse_estatisticas(data: dict, id: str) -> records.Partida | None:
+    '''Same record as scraping.parse_estatisticas'''
+
+    if _canceled(data):
+        logging.warning('Game canceled')
+        return None
+
+    stats = {team['team']['displayName']: {stat['name']: stat.get('displayValue') for stat in team['statistics']}
+             for team in data['boxscore']['teams']}
+    sides = []
+    for team in _teams(data):
+        name = team['team']['displayName']
+        side = records.EstatisticaTime(time=name, gols=team['score'])
+        for stat, key in STATS.items():
+            side[key] = stats[name][stat].replace('%', '')
+        sides.append(side)
+
+    info = data.get('gameInfo', {})
+    venue = info.get('venue', {})
+    address = venue.get('address', {})
+    date = datetime.datetime.fromisoformat(_competition(data)['date'].replace('Z', '+00:00')).astimezone(TIMEZONE)
+    league = data['header'].get('league', {}).get('name')
+    season = data['header'].get('season', {}).get('year')
+    officials = info.get('officials') or [{}]
+    local = ', '.join(part for part in (address.get('city'), address.get('country')) if part)
+
+    # The strings are written as in the page (scraping.parse_estatisticas), spaces included,
+    # so both extractions save the same values
+    return records.Partida(
+        partida=id,
+        campeonato=f'{season} {league} ' if league is not None and season is not None else league,
+        estadio=venue.get('fullName'),
+        horario=date.strftime('%H:%M'),
+        data=f' {date.day} de {MONTHS[date.month - 1]}',
+        local=f'{local} ' if local else None,
+        audiencia=f' {info["attendance"]}' if info.get('attendance') else None,
+        arbitro=officials[0].get('displayName'),
+        mandante=sides[0],
+        visitante=sides[1],
+        encerrada=_competition(data).get('status', {}).get('type', {}).get('name') in cache.FINAL_STATUSES,
+    )
+
+@metrics.timed('parse', 'summary_comentario')
+def parse_comentarios(data: dict, id: str | None = None) -> list | None:
+    '''(text, minute) of the comments, in the order of the page (last one first)'''
+
+    if _canceled(data):
+        logging.warning('Game canceled')
+        return None
+    comments = sorted(data['commentary'], key=lambda comment: int(comment.get('sequence', 0)), reverse=True)
+    return [(comment['text'], comment.get('time', {}).get('displayValue', '')) for comment in comments]
+
+def _subbed_in(player: dict) -> bool:
+    value = player.get('subbedIn')
+    return bool(value.get('didSub')) if isinstance(value, dict) else bool(value)
+
+@metrics.timed('parse', 'summary_escalacoes')
+def parse_lineup(data: dict, id: str) -> dict | None:
+    '''Same dict as scraping.parse_lineup'''
+
+    if _canceled(data):
+        logging.warning('Game canceled')
+        return None
+
+    rosters = {roster['team']['displayName']: roster['roster'] for roster in data['rosters']}
+    datas = {'partida': id}
+    for team in _teams(data):
+        name = team['team']['displayName']
+        players = rosters[name]
+        datas[name] = records.Escalacao(
+            titulares=[str(p['athlete']['id']) for p in players if p.get('starter')],
+            substitutos=[str(p['athlete']['id']) for p in players if not p.get('starter') and _subbed_in(p)],
+            reservas=[str(p['athlete']['id']) for p in players if not p.get('starter') and not _subbed_in(p)],
+        )
+    return datas
+
+PARSERS = {
+    'estatisticas': parse_estatisticas,
+    'comentario': parse_comentarios,
+    'escalacoes': parse_lineup,
+}
+
+def game_page(page_type: str, id: str, league: str = 'bra.1'):
+    '''The data of a page of the game from its summary, or MISSING to scrape the page'''
+
+    data = get_summary(id, league)
+    if data is None:
+        return MISSING
+    return parse_page(data, page_type, id)
+
+def parse_page(data: dict, page_type: str, id: str):
+    '''The data of a page of the game from a decoded summary, or MISSING'''
+
+    try:
+        return PARSERS[page_type](data, id)
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError) as error:
+        logging.info(f'Summary of game {id} without the {page_type} ({error!r}), reading the page')
+        return MISSING
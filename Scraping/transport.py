@@ -0,0 +1,217 @@
+'''
+This module holds the HTTP transport shared by every scraping function.
+A single keep-alive session is reused, so the pages of the same host pay
+the TCP/TLS handshake only once per pooled connection.
+'''
+
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+import ratelimit
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'
+}
+
+class _CountingAdapter(HTTPAdapter):
+    '''Adapter that reports every new connection (handshake) to the transport'''
+
+    def __init__(self, transport, **kwargs):
+        self.transport = transport
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        transport = self.transport
+
+        class CountingHTTPConnection(HTTPConnectionPool.ConnectionCls):
+            def connect(self):
+                transport.count('handshakes')
+                return super().connect()
+
+        class CountingHTTPSConnection(HTTPSConnectionPool.ConnectionCls):
+            def connect(self):
+                transport.count('handshakes')
+                return super().connect()
+
+        class CountingHTTPPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+
+        class CountingHTTPSPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPPool,
+            'https': CountingHTTPSPool
+        }
+
+class Transport:
+    '''
+    Pooled HTTP client.
+    pool_size: maximum number of open connections per host (requests wait for a free one).
+    hosts: number of hosts whose pools are kept open (the site and the summary API).
+    timeout: default (connect, read) timeout in seconds of every request.
+    compression: when True, asks for every encoding urllib3 can decode (gzip, deflate and br if brotli is installed).
+    per_host: maximum number of simultaneous requests to the same host (None for no cap).
+    cache: optional cache.PageCache answering the requests it already has.
+    limiter: optional ratelimit.RateLimiter pacing the requests and repeating the throttled ones.
+    archive: optional archive.Archive keeping every page answered with 200.
+    '''
+
+    def __init__(self, pool_size: int = 10, timeout: float | tuple = (5, 30), compression: bool = False,
+                 per_host: int | None = None, cache=None, limiter: ratelimit.RateLimiter | None = None, archive=None,
+                 hosts: int = 2):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'handshakes': 0, 'bytes': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self.per_host = per_host
+        self._hosts = {}
+        self.cache = cache
+        self.limiter = limiter
+        self.archive = archive
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        if compression:
+            self.session.headers['Accept-Encoding'] = make_headers(accept_encoding=True)['accept-encoding']
+        else:
+            self.session.headers['Accept-Encoding'] = 'identity'
+
+        adapter = _CountingAdapter(self, pool_connections=hosts, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    def set_host_limit(self, per_host: int | None) -> None:
+        '''Change the cap of simultaneous requests per host'''
+
+        with self._lock:
+            self.per_host = per_host
+            self._hosts = {}
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore | None:
+        with self._lock:
+            if self.per_host is None:
+                return None
+            host = urlsplit(url).netloc
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    def get(self, url: str, timeout: float | tuple | None = None, cached: bool = True, **kwargs) -> requests.Response:
+        '''
+        GET a url through the cache (if any) and the pool. Raises requests.RequestException on network errors.
+        cached: False skips the cache (pages still changing, e.g. of live games).
+        '''
+        if cached and self.cache is not None:
+            def request(url: str, headers: dict) -> requests.Response:
+                return self._request(url, timeout, headers=headers, **kwargs)
+            response = self.cache.fetch(url, request)
+        else:
+            response = self._request(url, timeout, **kwargs)
+        if self.archive is not None and response.status_code == 200:
+            self.archive.add(url, response.content)
+        return response
+
+    def _request(self, url: str, timeout: float | tuple | None = None, **kwargs) -> requests.Response:
+        '''Send the request, repeating it while the limiter allows when the site throttles or fails'''
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(url, timeout, **kwargs)
+            except requests.RequestException as error:
+                if self.limiter is None or not self.limiter.retry.should_retry(attempt):
+                    raise
+                delay = self.limiter.retry.delay(attempt)
+                logging.info(f'Request failed ({error!r}), retrying {url} in {delay:.1f}s')
+            else:
+                status = response.status_code
+                if status in ratelimit.THROTTLING:
+                    self.count('throttled')
+                if self.limiter is None or not self.limiter.retry.should_retry(attempt, status):
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                delay = self.limiter.retry.delay(attempt, retry_after)
+                if retry_after is not None:
+                    self.limiter.pause(url, delay)
+                logging.info(f'Error {status}, retrying {url} in {delay:.1f}s')
+            self.count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def _send(self, url: str, timeout: float | tuple | None = None, **kwargs) -> requests.Response:
+        self.count('requests')
+        slot = self._host_slot(url)
+        if slot is not None:
+            slot.acquire()
+        if self.limiter is not None:
+            self.limiter.acquire(url)
+        status = None
+        start = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=timeout or self.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            self.count('errors')
+            raise
+        finally:
+            if self.limiter is not None:
+                self.limiter.release(url, status, time.monotonic() - start)
+            if slot is not None:
+                slot.release()
+        self.count('bytes', len(response.content))
+        return response
+
+    def report(self) -> dict:
+        '''Return the counters, including how many requests reused an open connection'''
+
+        with self._lock:
+            report = dict(self.stats)
+        report['reused'] = max(report['requests'] - report['errors'] - report['handshakes'], 0)
+        if self.cache is not None:
+            report['cache'] = dict(self.cache.stats)
+        if self.limiter is not None:
+            report['hosts'] = self.limiter.report()
+        if self.archive is not None:
+            report['archive'] = dict(self.archive.stats)
+        return report
+
+    def close(self) -> None:
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.archive is not None:
+            self.archive.close()
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport() -> Transport:
+    '''Return the transport shared by the module, creating it with the defaults if needed'''
+
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
+
+def configure(**kwargs) -> Transport:
+    '''Replace the shared transport by a new one built with the given options (see Transport)'''
+
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = Transport(**kwargs)
+        logging.info(f'Transport configured: {kwargs}')
+        return _transport
@@ -0,0 +1,45 @@
+'''
+The modules of the scraper are flat files in Scraping/, imported by name as in the scripts.
+'''
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Scraping'))
+
+import local_server
+import scraping as sc
+import summary
+import transport
+
+# Saved pages of a game and of its league (named as local_server.page_name)
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'pages')
+
+@pytest.fixture
+def server():
+    '''Start a local_server.LocalServer with the given options, stopped after the test'''
+
+    servers = []
+
+    def start(directory: str | None = PAGES, server_class=local_server.LocalServer, **kwargs):
+        servers.append(server_class(directory, **kwargs).start())
+        return servers[-1]
+
+    yield start
+    for running in servers:
+        running.shutdown()
+        running.server_close()
+
+@pytest.fixture
+def site(server, monkeypatch):
+    '''The scrapers and the summaries reading the saved pages from the local server, without cache'''
+
+    running = server()
+    monkeypatch.setattr(sc, 'BASE_URL', running.url)
+    monkeypatch.setattr(sc, 'EXTRACTION', 'dom')
+    monkeypatch.setattr(summary, 'API_URL', running.url)
+    monkeypatch.setattr(summary, '_memo', type(summary._memo)())
+    monkeypatch.setattr(transport, '_transport', transport.Transport())
+    yield running
+    transport.get_transport().close()
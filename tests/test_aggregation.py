@@ -0,0 +1,73 @@
+'''
+The counters of Passagens kept by aggregation give the same values as the trigger insert_Lance
+(DataBase/triggers.sql, ported to SQLite) and do not drift when a game is loaded again.
+'''
+
+import os
+import pytest
+import scraping as sc
+import squads
+import pipeline
+import loader
+import aggregation
+from conftest import PAGES
+
+def parse(name: str, page_type: str, id: str | None = None):
+    with open(os.path.join(PAGES, f'{name}.html'), 'rb') as file:
+        return sc.parse_page(page_type, file.read(), id)
+
+@pytest.fixture(scope='module')
+def csv_files(tmp_path_factory) -> str:
+    '''The csv files of the saved squads and game, with the names of the lances resolved'''
+
+    directory = str(tmp_path_factory.mktemp('Datas'))
+    index = squads.PlayerIndex()
+    for team in parse('classificacao_2024', 'classificacao'):
+        index.add_team(*next(iter(team.items())))
+    index.add_cast(parse('elenco_9971', 'elenco', '9971'))
+    index.save(directory)
+    paginas = {'estatisticas': parse('estatisticas_699353', 'estatisticas', '699353'),
+               'lances': parse('comentario_699353', 'comentario', '699353'),
+               'escalacoes': parse('escalacoes_699353', 'escalacoes', '699353')}
+    with pipeline.CSVSink(directory) as sink:
+        pipeline.stream_games([('699353', paginas)], sink, index.rosters(2024))
+    return directory
+
+def counters(database: loader.Loader) -> list:
+    return sorted(database._query(f'SELECT id, {", ".join(aggregation.COLUMNS)} FROM Passagens'))
+
+def with_trigger(filename: str) -> loader.Loader:
+    '''Loader of a database where the trigger insert_Lance keeps the counters'''
+
+    backend = loader.SQLiteBackend(filename)
+    backend.create_schema(loader.read_schema())
+    backend.connection.executescript(''.join(
+        f"CREATE TRIGGER {'insert_Lance' if position == 0 else f'insert_Lance_{position}'} AFTER INSERT ON Lances "
+        f"WHEN NEW.tipo = '{tipo}' BEGIN UPDATE Passagens SET {column} = {column} + 1 WHERE id = NEW.jogador_1; END;"
+        for position, (tipo, column) in enumerate(aggregation.COUNTERS.items())))
+    return loader.Loader(backend)
+
+def test_counters_equal_the_trigger_and_survive_a_reload(csv_files, tmp_path):
+    database = loader.Loader(loader.SQLiteBackend(str(tmp_path / 'espn.sqlite')))
+    assert database.aggregate
+    loader.load_directory(database, csv_files)
+    trigger = with_trigger(str(tmp_path / 'trigger.sqlite'))
+    assert not trigger.aggregate
+    loader.load_directory(trigger, csv_files)
+
+    loaded = counters(database)
+    assert loaded == counters(trigger)
+    assert sum(sum(row[1:]) for row in loaded) > 0
+    assert aggregation.verify(database) == []
+
+    # The game loaded again by another run replaces its lances and subtracts their old counters
+    database.close()
+    database = loader.Loader(loader.SQLiteBackend(str(tmp_path / 'espn.sqlite')))
+    database.load('lances', loader.read_csv(os.path.join(csv_files, 'lances.csv'), 'lances'))
+    assert database._query('SELECT COUNT(*) FROM Lances') == trigger._query('SELECT COUNT(*) FROM Lances')
+    assert aggregation.verify(database) == []
+    assert counters(database) == loaded
+    aggregation.recompute(database)
+    assert counters(database) == loaded
+    database.close()
+    trigger.close()
@@ -0,0 +1,102 @@
+'''
+Archive of the pages: saving, reading back and rebuilding the tables (reparse) from the saved pages.
+'''
+
+import os
+import csv
+import json
+import pytest
+from conftest import PAGES
+from test_parsers import BASELINE
+
+archive = pytest.importorskip('archive', exc_type=ImportError) # needs zstandard
+
+SITE = 'https://www.espn.com.br'
+
+# Saved page -> url of the site it is archived under
+URLS = {
+    **{f'{page_type}_{id}': f'{SITE}/futebol/{path}/_/jogoId/{id}'
+       for id in ('699353', '699400')
+       for page_type, path in (('estatisticas', 'partida-estatisticas'), ('comentario', 'comentario'),
+                               ('escalacoes', 'escalacoes'))},
+    'classificacao_2024': f'{SITE}/futebol/classificacao/_/liga/BRA.1/temporada/2024',
+    'elenco_9971': f'{SITE}/futebol/time/elenco/_/id/9971/liga/BRA.1/temporada/2024',
+}
+
+def read(name: str) -> bytes:
+    with open(os.path.join(PAGES, f'{name}.html'), 'rb') as file:
+        return file.read()
+
+@pytest.fixture
+def saved(tmp_path) -> str:
+    '''Archive with the saved pages under their urls'''
+
+    directory = str(tmp_path / 'arquivo')
+    pages = archive.Archive(directory)
+    for name, url in URLS.items():
+        assert pages.add(url, read(name))
+    pages.close()
+    return directory
+
+def csv_rows(filename: str) -> list:
+    with open(filename, newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+def as_csv(rows: list) -> list:
+    # The baseline rows as written in the csv files
+    return [{key: '' if value is None else str(value) for key, value in row.items()} for row in rows]
+
+def test_reparse_rebuilds_the_baseline_rows(saved, tmp_path):
+    output = str(tmp_path / 'reparse')
+    assert archive.reparse(saved, output, 2024, processes=1) == 2
+    with open(os.path.join(BASELINE, 'rows.json'), encoding='utf-8') as file:
+        baseline = json.load(file)
+    table = lambda name: csv_rows(os.path.join(output, f'{name}.csv'))
+
+    assert table('partidas') == as_csv([baseline['partidas']])
+    assert table('estatisticas') == as_csv(baseline['estatisticas-partida'])
+    assert table('escalacoes') == as_csv([row for team in baseline['escalacoes'] for row in team])
+    by_id = lambda rows: sorted(rows, key=lambda row: row['espn_id'])
+    assert by_id(table('times')) == by_id(as_csv(baseline['times']))
+    assert by_id(table('jogadores')) == by_id(as_csv(baseline['jogadores']))
+    assert sorted(table('passagens'), key=str) == sorted(as_csv(baseline['passagens']), key=str)
+
+    # The names of the lances are resolved to ESPN ids where the squads know them
+    lances = table('lances')
+    expected = as_csv(baseline['lances'])
+    assert len(lances) == len(expected)
+    for row, old in zip(lances, expected):
+        for column in ('id_partida', 'tipo', 'minuto', 'descricao'):
+            assert row[column] == old[column]
+        for column in ('jogador_1', 'jogador_2', 'time'):
+            assert row[column] == old[column] or (row[column].isdigit() and old[column])
+
+def test_unchanged_page_is_not_saved_again(saved):
+    pages = archive.Archive(saved)
+    url = URLS['comentario_699353']
+    assert not pages.add(url, read('comentario_699353'))
+    assert pages.add(url, read('comentario_699353') + b'<!-- new -->')
+    assert pages.get('comentario', '699353').endswith(b'<!-- new -->')
+    assert pages.stats['unchanged'] == 1
+    # Only the last version of the url is listed
+    assert [row[0] for row in pages.latest(('comentario',))] == [URLS['comentario_699353'], URLS['comentario_699400']]
+    pages.close()
+
+def test_small_segments_roll_over(tmp_path):
+    directory = str(tmp_path / 'arquivo')
+    pages = archive.Archive(directory, segment_size=1024)
+    for name in ('estatisticas_699353', 'comentario_699353', 'escalacoes_699353'):
+        assert pages.add(URLS[name], read(name))
+    pages.close()
+    segments = sorted(name for name in os.listdir(directory) if name.startswith('segment-'))
+    assert segments == ['segment-000001.zst', 'segment-000002.zst', 'segment-000003.zst']
+
+    # Reopened, every page is read from its segment and the new ones go to the last segment
+    pages = archive.Archive(directory, segment_size=1024)
+    for name in ('estatisticas_699353', 'comentario_699353', 'escalacoes_699353'):
+        page_type, id = name.split('_')
+        assert pages.get(page_type, id) == read(name)
+    assert pages.get('elenco', '9971') is None
+    assert pages.add(URLS['elenco_9971'], read('elenco_9971'))
+    assert pages.latest(('elenco',))[0][4] == 4
+    pages.close()
@@ -0,0 +1,98 @@
+'''
+PageCache: which pages are kept for good, which expire and which are never stored.
+'''
+
+import json
+import sqlite3
+import pytest
+import cache
+
+GAME_URL = 'https://www.espn.com.br/futebol/partida-estatisticas/_/jogoId/699353'
+SUMMARY_URL = 'https://site.api.espn.com/apis/site/v2/sports/soccer/bra.1/summary?event=699353&lang=pt&region=br'
+
+def summary(status: str) -> bytes:
+    return json.dumps({'header': {'competitions': [{'status': {'type': {'name': status}}}]}}).encode()
+
+def game_page(clock: str) -> bytes:
+    return f'<html><body><div class="ScoreCell__Time Gamestrip__Time h9 clr-gray-01">{clock}</div></body></html>'.encode()
+
+class Response:
+    def __init__(self, content: bytes, status_code: int = 200, headers: dict | None = None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class Site:
+    '''request function of PageCache.fetch answering the bodies given, one per request'''
+
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.requests = []
+
+    def __call__(self, url: str, headers: dict):
+        self.requests.append(headers)
+        body = self.bodies.pop(0)
+        return body if isinstance(body, Response) else Response(body, headers={'ETag': '"v1"'})
+
+@pytest.fixture
+def page_cache(tmp_path):
+    pages = cache.PageCache(str(tmp_path), unfinished_ttl=0)
+    yield pages
+    pages.close()
+
+@pytest.mark.parametrize('url, final', [(SUMMARY_URL, summary('STATUS_FULL_TIME')), (GAME_URL, game_page('Fim'))])
+def test_finished_game_never_expires(page_cache, url, final):
+    site = Site(final)
+    page_cache.fetch(url, site)
+    assert page_cache.fetch(url, site).content == final
+    assert len(site.requests) == 1
+    assert page_cache.stats['hits'] == 1
+
+@pytest.mark.parametrize('url, unfinished', [
+    (SUMMARY_URL, summary('STATUS_SCHEDULED')),
+    (SUMMARY_URL, summary('STATUS_FIRST_HALF')),
+    (SUMMARY_URL, summary('STATUS_POSTPONED')),
+    (GAME_URL, game_page("45'")),
+    (GAME_URL, game_page('Adiado')),
+])
+def test_unfinished_game_expires(page_cache, url, unfinished):
+    site = Site(unfinished, Response(b'', 304))
+    page_cache.fetch(url, site)
+    assert page_cache.fetch(url, site).content == unfinished
+    # Expired: asked again with the validators
+    assert site.requests == [{}, {'If-None-Match': '"v1"'}]
+
+def test_revalidated_page_becomes_permanent_after_the_end(tmp_path):
+    pages = cache.PageCache(str(tmp_path), unfinished_ttl=0)
+    site = Site(summary('STATUS_FIRST_HALF'), summary('STATUS_FULL_TIME'), Response(b'', 304))
+    pages.fetch(SUMMARY_URL, site)
+    pages.fetch(SUMMARY_URL, site)
+    pages.fetch(SUMMARY_URL, site)
+    assert len(site.requests) == 2
+    pages.close()
+
+@pytest.mark.parametrize('url, error', [
+    (GAME_URL, b'<html><body><h1 class="Error404__Title">Not found</h1></body></html>'),
+    (SUMMARY_URL, b'<html>not json</html>'),
+    (GAME_URL, b''),
+])
+def test_error_pages_are_not_stored(page_cache, url, error):
+    site = Site(error, error)
+    assert page_cache.fetch(url, site).content == error
+    page_cache.fetch(url, site)
+    assert len(site.requests) == 2
+    assert page_cache.stats['stored'] == 0
+    assert page_cache.stats['rejected'] == 2
+
+def test_index_of_a_previous_version(tmp_path):
+    # Without the column permanent: its game pages expire and are checked again
+    db = sqlite3.connect(str(tmp_path / 'index.sqlite'))
+    db.execute('CREATE TABLE pages (url TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL, etag TEXT, '
+               'last_modified TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+    db.close()
+    pages = cache.PageCache(str(tmp_path), unfinished_ttl=0)
+    site = Site(game_page('Fim'))
+    pages.fetch(GAME_URL, site)
+    pages.fetch(GAME_URL, site)
+    assert len(site.requests) == 1
+    pages.close()
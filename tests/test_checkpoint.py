@@ -0,0 +1,62 @@
+'''
+Checkpoint: finished games are skipped by a new run, unfinished and failed ones stay pending.
+'''
+
+import sqlite3
+import pytest
+import checkpoint as ckpt
+from records import Partida, Lances
+
+PAGES = list(ckpt.PAGES)
+
+def game(id: str, encerrada: bool | None) -> dict:
+    return {'estatisticas': Partida(id, encerrada=encerrada), 'lances': Lances(id), 'escalacoes': {'partida': id}}
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = ckpt.Checkpoint(str(tmp_path / 'checkpoint.sqlite'))
+    yield checkpoint
+    checkpoint.close()
+
+def test_finished_game_is_done(checkpoint):
+    checkpoint.mark_pages('1', game('1', True))
+    assert checkpoint.pending(['1']) == {'1': PAGES} # not formatted yet
+    checkpoint.mark_formatted(['1'])
+    assert checkpoint.pending(['1']) == {}
+
+def test_unfinished_game_stays_pending(checkpoint):
+    checkpoint.mark_pages('1', game('1', False))
+    checkpoint.mark_formatted(['1'])
+    assert checkpoint.pending(['1']) == {'1': PAGES}
+    # The next run finds it over
+    checkpoint.mark_pages('1', game('1', True))
+    checkpoint.mark_formatted(['1'])
+    assert checkpoint.pending(['1']) == {}
+
+def test_unknown_status_is_taken_as_finished(checkpoint):
+    checkpoint.mark_pages('1', game('1', None))
+    checkpoint.mark_formatted(['1'])
+    assert checkpoint.pending(['1']) == {}
+
+def test_failed_page_stays_pending(checkpoint):
+    pages = game('1', True)
+    pages['lances'] = None
+    checkpoint.mark_pages('1', pages)
+    checkpoint.mark_formatted(['1'])
+    assert checkpoint.pending(['1']) == {'1': ['lances']}
+    # Only the missing page is fetched again, the game was over
+    checkpoint.mark_pages('1', {'lances': Lances('1')})
+    checkpoint.mark_formatted(['1'])
+    assert checkpoint.pending(['1']) == {}
+
+def test_checkpoint_of_a_previous_version(tmp_path):
+    filename = str(tmp_path / 'checkpoint.sqlite')
+    db = sqlite3.connect(filename)
+    db.execute('CREATE TABLE paginas (jogo_id TEXT NOT NULL, pagina TEXT NOT NULL, status TEXT NOT NULL, '
+               'formatted INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL, PRIMARY KEY (jogo_id, pagina))')
+    db.executemany("INSERT INTO paginas VALUES ('1', ?, 'ok', 1, 0)", [(page,) for page in PAGES])
+    db.commit()
+    db.close()
+    checkpoint = ckpt.Checkpoint(filename)
+    assert checkpoint.pending(['1', '2']) == {'2': PAGES}
+    checkpoint.close()
@@ -0,0 +1,31 @@
+'''
+Importing cli and parsing the options of a subcommand does not load the heavy libraries:
+they are imported only by the subcommands (and options) that use them.
+'''
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+SCRAPING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Scraping')
+HEAVY = ('pandas', 'pyarrow', 'zstandard')
+
+COMMANDS = [
+    ['discover', '--from', '20240413', '--to', '20240416'],
+    ['squads', '--seasons', '2023', '2024', '--columnar', 'colunar'],
+    ['games', '--ids', '699353', '--database', 'espn.sqlite', '--columnar', 'colunar', '--archive', 'arquivo'],
+    ['format', '--ids', '699353', '--columnar', 'colunar'],
+    ['live', '--ids', '699353'],
+    ['reparse', '--archive', 'arquivo'],
+    ['export', '--database', 'espn.sqlite', '--columnar', 'colunar'],
+]
+
+@pytest.mark.parametrize('argv', COMMANDS, ids=[argv[0] for argv in COMMANDS])
+def test_parsing_does_not_import_the_heavy_libraries(argv):
+    code = ('import sys, json, cli\n'
+            f'args = cli.parser().parse_args({argv!r})\n'
+            f'print(json.dumps([args.run.__name__] + [name for name in {HEAVY!r} if name in sys.modules]))')
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRAPING, capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [f'command_{argv[0]}']
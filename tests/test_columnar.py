@@ -0,0 +1,39 @@
+'''
+The parts of the columnar copy: each write takes a new file and read_table keeps only the
+rows of the newest part of each key.
+'''
+
+import os
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import columnar
+
+def play(game: int, tipo: str) -> dict:
+    return {'id_partida': game, 'jogador_1': 'Bolasie', 'jogador_2': None, 'tipo': tipo,
+            'minuto': "12'", 'descricao': None, 'time': 'Criciúma'}
+
+def test_parts_of_the_same_run_do_not_collide(tmp_path):
+    directory = columnar.partition(str(tmp_path), 'lances', 2024, 'bra.1')
+    os.makedirs(directory)
+    # a part of another writer already holds the name the count gives
+    taken = os.path.join(directory, f'part-R-{os.getpid()}-0001.parquet')
+    open(taken, 'wb').close()
+    first = columnar.write_table([play(1, 'GOL')], 'lances', str(tmp_path), run='R')
+    second = columnar.write_table([play(2, 'GOL')], 'lances', str(tmp_path), run='R')
+    assert len({first, second, taken}) == 3
+    assert os.path.getsize(taken) == 0
+    assert os.path.basename(first).startswith(f'part-R-{os.getpid()}-')
+
+def test_rewritten_game_read_from_the_newest_part(tmp_path):
+    root = str(tmp_path)
+    columnar.write_table([play(1, 'GOL'), play(1, 'FALTA-FEITA'), play(2, 'ESCANTEIO')], 'lances', root, run='20240101000000')
+    columnar.write_table([play(1, 'CARTAO-AMARELO')], 'lances', root, run='20240102000000')
+    columnar.write_table([play(3, 'GOL')], 'lances', root, season=2023, run='20240102000000')
+    table = columnar.read_table('lances', root)
+    assert sorted(zip(table['id_partida'], table['tipo'], table['temporada'])) == \
+        [(1, 'CARTAO-AMARELO', 2024), (2, 'ESCANTEIO', 2024), (3, 'GOL', 2023)]
+    assert list(table.columns) == columnar.df.COLUMNS['lances'] + ['temporada', 'liga']
+    assert str(table['id_partida'].dtype) == 'Int64'
+    assert list(columnar.read_table('lances', root, season=2023)['id_partida']) == [3]
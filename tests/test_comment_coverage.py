@@ -0,0 +1,67 @@
+'''
+The comments without rule are grouped by template, counted by template and by game,
+and saved in cobertura.json.
+'''
+
+import os
+import pytest
+import scraping as sc
+import comment_coverage
+from conftest import PAGES
+
+# Comments of comentario_699353 that no rule classifies
+UNMATCHED = {
+    'Primeiro tempo começa.': 'Primeiro tempo começa.',
+    'Mão na bola de <nome> (<time>).': 'Mão na bola de Barreto (Criciúma).',
+    'Segundo tempo começa <nome> <n>, <nome> <n>.': 'Segundo tempo começa Criciúma 0, Juventude 0.',
+}
+
+@pytest.mark.parametrize('text, template', [
+    ('Mão na bola de Barreto (Criciúma).', 'Mão na bola de <nome> (<time>).'),
+    ('Mão na  bola de Bolasie Jr (Juventude).', 'Mão na bola de <nome> (<time>).'),
+    ('Revisão do VAR concluída.', 'Revisão do <nome> concluída.'),
+    ('Bolasie Jr sai lesionado.', '<nome> sai lesionado.'),
+    ('Segundo tempo começa Criciúma 0, Juventude 0.', 'Segundo tempo começa <nome> <n>, <nome> <n>.'),
+    ('Atraso. Bolasie (Criciúma) sai lesionado.', 'Atraso. <nome> (<time>) sai lesionado.'),
+])
+def test_templates(text, template):
+    assert comment_coverage.normalize(text) == template
+
+@pytest.fixture
+def coverage(tmp_path):
+    coverage = comment_coverage.Coverage(str(tmp_path / 'Datas' / 'cobertura.json'))
+    sc.set_coverage(coverage)
+    with open(os.path.join(PAGES, 'comentario_699353.html'), 'rb') as file:
+        sc.parse_page('comentario', file.read(), '699353')
+    yield coverage
+    sc.set_coverage(None)
+
+def test_unmatched_comments_of_the_page(coverage):
+    assert coverage.games == {'699353': {'comentarios': 31, 'fora_do_padrao': dict.fromkeys(UNMATCHED, 1)}}
+    assert coverage.by_game() == {'699353': (3, 31)}
+    assert coverage.rate() == pytest.approx(28 / 31)
+
+def test_counts_by_template_and_game(coverage):
+    coverage.add_game('699356', 20, ['Mão na bola de Bolasie (Juventude).', 'Mão na bola de Jadson (Juventude).'])
+    coverage.add_game('699355', 10, [])
+    report = {item['template']: item for item in coverage.report()}
+    assert report['Mão na bola de <nome> (<time>).'] == {
+        'template': 'Mão na bola de <nome> (<time>).', 'comentarios': 3, 'jogos': 2,
+        'exemplo': 'Mão na bola de Barreto (Criciúma).'} # the first example is kept
+    assert report['Primeiro tempo começa.']['comentarios'] == report['Primeiro tempo começa.']['jogos'] == 1
+    assert coverage.report(1)[0]['template'] == 'Mão na bola de <nome> (<time>).'
+    assert coverage.by_game() == {'699353': (3, 31), '699356': (2, 20)}
+    assert coverage.rate() == pytest.approx(1 - 5 / 61)
+
+def test_game_parsed_again_replaces_its_counts(coverage):
+    coverage.add_game('699353', 31, ['Primeiro tempo começa.'])
+    assert coverage.templates() == {'Primeiro tempo começa.': 1}
+
+def test_saved_and_loaded(coverage):
+    coverage.add_game('699353', 31, ['Primeiro tempo começa.'])
+    coverage.save()
+    loaded = comment_coverage.Coverage(coverage.filename)
+    assert loaded.games == coverage.games
+    # the examples of templates no longer seen are not saved
+    assert loaded.examples == {'Primeiro tempo começa.': 'Primeiro tempo começa.'}
+    assert loaded.report() == coverage.report()
@@ -0,0 +1,89 @@
+'''
+The index of the rules gives the rule of the first match of the table, and the rules of a JSON file
+can set every field of the play.
+'''
+
+import json
+import pytest
+import commentary
+
+def first_rule(text: str):
+    # The linear scan of the table that the index replaces
+    return next((rule for rule in commentary.RULES if rule.keyword in text), None)
+
+@pytest.fixture
+def rules():
+    '''The table of rules restored after the test'''
+
+    saved = list(commentary.RULES)
+    yield commentary.RULES
+    commentary.RULES[:] = saved
+    commentary.index_rules()
+
+TEXTS = [
+    'Falta cometida por Barreto (Criciúma).',
+    'Jadson (Juventude) sofre uma falta no campo de defesa.',
+    'Oportunidade perdida. Bolasie (Criciúma) chute de pé direito de fora da área.',
+    'Escanteio, Juventude. Cobrado por Jadson.',
+    'Escanteio, Criciúma.',
+    'Impedimento, Criciúma. Barreto tentou um passe, mas encontrou Bolasie em posição de impedimento.',
+    'Jadson (Juventude) recebe cartão amarelo por uma falta.',
+    'Gol! Criciúma 1, Juventude 0. Bolasie (Criciúma) chute de pé direito do centro da área no canto esquerdo do gol. Assistência de Barreto.',
+    'Gol contra de Zé Marcos (Juventude), Criciúma 1, Juventude 1.',
+    'Gol contra de Bolasie Jr. (Criciúma).',
+    'Substituição, Criciúma. Entra em campo Fellipe Mateus substituindo Miguel Trauco.',
+    'Atraso na partida por causa de uma lesão de Jadson (Juventude).',
+    'Fim do primeiro tempo, Criciúma 1, Juventude 0.',
+    'Fim do segundo tempo, Criciúma 1, Juventude 1.',
+    # more than one keyword: the first rule of the table wins, wherever its keyword is
+    'Substituição após a lesão de Jadson (Juventude), recebe cartão amarelo.',
+    'Gol anulado após Falta cometida por Barreto (Criciúma).',
+    'Primeiro tempo começa.',
+    '',
+]
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_index_finds_the_first_rule_of_the_table(text):
+    assert commentary.find_rule(text) is first_rule(text)
+
+# Fields (jogador_1, jogador_2, time) read by the first scraper
+FIELDS = {
+    'Escanteio, Juventude. Cobrado por Jadson.': (None, ' Jadson', 'Juventude'),
+    'Escanteio, Criciúma.': (None, '', 'Criciúma'),
+    'Gol contra de Zé Marcos (Juventude), Criciúma 1, Juventude 1.': ('', None, 'Juventude'),
+    'Gol contra de Bolasie Jr. (Criciúma).': ('', None, 'Criciúma'),
+}
+
+@pytest.mark.parametrize('text', FIELDS)
+def test_fields_as_the_first_scraper(text):
+    play = commentary.classify_one(text, "1'")
+    assert (play.jogador_1, play.jogador_2, play.time) == FIELDS[text]
+
+def test_register_keeps_the_index(rules):
+    rule = commentary.Rule('Gol anulado', tipo='GOL-ANULADO')
+    commentary.register(rule, before='Falta cometida')
+    text = 'Gol anulado após Falta cometida por Barreto (Criciúma).'
+    assert commentary.find_rule(text) is rule is first_rule(text)
+    assert commentary.classify_one(text, "12'").tipo == 'GOL-ANULADO'
+
+def test_rules_of_a_json_file_set_the_description(rules, tmp_path):
+    filename = tmp_path / 'regras.json'
+    filename.write_text(json.dumps([
+        {'keyword': 'Pênalti perdido', 'pattern': r'[^.]*\.\s(?P<jogador_1>[^(]*)\s\((?P<time>[^)]*)\)',
+         'tipo': 'PENALTI-PERDIDO', 'descricao': 'pênalti', 'before': 'Gol'},
+        {'keyword': 'Pênalti', 'pattern': r'[^.]*\.\s(?P<jogador_1>[^(]*)\s\((?P<time>[^)]*)\)',
+         'tipo': 'PENALTI', 'defaults': {'time': ''}},
+    ], ensure_ascii=False), encoding='utf-8')
+    commentary.load_rules(filename)
+
+    play = commentary.classify_one('Pênalti perdido. Bolasie (Criciúma) chute defendido.', "40'")
+    assert (play.jogador_1, play.time, play.tipo, play.descricao) == ('Bolasie', 'Criciúma', 'PENALTI-PERDIDO', 'pênalti')
+    # The descricao of the pattern is used when the rule has none
+    assert commentary.classify_one('Pênalti marcado. Bolasie (Criciúma) sofre.', "41'").descricao is None
+
+def test_keyword_starting_inside_another_one(rules):
+    # 'olé' starts inside the 'Gol' of 'Golé' and its rule comes first
+    rule = commentary.Rule('olé', tipo='OLE')
+    commentary.register(rule, before='Falta cometida')
+    text = 'Golé de Bolasie (Criciúma).'
+    assert commentary.find_rule(text) is rule is first_rule(text)
@@ -0,0 +1,98 @@
+'''
+The records of the scrapers go through data_formatting and give the rows of the first version
+(fixtures/baseline/rows.json, formatted from the dicts of the first scrapers).
+'''
+
+import os
+import json
+import pytest
+import scraping as sc
+import data_format as df
+import records
+import metrics
+import resolution
+from conftest import PAGES
+from test_parsers import BASELINE
+
+def parse(name: str, page_type: str, id: str | None = None):
+    with open(os.path.join(PAGES, f'{name}.html'), 'rb') as file:
+        return sc.parse_page(page_type, file.read(), id)
+
+@pytest.fixture(scope='module')
+def rows() -> dict:
+    with open(os.path.join(BASELINE, 'rows.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+def test_game_records_give_the_baseline_rows(rows):
+    partida = parse('estatisticas_699353', 'estatisticas', '699353')
+    assert df.data_formatting(partida, 'partidas') == rows['partidas']
+    assert df.data_formatting(partida, 'estatisticas-partida') == rows['estatisticas-partida']
+    assert df.data_formatting(parse('comentario_699353', 'comentario', '699353'), 'lances') == rows['lances']
+    assert df.data_formatting(parse('escalacoes_699353', 'escalacoes', '699353'), 'escalacoes') == rows['escalacoes']
+
+def test_squad_records_give_the_baseline_rows(rows):
+    teams = parse('classificacao_2024', 'classificacao')
+    assert [df.data_formatting(team, 'times') for team in teams] == rows['times']
+    cast = parse('elenco_9971', 'elenco', '9971')
+    assert df.data_formatting(cast, 'passagens') == rows['passagens']
+    assert [df.data_formatting(player, 'jogadores') for player in cast['jogadores']] == rows['jogadores']
+
+def test_other_data_is_refused():
+    assert df.data_formatting(['699353'], 'partidas') == []
+
+def index() -> resolution.Index:
+    index = resolution.Index('699353')
+    index.add_team('Criciúma', 9971)
+    index.add_players('Criciúma', [(1001, 'Barreto'), (1002, 'Bolasie')], lineup=True)
+    return index
+
+LANCES = records.Lances('699353', [
+    records.Lance('Bolasie', 'Barreto', 'Criciúma', 'GOL', 'pé direito', "12'"),
+    records.Lance('Desconhecido', None, 'Time de Fora', 'FALTA-FEITA', None, "30'"),
+])
+
+def test_names_not_resolved_are_kept():
+    rows = df.format_lances(LANCES, index())
+    assert [(row['jogador_1'], row['jogador_2'], row['time']) for row in rows] == \
+        [(1002, 1001, 9971), ('Desconhecido', None, 'Time de Fora')]
+    columns = df.format_lances_batch([LANCES], {'699353': index()})
+    assert (columns['jogador_1'], columns['jogador_2'], columns['time']) == \
+        ([1002, 'Desconhecido'], [1001, None], [9971, 'Time de Fora'])
+
+def test_rows_of_the_batch_counted_once():
+    metrics.METRICS.reset()
+    df.format_lances_batch([LANCES], {'699353': index()})
+    rows = {key: value for key, value in metrics.METRICS.counters.items() if key[0] == 'rows'}
+    assert sum(rows.values()) == 2
+
+def _flat(rows: list) -> list:
+    return [row for team in rows for row in team]
+
+# Table: (batch function, its argument, per-row function applied to each item, how the per-row result joins, baseline rows)
+BATCHES = {
+    'lances': (df.format_lances_batch, lambda: [parse('comentario_699353', 'comentario', '699353')],
+               df.format_lances, list.__add__, lambda rows: rows['lances']),
+    'estatisticas': (df.format_estatisticas_batch, lambda: [parse('estatisticas_699353', 'estatisticas', '699353')],
+                     df.format_estatisticas_partida, list.__add__, lambda rows: rows['estatisticas-partida']),
+    'partidas': (df.format_partidas_batch, lambda: [parse('estatisticas_699353', 'estatisticas', '699353')],
+                 df.format_partidas, lambda done, row: done + [row], lambda rows: [rows['partidas']]),
+    'escalacoes': (df.format_escalacoes_batch, lambda: [parse('escalacoes_699353', 'escalacoes', '699353')],
+                   df.format_escalacoes, lambda done, teams: done + _flat(teams), lambda rows: _flat(rows['escalacoes'])),
+    'jogadores': (df.format_jogadores_batch, lambda: parse('elenco_9971', 'elenco', '9971')['jogadores'],
+                  df.format_jogadores, lambda done, row: done + [row], lambda rows: rows['jogadores']),
+    'passagens': (df.format_passagens_batch, lambda: [parse('elenco_9971', 'elenco', '9971')],
+                  df.format_passagens, list.__add__, lambda rows: rows['passagens']),
+    'times': (df.format_times_batch, lambda: parse('classificacao_2024', 'classificacao'),
+              df.format_times, lambda done, row: done + [row], lambda rows: rows['times']),
+}
+
+@pytest.mark.parametrize('table', BATCHES)
+def test_batch_gives_the_rows_of_the_per_row_function(rows, table):
+    batch, items, per_row, join, baseline = BATCHES[table]
+    items = items()
+    expected = []
+    for item in items:
+        expected = join(expected, per_row(item))
+    columns = batch(items)
+    assert list(columns) == df.COLUMNS[table]
+    assert df.to_rows(columns) == expected == baseline(rows)
@@ -0,0 +1,26 @@
+'''
+Order of the games and league of the pages in both modes of engine.fetch_games.
+'''
+
+import threading
+import pytest
+import engine
+
+@pytest.mark.parametrize('mode', ['threads', 'asyncio'])
+def test_fetch_games_passes_the_league(monkeypatch, mode):
+    calls = []
+    lock = threading.Lock()
+
+    def scraper(page):
+        def scrape(id, league):
+            with lock:
+                calls.append((page, id, league))
+            return {'partida': id}
+        return scrape
+
+    monkeypatch.setattr(engine, 'PAGES', {page: scraper(page) for page in engine.PAGES})
+    games = engine.fetch_games(['3', '1', '2'], workers=4, per_host=None, mode=mode, league='bra.2')
+    assert [id for id, results in games] == ['3', '1', '2']
+    assert all(results == {page: {'partida': id} for page in engine.PAGES} for id, results in games)
+    assert len(calls) == 9
+    assert {league for page, id, league in calls} == {'bra.2'}
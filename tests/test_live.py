@@ -0,0 +1,95 @@
+'''
+Polling of the games in progress (live.LiveGame and live.tail) against a fake transport answering
+summaries built from the saved one of game 699353.
+'''
+
+import os
+import json
+import copy
+import pytest
+import live
+import transport
+from conftest import PAGES
+
+with open(os.path.join(PAGES, 'summary_699353.json'), encoding='utf-8') as file:
+    SUMMARY = json.load(file)
+
+def game_summary(status: str, state: str, comments: list) -> dict:
+    '''The saved summary with another status and the comments [(text, minute)]'''
+
+    data = copy.deepcopy(SUMMARY)
+    data['header']['competitions'][0]['status']['type'].update(name=status, state=state, completed=state == 'post')
+    data['commentary'] = [{'sequence': sequence, 'time': {'displayValue': minute}, 'text': text}
+                          for sequence, (text, minute) in enumerate(comments, start=1)]
+    return data
+
+class Response:
+    def __init__(self, status_code: int, content: bytes = b'', headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+class FakeTransport:
+    '''Answers the scripted responses in order, keeping the headers of each request'''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url: str, cached: bool = True, headers: dict | None = None):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+def answer(data: dict, etag: str | None = None) -> Response:
+    return Response(200, json.dumps(data).encode('utf-8'), {'ETag': etag} if etag else {})
+
+@pytest.fixture
+def fake(monkeypatch):
+    def install(*responses) -> FakeTransport:
+        fake = FakeTransport(*responses)
+        monkeypatch.setattr(transport, '_transport', fake)
+        return fake
+    return install
+
+CORNER = ('Escanteio, Criciúma. Cobrado por Arthur Caike.', "12'")
+FOUL = ('Falta cometida por Barreto (Criciúma).', "12'")
+
+def test_same_text_twice_in_a_minute_is_two_events(fake):
+    data = game_summary('STATUS_FIRST_HALF', 'in', [CORNER, CORNER, FOUL])
+    fake(answer(data), answer(data))
+    game = live.LiveGame('699353')
+
+    events = game.poll()
+    assert [event['evento'] for event in events] == ['status', 'lance', 'lance', 'lance']
+    assert [event['tipo'] for event in events[1:]] == ['ESCANTEIO', 'ESCANTEIO', 'FALTA-FEITA']
+    # The same body again: nothing new
+    assert game.poll() == []
+
+def test_not_modified_grows_the_interval(fake):
+    data = game_summary('STATUS_FIRST_HALF', 'in', [CORNER])
+    transport = fake(answer(data, etag='"v1"'), Response(304), answer(data, etag='"v1"'))
+    game = live.LiveGame('699353', min_interval=10, max_interval=60)
+
+    assert len(game.poll()) == 2
+    assert game.interval == 10
+    assert game.poll() == []
+    assert transport.requests[1]['If-None-Match'] == '"v1"'
+    assert game.interval == 10 * live.BACKOFF
+    # An identical body (no validators honoured) counts as not modified too
+    assert game.poll() == []
+    assert game.interval == 10 * live.BACKOFF ** 2
+
+def test_tail_ends_with_the_game(fake):
+    fake(answer(game_summary('STATUS_FIRST_HALF', 'in', [CORNER])),
+         answer(game_summary('STATUS_FULL_TIME', 'post', [CORNER, FOUL])))
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    events = list(live.tail(['699353'], min_interval=10, clock=lambda: now[0], sleep=sleep))
+    assert [event['evento'] for event in events] == ['status', 'lance', 'status', 'lance', 'fim']
+    assert events[-1] == {'evento': 'fim', 'partida': '699353', 'placar': '1-1'}
+    assert sleeps == [10]
@@ -0,0 +1,44 @@
+'''
+The passagens created by the escalacoes of a game go to the season of the game.
+'''
+
+import loader
+
+def database(tmp_path) -> loader.Loader:
+    database = loader.Loader(loader.SQLiteBackend(str(tmp_path / 'espn.sqlite')))
+    database.load('times', [{'espn_id': 9971, 'nome': 'Criciúma'}])
+    database.load('jogadores', [{'espn_id': 1001, 'nome': 'Barreto', 'posicao': 'M', 'idade': 32,
+                                 'altura': 1.8, 'nacionalidade': 'Brasil'}])
+    return database
+
+def passagens(database: loader.Loader) -> list:
+    return database._query('SELECT ano FROM Passagens')
+
+def test_passagem_in_the_season_of_the_game(tmp_path):
+    db = database(tmp_path)
+    db.load('partidas', [{'espn_id': 600001, 'campeonato': '2022 Brasileiro Serie A ', 'local_': None, 'estadio': None,
+                          'arbitro': None, 'data_': None, 'horario': None, 'audiencia': None}])
+    db.load('escalacoes', [{'time': 'Criciúma', 'partida': 600001, 'jogador': 1001, 'status_': 'TITULAR'}], season=2024)
+    assert passagens(db) == [(2022,)]
+    assert db._query('SELECT COUNT(*) FROM Escalacoes') == [(1,)]
+    db.close()
+
+def test_passagem_in_the_season_given(tmp_path):
+    db = database(tmp_path)
+    sink = loader.DatabaseSink(db, season=2021)
+    sink.write('partidas', {'espn_id': 600002, 'campeonato': None, 'local_': None, 'estadio': None,
+                            'arbitro': None, 'data_': None, 'horario': None, 'audiencia': None})
+    sink.write('escalacoes', {'time': 'Criciúma', 'partida': 600002, 'jogador': 1001, 'status_': 'TITULAR'})
+    sink.close()
+    assert passagens(db) == [(2021,)]
+    db.close()
+
+def test_season_of_the_games_already_in_the_database(tmp_path):
+    db = database(tmp_path)
+    db.load('partidas', [{'espn_id': 600003, 'campeonato': '2023 Brasileiro Serie A ', 'local_': None, 'estadio': None,
+                          'arbitro': None, 'data_': None, 'horario': None, 'audiencia': None}])
+    db.close()
+    db = loader.Loader(loader.SQLiteBackend(str(tmp_path / 'espn.sqlite')))
+    db.load('escalacoes', [{'time': 'Criciúma', 'partida': 600003, 'jogador': 1001, 'status_': 'TITULAR'}])
+    assert passagens(db) == [(2023,)]
+    db.close()
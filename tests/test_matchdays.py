@@ -0,0 +1,49 @@
+'''
+Discovery of the games of a range of days, with and without the calendar of the days already searched.
+'''
+
+import os
+import shutil
+import pytest
+import scraping as sc
+import matchdays
+import transport
+from conftest import PAGES
+
+@pytest.fixture
+def pages(tmp_path) -> str:
+    '''
+    The saved pages plus the 14th, a results page without links and without the marker of no games
+    (as after a change of layout). The 15th is not saved (404), the 16th has no games.
+    '''
+    directory = tmp_path / 'pages'
+    shutil.copytree(PAGES, directory)
+    content = (directory / 'resultados_20240413.html').read_text(encoding='utf-8')
+    (directory / 'resultados_20240414.html').write_text(content.replace('Button--anchorLink', 'Button--link'), encoding='utf-8')
+    return str(directory)
+
+@pytest.fixture
+def results(server, monkeypatch, pages):
+    running = server(pages)
+    monkeypatch.setattr(sc, 'BASE_URL', running.url)
+    monkeypatch.setattr(transport, '_transport', transport.Transport())
+    yield running
+    transport.get_transport().close()
+
+def test_discover_without_calendar(results):
+    assert dict(sc.iter_all_games(20240413, 20240416, workers=2)) == {'20240413': ['699353', '699356', '699355']}
+
+def test_calendar_records_only_the_days_without_games(results, tmp_path):
+    calendar = matchdays.Calendar(str(tmp_path / 'calendario.json'))
+    assert dict(sc.iter_all_games(20240413, 20240416, workers=2, calendar=calendar)) == \
+        {'20240413': ['699353', '699356', '699355']}
+    # The page without links and the missing page are not taken as days without games
+    assert matchdays.Calendar(calendar.filename).days == {'bra.1': {'20240413': ['699353', '699356', '699355'],
+                                                                    '20240416': []}}
+
+    requests = results.stats['requests']
+    calendar = matchdays.Calendar(calendar.filename)
+    assert dict(sc.iter_all_games(20240413, 20240416, workers=2, calendar=calendar)) == \
+        {'20240413': ['699353', '699356', '699355']}
+    # Only the 14th and the 15th are requested again
+    assert results.stats['requests'] == requests + 2
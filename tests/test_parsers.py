@@ -0,0 +1,77 @@
+'''
+The parsers of scraping give the same data as the first version of the scrapers
+(one find_all per field on the whole page, html.parser) for every page type, with each parser.
+The baseline outputs in fixtures/baseline were saved by the first version of scraping.py
+reading the pages of fixtures/pages.
+'''
+
+import os
+import json
+import importlib.util
+import pytest
+import scraping as sc
+from conftest import PAGES
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'baseline')
+
+# Saved page -> (page type, id)
+CASES = {
+    'resultados_20240413': ('resultados', None),
+    'resultados_20240416': ('resultados', None),
+    'estatisticas_699353': ('estatisticas', '699353'),
+    'comentario_699353': ('comentario', '699353'),
+    'escalacoes_699353': ('escalacoes', '699353'),
+    'estatisticas_699400': ('estatisticas', '699400'),
+    'comentario_699400': ('comentario', '699400'),
+    'escalacoes_699400': ('escalacoes', '699400'),
+    'classificacao_2024': ('classificacao', None),
+    'elenco_9971': ('elenco', '9971'),
+}
+
+PARSERS = ['html.parser', pytest.param('lxml', marks=pytest.mark.skipif(
+    importlib.util.find_spec('lxml') is None, reason='lxml not installed'))]
+
+def baseline(name: str):
+    with open(os.path.join(BASELINE, f'{name}.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+def plain(result):
+    '''The result as the dicts of the first version (records converted, keys as in JSON)'''
+
+    if hasattr(result, 'to_dict'):
+        result = result.to_dict()
+    elif isinstance(result, dict):
+        result = {key: value.to_dict() if hasattr(value, 'to_dict') else value for key, value in result.items()}
+    elif isinstance(result, list):
+        result = [plain(item) for item in result]
+    if isinstance(result, dict):
+        result.pop('encerrada', None) # not in the first version
+    return json.loads(json.dumps(result, ensure_ascii=False))
+
+def read(name: str) -> bytes:
+    with open(os.path.join(PAGES, f'{name}.html'), 'rb') as file:
+        return file.read()
+
+@pytest.mark.parametrize('parser', PARSERS)
+@pytest.mark.parametrize('strain', [True, False], ids=['strained', 'whole'])
+@pytest.mark.parametrize('name', CASES)
+def test_parse_page_equals_baseline(name, strain, parser):
+    page_type, id = CASES[name]
+    assert plain(sc.parse_page(page_type, read(name), id, strain=strain, parser=parser)) == baseline(name)
+
+def test_finished_game_is_told_by_the_clock():
+    assert sc.parse_page('estatisticas', read('estatisticas_699353'), '699353').encerrada is True
+
+@pytest.mark.parametrize('parser', PARSERS)
+def test_get_functions_equal_baseline(site, monkeypatch, parser):
+    monkeypatch.setattr(sc, 'PARSER', parser)
+    assert plain(sc.get_games(f'{sc.BASE_URL}/futebol/resultados/_/data/20240413/liga/bra.1')) == baseline('resultados_20240413')
+    assert plain(sc.get_games(f'{sc.BASE_URL}/futebol/resultados/_/data/20240416/liga/bra.1')) == baseline('resultados_20240416')
+    for id in ('699353', '699400'):
+        assert plain(sc.get_datas_from_estatisticas(id)) == baseline(f'estatisticas_{id}')
+        assert plain(sc.get_datas_from_comentarios(id)) == baseline(f'comentario_{id}')
+        assert plain(sc.get_lineup(id)) == baseline(f'escalacoes_{id}')
+    assert plain(sc.get_teams_id(2024)) == baseline('classificacao_2024')
+    assert plain(sc.get_cast('9971', 2024)) == baseline('elenco_9971')
+    # A page missing from the site is the error page of check_page
+    assert sc.get_datas_from_estatisticas('1') is None
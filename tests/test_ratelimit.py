@@ -0,0 +1,87 @@
+'''
+RateLimiter and the retries of the Transport against the local stand-in of the site (local_server.py),
+with throttling (429) and failing (503) answers injected.
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import local_server
+import ratelimit
+import transport
+
+class ScriptedServer(local_server.LocalServer):
+    '''Answers the statuses of script (with Retry-After) to the first requests, then the pages'''
+
+    def __init__(self, directory, script=(), retry_after=None, **kwargs):
+        super().__init__(directory, **kwargs)
+        self.script = list(script)
+        self.scripted_retry_after = retry_after
+
+    def answer(self, path, headers=None):
+        with self._lock:
+            status = self.script.pop(0) if self.script else None
+            if status is not None:
+                self.stats['requests'] += 1
+                self.stats[str(status)] += 1
+        if status is not None:
+            headers = {'Retry-After': self.scripted_retry_after} if self.scripted_retry_after is not None else {}
+            return status, headers, b''
+        return super().answer(path, headers)
+
+def _limiter(retries: int = 4, **kwargs) -> ratelimit.RateLimiter:
+    return ratelimit.RateLimiter(retry=ratelimit.RetryPolicy(retries=retries, backoff=0.01), **kwargs)
+
+def test_limiter_caps_the_requests_in_flight(server):
+    site = server(None, latency=0.02)
+    client = transport.Transport(pool_size=10, limiter=_limiter(concurrency=3, max_concurrency=3))
+    url = f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1'
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: client.get(url), range(16)))
+    client.close()
+    assert 1 <= site.peak <= 3
+
+def test_retries_throttled_and_failing_answers(server):
+    site = server(None, server_class=ScriptedServer, script=[429, 503, 503])
+    client = transport.Transport(limiter=_limiter())
+    response = client.get(f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1')
+    report = client.report()
+    client.close()
+    assert response.status_code == 200
+    assert site.stats['429'] == 1 and site.stats['503'] == 2 and site.stats['200'] == 1
+    assert report['retries'] == 3
+    assert report['throttled'] == 3
+    # Every throttled answer cut the limit of the host, below the initial 4
+    assert report['hosts'][site.url.split('//')[1]]['limit'] < 4
+
+def test_honours_retry_after(server):
+    site = server(None, server_class=ScriptedServer, script=[429], retry_after='0.3')
+    client = transport.Transport(limiter=_limiter())
+    start = time.monotonic()
+    response = client.get(f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1')
+    elapsed = time.monotonic() - start
+    client.close()
+    assert response.status_code == 200
+    assert elapsed >= 0.3
+
+def test_gives_up_after_the_retries(server):
+    site = server(None, server_class=ScriptedServer, script=[503] * 10)
+    client = transport.Transport(limiter=_limiter(retries=2))
+    response = client.get(f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1')
+    client.close()
+    assert response.status_code == 503
+    assert site.stats['requests'] == 3
+
+def test_without_limiter_no_retry(server):
+    site = server(None, server_class=ScriptedServer, script=[503])
+    client = transport.Transport()
+    assert client.get(f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1').status_code == 503
+    client.close()
+    assert site.stats['requests'] == 1
+
+def test_backoff_grows_and_is_capped():
+    policy = ratelimit.RetryPolicy(backoff=1.0, max_backoff=4.0)
+    for attempt in range(6):
+        for _ in range(50):
+            assert 0 <= policy.delay(attempt) <= min(4.0, 2 ** attempt)
+    assert policy.delay(0, '3') >= 3
+    assert policy.delay(0, '120') == 4.0
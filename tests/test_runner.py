@@ -0,0 +1,81 @@
+'''
+Shards of the runner: the window of the seasons, a failing shard reported without stopping the
+others, and the merge of their csv files in the order of the shards.
+'''
+
+import os
+import logging
+import pytest
+import runner
+import loader
+import data_format as df
+
+def test_season_window():
+    assert runner.Shard('bra.1', 2023).dates() == (20230101, 20231231)
+    assert runner.Shard('eng.1', 2023).dates() == (20230801, 20240630)
+    assert runner.Shard('eng.1', 2023, 20231001, 20231031).dates() == (20231001, 20231031)
+
+def test_unknown_league_without_dates_is_warned(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(runner.sc, 'iter_all_games', lambda *args, **kwargs: iter(()))
+    with caplog.at_level(logging.WARNING):
+        runner.discover(runner.Shard('xyz.1', 2023), str(tmp_path))
+        runner.discover(runner.Shard('bra.1', 2023), str(tmp_path))
+    assert [record.message.split(':')[0] for record in caplog.records] == ['Shard xyz.1_2023']
+
+@pytest.fixture
+def shards(site, tmp_path, monkeypatch):
+    '''
+    run_shard against the local server: the shard of eng.1 fails while discovering its games,
+    the one of bra.1 scrapes the saved pages
+    '''
+    discover = runner.discover
+
+    def failing(shard, directory, workers=8):
+        if shard.league == 'eng.1':
+            raise RuntimeError('layout changed')
+        return discover(shard, directory, workers)
+
+    monkeypatch.setattr(runner, 'discover', failing)
+    options = {'root': str(tmp_path / 'shards'), 'columnar_root': None, 'workers': 2,
+               'cache_directory': str(tmp_path / 'cache'), 'rate': 1000}
+    yield [runner.run_shard(shard, **options) for shard in
+           (runner.Shard('eng.1', 2023, 20230801, 20230802), runner.Shard('bra.1', 2024, 20240413, 20240416))]
+    logging.basicConfig(force=True, handlers=[logging.NullHandler()])
+
+def test_failing_shard_does_not_stop_the_others(shards, tmp_path):
+    failed, ok = shards
+    assert (failed['status'], failed['games'], failed['error']) == ('failed', 0, "RuntimeError('layout changed')")
+    assert (ok['status'], ok['error']) == ('ok', None)
+    # The three games of the day, only the one of the saved pages has rows (the others are not on the server)
+    assert ok['games'] == 3
+    assert [row['espn_id'] for row in loader.read_csv(os.path.join(ok['directory'], 'partidas.csv'), 'partidas')] \
+        == ['699353']
+
+    output = tmp_path / 'Datas'
+    database = loader.Loader(loader.SQLiteBackend(str(tmp_path / 'espn.sqlite')))
+    runner.merge(shards, str(output), database)
+    assert database._query('SELECT espn_id FROM Partidas') == [(699353,)]
+    assert database._query('SELECT COUNT(*) FROM Passagens WHERE ano = 2024')[0][0] > 0
+    database.close()
+    assert sorted(os.listdir(output)) == sorted(f'{table}.csv' for table in loader.TABLES)
+
+def write_partida(directory, estadio: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    df.save_toCSV([{'espn_id': 1, 'local_': None, 'estadio': estadio, 'campeonato': None, 'arbitro': None,
+                    'data_': None, 'horario': None, 'audiencia': None}],
+                  os.path.join(directory, 'partidas.csv'), df.COLUMNS['partidas'])
+
+def test_merge_follows_the_order_of_the_shards(tmp_path):
+    results = []
+    for shard, estadio in ((runner.Shard('bra.1', 2024), 'Novo'), (runner.Shard('bra.1', 2023), 'Antigo')):
+        directory = str(tmp_path / shard.name)
+        write_partida(directory, estadio)
+        results.append({'shard': shard, 'directory': directory, 'status': 'ok', 'games': 1, 'error': None})
+    results.append({'shard': runner.Shard('eng.1', 2023), 'directory': None, 'status': 'failed', 'games': 0,
+                    'error': 'RuntimeError()'})
+
+    # Whatever order the shards ended in, the row of the last shard (bra.1 2024) is kept
+    for order in (results, results[::-1]):
+        output = str(tmp_path / f'Datas{len(os.listdir(tmp_path))}')
+        runner.merge(order, output)
+        assert [row['estadio'] for row in loader.read_csv(os.path.join(output, 'partidas.csv'), 'partidas')] == ['Novo']
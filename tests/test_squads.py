@@ -0,0 +1,67 @@
+'''
+Squads of many seasons: each player is one row of jogadores and each (club, season) one passagem,
+and an index loaded from the csv files of a previous run only saves the new rows.
+'''
+
+import os
+import shutil
+import pytest
+import scraping as sc
+import transport
+import squads
+import loader
+from conftest import PAGES
+
+PLAYERS = 8 # of the cast of the fixture
+
+@pytest.fixture
+def league(tmp_path, server, monkeypatch):
+    '''
+    The table of 2024 served for 2023 too, and the cast of Criciúma (9971) served for Juventude (6270):
+    the same players in two seasons and two clubs
+    '''
+    directory = tmp_path / 'pages'
+    directory.mkdir()
+    for name in ('classificacao_2024', 'elenco_9971'):
+        shutil.copy(os.path.join(PAGES, f'{name}.html'), directory)
+    shutil.copy(directory / 'classificacao_2024.html', directory / 'classificacao_2023.html')
+    shutil.copy(directory / 'elenco_9971.html', directory / 'elenco_6270.html')
+    running = server(str(directory))
+    monkeypatch.setattr(sc, 'BASE_URL', running.url)
+    monkeypatch.setattr(transport, '_transport', transport.Transport())
+    yield running
+    transport.get_transport().close()
+
+def rows(directory, table: str) -> list:
+    return list(loader.read_csv(os.path.join(directory, f'{table}.csv'), table))
+
+def test_one_player_row_and_a_passagem_by_club_and_season(league, tmp_path):
+    index = squads.collect([2023, 2024], workers=4)
+    tables = index.save(str(tmp_path))
+
+    assert len(tables['jogadores']['espn_id']) == PLAYERS
+    assert sorted(tables['times']['espn_id']) == [2029, 6086, 6270, 9971]
+    passagens = list(zip(*tables['passagens'].values()))
+    assert len(passagens) == PLAYERS * 2 * 2
+    player = tables['jogadores']['espn_id'][0]
+    assert sorted((time, ano) for jogador, time, ano in passagens if jogador == player) == \
+        [(6270, 2023), (6270, 2024), (9971, 2023), (9971, 2024)]
+    assert len(rows(tmp_path, 'jogadores')) == PLAYERS
+    assert len(rows(tmp_path, 'passagens')) == PLAYERS * 4
+
+def test_index_loaded_from_the_csv_files_saves_only_new_rows(league, tmp_path):
+    squads.collect([2023], workers=4).save(str(tmp_path))
+    assert len(rows(tmp_path, 'passagens')) == PLAYERS * 2
+
+    # The same season again: nothing new
+    tables = squads.collect([2023], workers=4, index=squads.PlayerIndex().load(str(tmp_path))).save(str(tmp_path))
+    assert tables['jogadores']['espn_id'] == [] and tables['passagens']['ano'] == [] and tables['times']['espn_id'] == []
+
+    # A new season: its passagens, and the players formatted again with the data of the later season
+    tables = squads.collect([2023, 2024], workers=4, index=squads.PlayerIndex().load(str(tmp_path))).save(str(tmp_path))
+    assert set(tables['passagens']['ano']) == {2024}
+    assert len(tables['passagens']['ano']) == PLAYERS * 2
+    assert len(tables['jogadores']['espn_id']) == PLAYERS
+    assert len(rows(tmp_path, 'jogadores')) == PLAYERS
+    assert len(rows(tmp_path, 'passagens')) == PLAYERS * 4
+    assert len(rows(tmp_path, 'times')) == 4
@@ -0,0 +1,28 @@
+'''
+The summary of ESPN (--extraction json) and the pages (dom) give the same records and the same rows for a game.
+'''
+
+import scraping as sc
+import data_format as df
+
+def scrape(monkeypatch, extraction: str) -> tuple:
+    monkeypatch.setattr(sc, 'EXTRACTION', extraction)
+    return (sc.get_datas_from_estatisticas('699353'), sc.get_datas_from_comentarios('699353'),
+            sc.get_lineup('699353'))
+
+def test_json_and_dom_give_the_same_game(site, monkeypatch):
+    requests = site.stats['requests']
+    estatisticas, lances, escalacoes = scrape(monkeypatch, 'json')
+    # The three pages came from the summary, read once
+    assert site.stats['requests'] == requests + 1
+    dom = scrape(monkeypatch, 'dom')
+
+    assert estatisticas.to_dict() == dom[0].to_dict()
+    assert lances.to_dict() == dom[1].to_dict()
+    assert {key: value.to_dict() if hasattr(value, 'to_dict') else value for key, value in escalacoes.items()} \
+        == {key: value.to_dict() if hasattr(value, 'to_dict') else value for key, value in dom[2].items()}
+
+    assert df.format_partidas(estatisticas) == df.format_partidas(dom[0])
+    assert df.format_estatisticas_partida(estatisticas) == df.format_estatisticas_partida(dom[0])
+    assert df.format_lances(lances) == df.format_lances(dom[1])
+    assert df.format_escalacoes(escalacoes) == df.format_escalacoes(dom[2])
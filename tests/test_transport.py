@@ -0,0 +1,40 @@
+'''
+Transport driven against the local stand-in of the site (local_server.py).
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import transport
+
+def test_keep_alive_reuses_the_connection(server):
+    site = server(None)
+    client = transport.Transport(pool_size=4)
+    for day in ('20240413', '20240414') * 3:
+        assert client.get(f'{site.url}/futebol/resultados/_/data/{day}/liga/bra.1').status_code == 200
+    report = client.report()
+    client.close()
+    assert report['requests'] == 6
+    assert report['handshakes'] == 1
+    assert report['reused'] == 5
+
+def test_per_host_cap(server):
+    site = server(None, latency=0.02)
+    client = transport.Transport(pool_size=10, per_host=2)
+    url = f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1'
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(lambda _: client.get(url).status_code, range(16)))
+    client.close()
+    assert statuses == [200] * 16
+    assert site.peak <= 2
+    assert client.report()['handshakes'] <= 2
+
+def test_keeps_a_pool_for_each_host(server):
+    # The site and the summary API: both pools stay open while the requests alternate between them
+    site, api = server(None), server(None)
+    client = transport.Transport(pool_size=4, hosts=2)
+    for _ in range(3):
+        client.get(f'{site.url}/futebol/resultados/_/data/20240413/liga/bra.1')
+        client.get(f'{api.url}/apis/site/v2/sports/soccer/bra.1/summary?event=1')
+    report = client.report()
+    client.close()
+    assert report['handshakes'] == 2
+    assert report['reused'] == 4